@@ -1,13 +1,23 @@
 # --- app.py ---
-from flask import Flask, request, jsonify
+import time
+APP_IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from logger_util import setup_logger
 from logger_context import call_id_var
-from data_fetcher import DataFetcher
+from data_fetcher import DataFetcher, load_selenium
 from llm_response import LLMResponse
 from driver_manager import DriverManager
 from review_fetcher import ReviewFetcher
+from http_client import get_http_client
+from job_queue import JobManager, JobQueueFull
+from url_utils import product_key
+import metrics
 import uuid
+import json
+import socket
+import threading
 from dotenv import load_dotenv
 import os
 import atexit
@@ -15,21 +25,86 @@ import atexit
 # Load environment
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
 
+# "lazy": Chrome, Selenium and the Groq SDK load on first use
+# "warm": lazy, plus a background warm-up once the server accepts connections
+# "eager": everything is loaded before the app is importable
+STARTUP_MODE = os.getenv("STARTUP_MODE", "warm")
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 logger = setup_logger("app")
 
 # Initialize components
-driver_manager = DriverManager()
+driver_manager = DriverManager(launch="eager" if STARTUP_MODE == "eager" else "lazy")
 llm_handler = LLMResponse()
 review_fetcher = ReviewFetcher()
-data_fetcher = DataFetcher()
+data_fetcher = DataFetcher(driver_manager=driver_manager)
+if STARTUP_MODE == "eager":
+    llm_handler.client
+    load_selenium()
+
+def run_analysis_job(job):
+    events = llm_handler.run_stream(job.url, data_fetcher, review_fetcher,
+                                    use_cache=job.options.get("use_cache", True),
+                                    session_id=job.options.get("session_id"),
+                                    progress_callback=job.update_stage,
+                                    pipeline_mode=job.options.get("pipeline_mode"))
+    for event, data in events:
+        if event == "token":
+            job.append_output(data)
+        elif event == "error":
+            raise RuntimeError(data)
+        elif event == "done":
+            job.meta.update(data)
+            # Sessions that joined this job get the same context pinned for their chat
+            total_info = llm_handler.context_store.get(job.url, job.options.get("session_id"))
+            for session_id in job.take_sessions():
+                llm_handler.context_store.put(job.url, total_info, session_id)
+
+job_manager = JobManager(run_analysis_job)
+
+metrics.REGISTRY.gauge("jobs", job_manager.stats, label="status", help="Analysis jobs by status")
+metrics.REGISTRY.gauge("context_store_entries", lambda: {"": llm_handler.context_store.stats()["entries"]},
+                       help="Products held in the chat context store")
+
+startup = {"mode": STARTUP_MODE, "import_seconds": round(time.perf_counter() - APP_IMPORT_STARTED, 3),
+           "first_request_seconds": None, "warmup": "not started" if STARTUP_MODE == "warm" else "skipped"}
+metrics.REGISTRY.gauge("startup_seconds", lambda: {k: startup[k] for k in ("import_seconds", "first_request_seconds")
+                                                   if startup[k] is not None},
+                       label="phase", help="Seconds from app import to the end of each startup phase")
+logger.info(f"[Startup] App imported in {startup['import_seconds']:.2f}s ({STARTUP_MODE} mode)")
+
+def warm_up():
+    """Loads what lazy startup deferred: the Groq SDK, Selenium and Chrome."""
+    startup["warmup"] = "running"
+    started = time.perf_counter()
+    try:
+        llm_handler.client
+        load_selenium()
+        driver_manager.warm_up(background=False)
+        startup["warmup"] = "done" if driver_manager.status()["started"] else "failed"
+    except Exception as e:
+        logger.warning(f"[Startup] Warm-up failed: {e}")
+        startup["warmup"] = "failed"
+    startup["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"[Startup] Warm-up {startup['warmup']} in {startup['warmup_seconds']:.2f}s")
+
+def _warm_up_when_listening(host: str, port: int, timeout: float = 60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    warm_up()
 
 # Safe shutdown
 @atexit.register
 def graceful_shutdown():
     try:
-        if driver_manager and driver_manager.started:
+        # shutdown_driver is a no-op when nothing was started; in pool mode `started` is never set
+        if driver_manager:
             logger.info("[Shutdown] Gracefully shutting down Chrome driver...")
             driver_manager.shutdown_driver()
     except Exception as e:
@@ -37,9 +112,20 @@ def graceful_shutdown():
 
 @app.before_request
 def log_request():
-    print(f"[Flask] {request.method} {request.url}")
-    print(f"[Headers] {dict(request.headers)}")
-    print(f"[Body] {request.get_data(as_text=True)}")
+    logger.debug(f"[Flask] {request.method} {request.path} ({request.content_length or 0} bytes)")
+
+@app.after_request
+def record_first_request(response):
+    if startup["first_request_seconds"] is None:
+        startup["first_request_seconds"] = round(time.perf_counter() - APP_IMPORT_STARTED, 3)
+        logger.info(f"[Startup] First request ({request.path}) served {startup['first_request_seconds']:.2f}s after start")
+    return response
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    # Chrome is only a fallback, so a failed warm-up does not make the app unready
+    is_ready = startup["warmup"] != "running"
+    return jsonify({"ready": is_ready, "startup": startup, "driver": driver_manager.status()}), 200 if is_ready else 503
 
 @app.route("/analyze-url", methods=["POST"])
 def analyze_url():
@@ -52,9 +138,13 @@ def analyze_url():
             return jsonify({"error": "URL is required"}), 400
 
         logger.info(f"Received analyze request for: {url}")
-        driver = driver_manager.get_driver()
-        markdown_result = llm_handler.run(url, data_fetcher, review_fetcher, driver)
-        return jsonify({"markdown": markdown_result})
+        # DataFetcher borrows a browser from driver_manager only if the HTTP fetch fails
+        result = llm_handler.analyze(url, data_fetcher, review_fetcher, use_cache=not data.get("refresh", False),
+                                     session_id=data.get("session_id"), pipeline_mode=data.get("pipeline_mode"))
+        meta = {"cache": result["cache"], "pipeline_mode": result["pipeline_mode"], "timings": result["timings"]}
+        if "error" in result:
+            return jsonify({"markdown": {"error": result["error"]}, **meta})
+        return jsonify({"markdown": result["markdown"], **meta})
 
     except Exception as e:
         logger.exception("Error during /analyze-url")
@@ -72,19 +162,126 @@ def chat():
             return jsonify({"error": "Missing URL or question"}), 400
 
         logger.info(f"Chat request for: {url}")
-        llm_handler.url = url
-        llm_handler.question = question
-
-        if not llm_handler.total_info:
-            driver = driver_manager.get_driver()
-            llm_handler.run(url, data_fetcher, review_fetcher, driver)
+        session_id = data.get("session_id")
+        total_info = llm_handler.get_context(url, session_id, data_fetcher, review_fetcher)
+        if not total_info:
+            return jsonify({"error": "Product data not available"}), 422
 
-        response = llm_handler.run_chat_conversation()
+        response = llm_handler.run_chat_conversation(url, question, session_id, total_info)
         return jsonify({"answer": response})
 
     except Exception as e:
         logger.exception("Error during /chat")
         return jsonify({"error": str(e)}), 500
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _sse_response(call_id: str, events):
+    def generate():
+        call_id_var.set(call_id)
+        try:
+            for event, data in events():
+                yield _sse(event, {"text": data} if event == "token" else data)
+        except Exception as e:
+            logger.exception("Error while streaming response")
+            yield _sse("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/analyze-url/stream", methods=["POST"])
+def analyze_url_stream():
+    call_id = str(uuid.uuid4())
+    call_id_var.set(call_id)
+    data = request.get_json()
+    url = data.get("url")
+
+    if not url:
+        return jsonify({"error": "URL is required"}), 400
+
+    logger.info(f"Received streaming analyze request for: {url}")
+    use_cache = not data.get("refresh", False)
+    session_id = data.get("session_id")
+    pipeline_mode = data.get("pipeline_mode")
+    return _sse_response(call_id, lambda: llm_handler.run_stream(url, data_fetcher, review_fetcher, use_cache=use_cache,
+                                                                 session_id=session_id, pipeline_mode=pipeline_mode))
+
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    call_id = str(uuid.uuid4())
+    call_id_var.set(call_id)
+    data = request.get_json()
+    url = data.get("url")
+    question = data.get("question")
+
+    if not url or not question:
+        return jsonify({"error": "Missing URL or question"}), 400
+
+    logger.info(f"Streaming chat request for: {url}")
+    session_id = data.get("session_id")
+
+    def events():
+        total_info = llm_handler.get_context(url, session_id, data_fetcher, review_fetcher)
+        if not total_info:
+            yield "error", "Product data not available"
+            return
+        yield from llm_handler.run_chat_conversation_stream(url, question, session_id, total_info)
+
+    return _sse_response(call_id, events)
+
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    call_id_var.set(str(uuid.uuid4()))
+    data = request.get_json()
+    url = data.get("url")
+
+    if not url:
+        return jsonify({"error": "URL is required"}), 400
+
+    try:
+        pipeline_mode = data.get("pipeline_mode")
+        refresh = bool(data.get("refresh", False))
+        job_key = f"{product_key(url)}|{pipeline_mode or 'default'}|{'refresh' if refresh else 'cached'}"
+        job, created = job_manager.submit(url, job_key, use_cache=not refresh,
+                                          session_id=data.get("session_id"), pipeline_mode=pipeline_mode)
+    except JobQueueFull as e:
+        logger.warning(f"Rejecting analysis job: {e}")
+        return jsonify({"error": "Server is busy, please retry shortly"}), 429
+
+    return jsonify({"job_id": job.id, "status": job.status, "deduplicated": not created}), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "http": get_http_client().stats(),
+        "product_fetch": data_fetcher.fetch_path_stats(),
+        "jobs": job_manager.stats(),
+        "context": llm_handler.context_store.stats(),
+        "llm_cache": llm_handler.llm_cache.stats(),
+        "report_cache": llm_handler.report_cache.stats(),
+    })
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+def serve(host: str = "127.0.0.1", port: int = 4000, debug: bool = False):
+    # With the reloader on, only the child process that serves requests warms up
+    serving_process = not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+    if STARTUP_MODE == "warm" and serving_process:
+        threading.Thread(target=_warm_up_when_listening, args=(host, port), name="startup-warmup", daemon=True).start()
+    app.run(host=host, port=port, debug=debug, threaded=True)
+
 if __name__ == "__main__":
-    app.run(port=4000, debug=True)
+    serve(port=4000, debug=True)
@@ -0,0 +1,188 @@
+# --- batch.py ---
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, Iterator, Optional, Set
+from logger_util import setup_logger
+from logger_context import call_id_var
+
+logger = setup_logger(__name__)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+def read_urls(source) -> Iterator[str]:
+    """
+    Yields URLs from plain lines or JSONL objects with a "url" field. Blank
+    lines and lines starting with '#' are skipped.
+    """
+    for line in source:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            try:
+                url = json.loads(line).get("url")
+            except ValueError:
+                logger.warning(f"[Batch] Skipping malformed JSON line: {line[:80]}")
+                continue
+            if url:
+                yield url
+        else:
+            yield line
+
+
+def load_checkpoint(output_path: str, retry_failed: bool) -> Set[str]:
+    """
+    The output file doubles as the checkpoint: URLs that already have a
+    result line are skipped on restart (failed ones too unless retrying).
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash; that URL runs again
+            if row.get("status") == "ok" or not retry_failed:
+                done.add(row.get("url"))
+    return done
+
+
+class BatchRunner:
+    def __init__(self, llm_handler, data_fetcher, review_fetcher, output_path: str,
+                 concurrency: int = BATCH_CONCURRENCY, use_cache: bool = True,
+                 pipeline_mode: Optional[str] = None, include_markdown: bool = True):
+        self.llm_handler = llm_handler
+        self.data_fetcher = data_fetcher
+        self.review_fetcher = review_fetcher
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.use_cache = use_cache
+        self.pipeline_mode = pipeline_mode
+        self.include_markdown = include_markdown
+        self._write_lock = threading.Lock()
+        self.latencies = []
+        self.failures: Counter = Counter()
+        self.succeeded = 0
+
+    def _analyze(self, url: str) -> Dict[str, Any]:
+        call_id_var.set(str(uuid.uuid4()))
+        started = time.perf_counter()
+        row: Dict[str, Any] = {"url": url}
+        try:
+            result = self.llm_handler.analyze(url, self.data_fetcher, self.review_fetcher,
+                                              use_cache=self.use_cache, pipeline_mode=self.pipeline_mode)
+            row.update({
+                "status": "failed" if "error" in result else "ok",
+                "error": result.get("error"),
+                "error_type": "pipeline" if "error" in result else None,
+                "cache": result.get("cache"),
+                "pipeline_mode": result.get("pipeline_mode"),
+                "timings": {k: round(v, 3) for k, v in result.get("timings", {}).items()},
+                "total_info": result.get("total_info"),
+            })
+            if self.include_markdown:
+                row["markdown"] = result.get("markdown")
+        except Exception as e:
+            logger.exception(f"[Batch] Analysis failed for {url}")
+            row.update({"status": "failed", "error": str(e), "error_type": type(e).__name__})
+        row["elapsed"] = round(time.perf_counter() - started, 3)
+        return row
+
+    def _record(self, out, row: Dict[str, Any]):
+        with self._write_lock:
+            out.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+            self.latencies.append(row["elapsed"])
+            if row["status"] == "ok":
+                self.succeeded += 1
+            else:
+                self.failures[row.get("error_type") or "unknown"] += 1
+            logger.info(f"[Batch] {row['status']} {row['url']} in {row['elapsed']:.2f}s")
+
+    def run(self, urls: Iterator[str], skip: Set[str]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        skipped = 0
+        seen = set()
+        with open(self.output_path, "a", encoding="utf8") as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+            in_flight = set()
+            for url in urls:
+                if url in skip or url in seen:
+                    skipped += 1
+                    continue
+                seen.add(url)
+                # Keep the input streaming: never hold more than 2x concurrency pending futures
+                while len(in_flight) >= self.concurrency * 2:
+                    _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                future = pool.submit(self._analyze, url)
+                # Results are written as soon as each URL finishes, in completion order
+                future.add_done_callback(lambda f: self._record(out, f.result()))
+                in_flight.add(future)
+            wait(in_flight)
+
+        return self.summary(time.perf_counter() - started, skipped)
+
+    def summary(self, elapsed: float, skipped: int) -> Dict[str, Any]:
+        processed = len(self.latencies)
+        latencies = sorted(self.latencies)
+        pick = lambda q: latencies[min(processed - 1, int(q * processed))] if processed else 0.0
+        return {
+            "processed": processed,
+            "succeeded": self.succeeded,
+            "failed": processed - self.succeeded,
+            "skipped": skipped,
+            "failures": dict(self.failures),
+            "elapsed_seconds": round(elapsed, 2),
+            "throughput_per_minute": round(processed / elapsed * 60, 2) if elapsed else 0.0,
+            "latency_p50": pick(0.5),
+            "latency_p95": pick(0.95),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze many product URLs and write one JSON result per line")
+    parser.add_argument("input", help="file with one URL or JSON object with a 'url' per line, or '-' for stdin")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSONL output; also the resume checkpoint")
+    parser.add_argument("-c", "--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--drivers", type=int, help="Chrome pool size for the browser fallback (default: concurrency)")
+    parser.add_argument("--pipeline-mode", choices=["standard", "single_call"])
+    parser.add_argument("--refresh", action="store_true", help="ignore cached reports")
+    parser.add_argument("--retry-failed", action="store_true", help="re-run URLs whose previous result failed")
+    parser.add_argument("--no-markdown", action="store_true", help="leave the report text out of the output")
+    args = parser.parse_args()
+
+    # Imported here so `--help` works without Chrome or API keys
+    from data_fetcher import DataFetcher
+    from llm_response import LLMResponse
+    from driver_manager import DriverManager
+    from review_fetcher import ReviewFetcher
+
+    driver_manager = DriverManager(pool_size=args.drivers or args.concurrency)
+    runner = BatchRunner(
+        LLMResponse(), DataFetcher(driver_manager=driver_manager), ReviewFetcher(), args.output,
+        concurrency=args.concurrency, use_cache=not args.refresh, pipeline_mode=args.pipeline_mode,
+        include_markdown=not args.no_markdown,
+    )
+    skip = load_checkpoint(args.output, args.retry_failed)
+    if skip:
+        logger.info(f"[Batch] Resuming: {len(skip)} URLs already in {args.output}")
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf8")
+    try:
+        summary = runner.run(read_urls(source), skip)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        driver_manager.shutdown_driver()
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,238 @@
+# --- benchmark.py ---
+import os
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List
+from logger_util import setup_logger
+from standins import fake_groq_server, fake_serpapi_server, fixture_server
+
+logger = setup_logger(__name__)
+
+BENCH_RESULTS_DIR = os.getenv("BENCH_RESULTS_DIR", "bench_results")
+
+
+class Timings:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def add(self, name: str, seconds: float):
+        self.samples.setdefault(name, []).append(seconds)
+
+    @contextmanager
+    def time(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for name, values in sorted(self.samples.items()):
+            ordered = sorted(values)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            result[name] = {
+                "n": len(ordered),
+                "mean": round(sum(ordered) / len(ordered), 5),
+                "p50": round(pick(0.5), 5),
+                "p95": round(pick(0.95), 5),
+                "min": round(ordered[0], 5),
+                "max": round(ordered[-1], 5),
+            }
+        return result
+
+
+def git_revision() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except Exception:
+        return {"commit": None, "dirty": None}
+
+
+def start_standins(args) -> Dict[str, Any]:
+    """
+    Starts the fixture, SerpAPI and Groq stand-ins and points the app's
+    configuration at them. Must run before the app modules are imported,
+    since they read their settings at import time.
+    """
+    servers = {
+        "pages": fixture_server.start_server(0, fixture_server.FixtureConfig(
+            args.fixtures, latency=args.page_latency, review_pages=args.review_pages)),
+        "serpapi": fake_serpapi_server.start_server(0, fake_serpapi_server.FakeSerpApiConfig(args.serp_latency)),
+        "groq": fake_groq_server.start_server(0, fake_groq_server.FakeGroqConfig(args.groq_latency, args.groq_tps)),
+    }
+
+    state_dir = tempfile.mkdtemp(prefix="shopintel-bench-")
+    os.environ.update({
+        "SERP_API_URL": f"http://127.0.0.1:{servers['serpapi'].server_address[1]}/search",
+        "SERP_API_KEY": "bench",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{servers['groq'].server_address[1]}",
+        "GROQ_API_KEY": "bench",
+        "REVIEW_MAX_PAGES": str(args.review_pages),
+        # Keep the benchmark's caches away from the real ones
+        "SERP_CACHE_DB": os.path.join(state_dir, "serpapi.sqlite"),
+        "LLM_CACHE_DB": os.path.join(state_dir, "llm.sqlite"),
+        "CATEGORY_INDEX_DB": os.path.join(state_dir, "category_index.sqlite"),
+        "CHAT_HISTORY_DB": os.path.join(state_dir, "history.sqlite"),
+    })
+    if not args.warm:
+        # Cold runs: every SerpAPI query and LLM call goes to the stand-ins
+        os.environ.update({"SERP_CACHE_TTL_GOOGLE": "0", "SERP_CACHE_TTL_YOUTUBE": "0",
+                           "LLM_CACHE_MAX_TEMPERATURE": "-1"})
+    return servers
+
+
+def product_urls(args, servers) -> List[str]:
+    pids = args.products or servers["pages"].config.recorded_pids() or [f"BENCH{i:04d}" for i in range(5)]
+    urls = []
+    for i in range(args.iterations):
+        pid = pids[i % len(pids)]
+        # Warm runs revisit the same URLs; cold runs give each iteration its own
+        urls.append(fixture_server.product_url(servers["pages"], pid if args.warm else f"{pid}-{i}"))
+    return urls
+
+
+def bench_fetchers(timings: Timings, urls: List[str], data_fetcher, review_fetcher):
+    for url in urls:
+        with timings.time("data_fetcher.fetch_product_info"):
+            info = data_fetcher.fetch_product_info(url)
+        if not info or info.get("error"):
+            logger.warning(f"[Bench] No product info for {url}: {info}")
+            continue
+        with timings.time("review_fetcher.get_reviews_from_url"):
+            review_fetcher.get_reviews_from_url(url)
+        with timings.time("data_fetcher.fetch_similar_items"):
+            data_fetcher.fetch_similar_items(info.get("title", ""))
+        with timings.time("data_fetcher.fetch_youtube_videos"):
+            data_fetcher.fetch_youtube_videos(info.get("title", ""))
+
+
+def bench_prompts(timings: Timings, total_infos: List[Dict[str, Any]], repeat: int):
+    from prompt import generate_llm_report, chat_prompt
+
+    history = "\n".join(
+        f"--- Conversation {i} ---\nQuestion:\nIs it worth the price?\nAssistant Response:\n{'Yes, mostly. ' * 40}\n"
+        for i in range(1, 4)
+    )
+    for total_info in total_infos:
+        for _ in range(repeat):
+            with timings.time("prompt.generate_llm_report"):
+                generate_llm_report(total_info)
+            with timings.time("prompt.chat_prompt"):
+                chat_prompt(total_info, history, "How is the battery life compared to the alternatives?")
+
+
+def bench_pipeline(timings: Timings, urls: List[str], mode: str, llm_handler, data_fetcher,
+                   review_fetcher, use_cache: bool) -> List[Dict[str, Any]]:
+    total_infos = []
+    for url in urls:
+        started = time.perf_counter()
+        result = llm_handler.analyze(url, data_fetcher, review_fetcher, use_cache=use_cache, pipeline_mode=mode)
+        if "error" in result:
+            logger.warning(f"[Bench] {mode} pipeline failed for {url}: {result['error']}")
+            timings.add(f"llm_response.run.{mode}.failed", time.perf_counter() - started)
+            continue
+        # LLMResponse.run is analyze() minus the metadata, so this is its end-to-end time
+        timings.add(f"llm_response.run.{mode}", time.perf_counter() - started)
+        for stage, seconds in result.get("timings", {}).items():
+            timings.add(f"pipeline.{mode}.{stage}", seconds)
+        total_infos.append(result["total_info"])
+    return total_infos
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    lines = [f"{'metric':48} {'base p50':>10} {'p50':>10} {'change':>8}"]
+    for name, row in current["metrics"].items():
+        base = baseline.get("metrics", {}).get(name)
+        if not base or not base["p50"]:
+            continue
+        change = (row["p50"] - base["p50"]) / base["p50"]
+        lines.append(f"{name:48} {base['p50']:10.4f} {row['p50']:10.4f} {change:+8.1%}")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of the analysis pipeline against local stand-ins")
+    parser.add_argument("-n", "--iterations", type=int, default=5, help="product URLs per measured section")
+    parser.add_argument("--products", nargs="*", help="fixture pids to use (default: recorded fixtures, else synthetic)")
+    parser.add_argument("--fixtures", default=fixture_server.FIXTURE_DIR, help="recorded pages, see standins/fixture_server.py record")
+    parser.add_argument("--modes", nargs="+", default=["standard", "single_call"], choices=["standard", "single_call"])
+    parser.add_argument("--warm", action="store_true", help="keep the SerpAPI, LLM and report caches on")
+    parser.add_argument("--browser", action="store_true", help="load product pages in headless Chrome instead of over HTTP")
+    parser.add_argument("--page-latency", type=float, default=0.05)
+    parser.add_argument("--review-pages", type=int, default=5)
+    parser.add_argument("--serp-latency", type=float, default=0.3)
+    parser.add_argument("--groq-latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--groq-tps", type=float, default=200.0, help="tokens per second after the first")
+    parser.add_argument("--prompt-repeat", type=int, default=20)
+    parser.add_argument("-o", "--output", help="results JSON (default: bench_results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to diff p50s against")
+    args = parser.parse_args()
+
+    servers = start_standins(args)
+
+    # Imported after the stand-ins are configured so module-level settings pick them up
+    from data_fetcher import DataFetcher
+    from review_fetcher import ReviewFetcher
+    from llm_response import LLMResponse
+
+    driver_manager = None
+    if args.browser:
+        from driver_manager import DriverManager
+        driver_manager = DriverManager(pool_size=1)
+
+    timings = Timings()
+    try:
+        data_fetcher = DataFetcher(http_first=not args.browser, driver_manager=driver_manager)
+        review_fetcher = ReviewFetcher()
+        llm_handler = LLMResponse()
+
+        urls = product_urls(args, servers)
+        started = time.perf_counter()
+        bench_fetchers(timings, urls, data_fetcher, review_fetcher)
+        total_infos = []
+        for mode in args.modes:
+            total_infos += bench_pipeline(timings, product_urls(args, servers), mode, llm_handler,
+                                          data_fetcher, review_fetcher, use_cache=args.warm)
+        bench_prompts(timings, total_infos[:len(urls)], args.prompt_repeat)
+        elapsed = time.perf_counter() - started
+    finally:
+        if driver_manager:
+            driver_manager.shutdown_driver()
+        for server in servers.values():
+            server.shutdown()
+
+    results = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "elapsed_seconds": round(elapsed, 2),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "requests": {name: server.config.requests for name, server in servers.items()},
+        "metrics": timings.summary(),
+    }
+
+    output = args.output or os.path.join(BENCH_RESULTS_DIR, f"{results['meta']['commit'] or 'results'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf8") as f:
+        json.dump(results, f, indent=2)
+
+    for name, row in results["metrics"].items():
+        print(f"{name:48} p50 {row['p50']:8.4f}s  p95 {row['p95']:8.4f}s  n={row['n']}")
+    print(f"Requests: {results['requests']}  ->  {output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf8") as f:
+            print("\n".join(compare(results, json.load(f))))
@@ -0,0 +1,182 @@
+# --- cache_store.py ---
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from logger_util import setup_logger
+import metrics
+
+logger = setup_logger(__name__)
+
+_MISSING = object()
+
+# Disk-tier housekeeping: access times are buffered in memory and written in one batch,
+# and expired or least recently used rows are pruned now and then rather than on every set
+CACHE_TOUCH_FLUSH_SECONDS = float(os.getenv("CACHE_TOUCH_FLUSH_SECONDS", "30"))
+CACHE_PRUNE_SECONDS = float(os.getenv("CACHE_PRUNE_SECONDS", "60"))
+CACHE_PRUNE_WRITES = int(os.getenv("CACHE_PRUNE_WRITES", "100"))
+
+
+class TTLCache:
+    """
+    Thread-safe key/value cache with per-entry TTL and LRU eviction.
+
+    Entries live in an in-memory tier capped at `max_entries`. When `db_path`
+    is given, entries are also written to a SQLite file (capped at
+    `max_disk_entries`) so they survive restarts; disk hits are promoted back
+    into memory. Values must be JSON-serializable. Reads never write to
+    SQLite directly: access times are flushed in batches, and the disk tier
+    is pruned every CACHE_PRUNE_WRITES sets or CACHE_PRUNE_SECONDS, so it
+    can briefly hold more than `max_disk_entries` rows.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 256,
+                 db_path: Optional[str] = None, max_disk_entries: Optional[int] = None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries or max_entries * 10
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._touched: Dict[str, float] = {}  # key -> last access not yet written to disk
+        self._last_flush = time.time()
+        self._last_prune = time.time()
+        self._writes_since_prune = 0
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at)")
+                self._db.commit()
+                logger.info(f"[Cache:{self.name}] Using on-disk tier at {db_path}")
+            except Exception as e:
+                logger.warning(f"[Cache:{self.name}] Could not open on-disk tier {db_path}: {e}")
+                self._db = None
+
+    def _disk_get(self, key: str, now: float):
+        row = self._db.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return _MISSING
+        value, expires_at = row
+        if expires_at <= now:
+            return _MISSING  # removed by the next prune
+        self._touch(key, now)
+        value = json.loads(value)
+        self._remember(key, value, expires_at)
+        return value
+
+    def _touch(self, key: str, now: float):
+        if self._db is None:
+            return
+        self._touched[key] = now
+        if now - self._last_flush >= CACHE_TOUCH_FLUSH_SECONDS:
+            try:
+                self._flush_touches(now)
+                self._db.commit()
+            except Exception as e:
+                logger.warning(f"[Cache:{self.name}] On-disk access time update failed: {e}")
+
+    def _flush_touches(self, now: float):
+        if self._touched:
+            self._db.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?",
+                                 [(accessed_at, key) for key, accessed_at in self._touched.items()])
+            self._touched.clear()
+        self._last_flush = now
+
+    def _prune(self, now: float):
+        self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count > self.max_disk_entries:
+            self._db.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_disk_entries,)
+            )
+        self._last_prune = now
+        self._writes_since_prune = 0
+
+    def _disk_set(self, key: str, value: Any, expires_at: float, now: float):
+        self._touched.pop(key, None)
+        self._db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), expires_at, now)
+        )
+        self._writes_since_prune += 1
+        # Buffered access times go out with the write so the prune sees current LRU order
+        self._flush_touches(now)
+        if self._writes_since_prune >= CACHE_PRUNE_WRITES or now - self._last_prune >= CACHE_PRUNE_SECONDS:
+            self._prune(now)
+        self._db.commit()
+
+    def _remember(self, key: str, value: Any, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                # Keeps the disk copy of a hot entry from being pruned as least recently used
+                self._touch(key, now)
+                self.hits += 1
+                metrics.inc("cache_requests_total", cache=self.name, result="hit", tier="memory")
+                return entry[1]
+            if entry:
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    value = self._disk_get(key, now)
+                    if value is not _MISSING:
+                        self.hits += 1
+                        metrics.inc("cache_requests_total", cache=self.name, result="hit", tier="disk")
+                        return value
+                except Exception as e:
+                    logger.warning(f"[Cache:{self.name}] On-disk read failed: {e}")
+
+            self.misses += 1
+            metrics.inc("cache_requests_total", cache=self.name, result="miss")
+            return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                try:
+                    self._disk_set(key, value, expires_at, now)
+                except Exception as e:
+                    logger.warning(f"[Cache:{self.name}] On-disk write failed: {e}")
+
+    def delete(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._touched.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -1,74 +1,185 @@
 # --- chat_manager.py ---
 import os
-import pandas as pd
+import csv
+import time
+import sqlite3
+import threading
 from datetime import datetime
+from typing import Dict, List, Optional
+from url_utils import product_key
 from logger_util import setup_logger
 
 logger = setup_logger(__name__)
 
+CHAT_HISTORY_DB = os.getenv("CHAT_HISTORY_DB", os.path.join("chat_logs", "history.sqlite"))
+CHAT_HISTORY_LEGACY_CSV = os.path.join("chat_logs", "history.csv")
+# Turns kept per URL once the compactor has run; 0 keeps everything
+CHAT_HISTORY_RETAIN = int(os.getenv("CHAT_HISTORY_RETAIN", "3"))
+CHAT_HISTORY_COMPACT_INTERVAL = float(os.getenv("CHAT_HISTORY_COMPACT_INTERVAL", "300"))
+
+
 class ChatHistoryManager:
-    def __init__(self):
-        self.history_dir = "chat_logs"
-        self.filename = "history.csv"
-        self.filepath = os.path.join(self.history_dir, self.filename)
-        os.makedirs(self.history_dir, exist_ok=True)
-        self.columns = ["timestamp", "url", "question", "conversation_response"]
-
-    def _read_history(self) -> pd.DataFrame:
-        if not os.path.exists(self.filepath):
-            return pd.DataFrame(columns=self.columns)
-        try:
-            df = pd.read_csv(self.filepath)
-            missing = set(self.columns) - set(df.columns)
-            if missing:
-                logger.warning(f"History file is missing columns: {missing}. Resetting.")
-                return pd.DataFrame(columns=self.columns)
-            return df
-        except Exception as e:
-            logger.warning(f"Failed to read chat history: {e}")
-            return pd.DataFrame(columns=self.columns)
+    """
+    Chat turns stored in an append-only SQLite table (WAL mode) indexed by
+    (url, id). Appends are a single INSERT and `get_last_n` is an index range
+    scan; trimming old turns is left to a background compactor so the chat
+    request path never rewrites history.
+    """
+
+    def __init__(self, db_path: str = CHAT_HISTORY_DB, retain_last_n: int = CHAT_HISTORY_RETAIN,
+                 compact_interval: float = CHAT_HISTORY_COMPACT_INTERVAL):
+        self.db_path = db_path
+        self.retain_last_n = retain_last_n
+        self.compact_interval = compact_interval
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, url TEXT NOT NULL, "
+            "question TEXT NOT NULL, conversation_response TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_url ON history(url, id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+        self._migrate_csv(CHAT_HISTORY_LEGACY_CSV)
+        self._rekey_raw_urls()
+
+        self._stop = threading.Event()
+        if compact_interval > 0 and retain_last_n > 0:
+            threading.Thread(target=self._compact_loop, name="chat-history-compactor", daemon=True).start()
+
+    def _migrate_csv(self, csv_path: str):
+        """
+        One-time import of the old pandas-written history.csv. A marker in the
+        meta table keeps it from running again.
+        """
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone():
+                return
+            rows = []
+            if os.path.exists(csv_path):
+                try:
+                    with open(csv_path, "r", encoding="utf8", newline="") as f:
+                        for row in csv.DictReader(f):
+                            if row.get("url"):
+                                rows.append((row.get("timestamp") or "", product_key(row["url"]),
+                                             row.get("question") or "", row.get("conversation_response") or ""))
+                except Exception as e:
+                    logger.warning(f"[ChatHistory] Failed to read legacy history {csv_path}: {e}")
+                    return
+            # Insert oldest first so row ids follow conversation order
+            rows.sort(key=lambda r: r[0])
+            self._db.executemany(
+                "INSERT INTO history (timestamp, url, question, conversation_response) VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.execute("INSERT INTO meta (key, value) VALUES ('csv_migrated', ?)", (datetime.utcnow().isoformat(),))
+            self._db.commit()
+            if rows:
+                logger.info(f"[ChatHistory] Migrated {len(rows)} turns from {csv_path}")
+
+    def _rekey_raw_urls(self):
+        """
+        One-time move of turns stored under the raw page URL (before history
+        was keyed by product) to their product key, so existing conversations
+        stay visible to the chat.
+        """
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM meta WHERE key = 'urls_rekeyed'").fetchone():
+                return
+            urls = [row[0] for row in self._db.execute("SELECT DISTINCT url FROM history WHERE url LIKE 'http%'")]
+            updates = [(product_key(url), url) for url in urls if product_key(url) != url]
+            self._db.executemany("UPDATE history SET url = ? WHERE url = ?", updates)
+            self._db.execute("INSERT INTO meta (key, value) VALUES ('urls_rekeyed', ?)", (datetime.utcnow().isoformat(),))
+            self._db.commit()
+            if updates:
+                logger.info(f"[ChatHistory] Re-keyed turns for {len(updates)} URLs to product keys")
 
-    def append(self, url: str, question: str, conversation_response: str, retain_last_n: int = 3):
+    def append(self, url: str, question: str, conversation_response: str, retain_last_n: Optional[int] = None):
+        # retain_last_n is accepted for compatibility; retention is applied by the compactor
         if not url:
             logger.warning("No URL provided. Skipping append.")
             return
 
-        timestamp = datetime.utcnow().isoformat()
-        new_row = pd.DataFrame([{
-            "timestamp": timestamp,
-            "url": url,
-            "question": question or "",
-            "conversation_response": conversation_response or ""
-        }])
-
-        history_df = self._read_history()
-        history_df = pd.concat([history_df, new_row], ignore_index=True)
-        filtered = history_df[history_df["url"] == url].sort_values("timestamp").tail(retain_last_n)
-        other_urls = history_df[history_df["url"] != url]
-        final_df = pd.concat([other_urls, filtered], ignore_index=True)
-
         try:
-            final_df.to_csv(self.filepath, index=False)
+            with self._lock:
+                timestamp = datetime.utcnow().isoformat()
+                self._db.execute(
+                    "INSERT INTO history (timestamp, url, question, conversation_response) VALUES (?, ?, ?, ?)",
+                    (timestamp, url, question or "", conversation_response or "")
+                )
+                self._db.commit()
         except Exception as e:
             logger.error(f"Failed to save chat history: {e}")
 
+    def get_turns(self, url: str, n: int = 3) -> List[Dict[str, str]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT timestamp, question, conversation_response FROM history "
+                "WHERE url = ? ORDER BY id DESC LIMIT ?", (url, n)
+            ).fetchall()
+        return [
+            {"timestamp": ts, "question": q, "conversation_response": r}
+            for ts, q, r in reversed(rows)
+        ]
+
     def get_last_n(self, url: str, n: int = 3) -> str:
         if not url:
             return "No URL provided."
 
-        history_df = self._read_history()
-        url_df = history_df[history_df["url"] == url].sort_values("timestamp").tail(n)
+        try:
+            turns = self.get_turns(url, n)
+        except Exception as e:
+            logger.warning(f"Failed to read chat history: {e}")
+            turns = []
 
-        if url_df.empty:
+        if not turns:
             return "No previous history available for this product."
 
         result = []
-        for i, row in enumerate(url_df.to_dict(orient="records"), 1):
+        for i, row in enumerate(turns, 1):
             formatted = (
                 f"--- Conversation {i} ({row['timestamp']}) ---\n"
-                f"Question:\n{row.get('question', '').strip()}\n"
-                f"Assistant Response:\n{row.get('conversation_response', '').strip()}\n"
+                f"Question:\n{row['question'].strip()}\n"
+                f"Assistant Response:\n{row['conversation_response'].strip()}\n"
             )
             result.append(formatted)
 
         return "\n".join(result)
+
+    def compact(self) -> int:
+        """
+        Deletes all but the newest `retain_last_n` turns for every URL and
+        returns the number of rows removed.
+        """
+        if self.retain_last_n <= 0:
+            return 0
+        start = time.perf_counter()
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM history WHERE id IN ("
+                "SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY url ORDER BY id DESC) AS rn FROM history) "
+                "WHERE rn > ?)", (self.retain_last_n,)
+            )
+            self._db.commit()
+            removed = cursor.rowcount
+            if removed:
+                self._db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        if removed:
+            logger.info(f"[ChatHistory] Compacted {removed} old turns in {time.perf_counter() - start:.3f}s")
+        return removed
+
+    def _compact_loop(self):
+        while not self._stop.wait(self.compact_interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.warning(f"[ChatHistory] Compaction failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            self._db.close()
@@ -13,6 +13,100 @@ document.addEventListener("DOMContentLoaded", () => {
 
   let currentURL = "";
 
+  // Stable per-browser id so the server keeps this user's product context and chat history apart
+  const sessionIdPromise = new Promise((resolve) => {
+    chrome.storage.local.get("sessionId", (data) => {
+      if (data.sessionId) {
+        resolve(data.sessionId);
+        return;
+      }
+      const sessionId = crypto.randomUUID();
+      chrome.storage.local.set({ sessionId });
+      resolve(sessionId);
+    });
+  });
+
+  // POSTs to an SSE endpoint and calls onToken with the text so far as tokens arrive.
+  // Resolves with the final "done" payload, rejects on an "error" event.
+  const streamSSE = async (endpoint, payload, onToken) => {
+    const response = await fetch(endpoint, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(payload)
+    });
+    if (!response.ok || !response.body) {
+      const result = await response.json().catch(() => ({}));
+      throw new Error(result.error || `HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let text = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let event = "message";
+        let data = "";
+        for (const line of rawEvent.split("\n")) {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) data += line.slice(5).trim();
+        }
+        const parsed = data ? JSON.parse(data) : {};
+
+        if (event === "token") {
+          text += parsed.text;
+          onToken(text);
+        } else if (event === "error") {
+          throw new Error(parsed.error || parsed);
+        } else if (event === "done") {
+          return { ...parsed, text };
+        }
+      }
+    }
+    return { text };
+  };
+
+  // Polls an analysis job until it finishes, passing every snapshot to onUpdate
+  const pollJob = async (jobId, onUpdate, intervalMs = 750) => {
+    while (true) {
+      const response = await fetch(`http://127.0.0.1:4000/jobs/${jobId}`);
+      const job = await response.json();
+      if (!response.ok) {
+        throw new Error(job.error || `HTTP ${response.status}`);
+      }
+      onUpdate(job);
+      if (job.status === "done" || job.status === "failed") {
+        return job;
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  };
+
+  // Re-render markdown at most once per animation frame while streaming
+  const renderer = (element) => {
+    let pending = null;
+    return (markdown) => {
+      if (pending !== null) {
+        pending = markdown;
+        return;
+      }
+      pending = markdown;
+      requestAnimationFrame(() => {
+        element.innerHTML = marked.parse(pending);
+        pending = null;
+      });
+    };
+  };
+
   chrome.tabs.query({ active: true, currentWindow: true }, (tabs) => {
     if (tabs && tabs.length > 0) {
       currentURL = tabs[0].url;
@@ -43,34 +137,51 @@ document.addEventListener("DOMContentLoaded", () => {
 
     try {
       const [tab] = await chrome.tabs.query({ active: true, currentWindow: true });
-      console.log("[Popup] Sending request to /analyze-url for:", tab.url);
+      console.log("[Popup] Submitting analysis job for:", tab.url);
 
-      const response = await fetch("http://127.0.0.1:4000/analyze-url", {
+      const response = await fetch("http://127.0.0.1:4000/jobs", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ url: tab.url })
+        body: JSON.stringify({ url: tab.url, session_id: await sessionIdPromise })
       });
+      const submitted = await response.json();
+      if (!response.ok) {
+        throw new Error(submitted.error || `HTTP ${response.status}`);
+      }
+      console.log("[Popup] Job queued:", submitted.job_id, submitted.deduplicated ? "(joined existing job)" : "");
 
-      const result = await response.json();
-      console.log("[Popup] Received response from server:", result);
+      const render = renderer(output);
+      const job = await pollJob(submitted.job_id, (update) => {
+        const running = Object.entries(update.stages || {})
+          .filter(([, status]) => status === "running")
+          .map(([stage]) => stage.replace(/_/g, " "));
+        if (update.status === "queued") {
+          loading.innerHTML = '<div class="loading-spinner"></div>Waiting in queue...';
+        } else if (!update.markdown) {
+          loading.innerHTML = `<div class="loading-spinner"></div>Analyzing page${running.length ? ` (${running.join(", ")})` : ""}...`;
+        } else {
+          loading.innerHTML = "";
+          render(update.markdown);
+        }
+      });
       loading.innerHTML = "";
       analyzeBtn.disabled = false;
 
-      if (result.markdown) {
-        const markdown = result.markdown;
+      if (job.status === "done" && job.markdown) {
+        const markdown = job.markdown;
         output.innerHTML = marked.parse(markdown);
         chrome.storage.local.set({ cachedMarkdown: markdown });
         startChatBtn.style.display = "block";
         console.log("[Popup] Markdown displayed and cached.");
       } else {
-        output.innerHTML = `<div class="error">Error: ${result.error}</div>`;
-        console.warn("[Popup] Error from server:", result.error);
+        output.innerHTML = `<div class="error">Error: ${job.error || "Analysis failed"}</div>`;
+        console.warn("[Popup] Job failed:", job.error);
       }
     } catch (err) {
       loading.innerHTML = "";
       analyzeBtn.disabled = false;
-      output.innerHTML = `<div class="error">Failed to connect to server</div>`;
-      console.error("[Popup] Fetch to /analyze-url failed:", err);
+      output.innerHTML = `<div class="error">Error: ${err.message || "Failed to connect to server"}</div>`;
+      console.error("[Popup] Analysis job failed:", err);
     }
   });
 
@@ -106,30 +217,32 @@ document.addEventListener("DOMContentLoaded", () => {
     chatHistory.scrollTop = chatHistory.scrollHeight;
 
     try {
-      const response = await fetch("http://127.0.0.1:4000/chat", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ url: currentURL, question })
-      });
-
-      const data = await response.json();
-      console.log("[Popup] Chat response received:", data);
-      
-      // Remove loading indicator
-      chatHistory.removeChild(loadingDiv);
-      
-      // Add assistant response as rendered markdown
       const assistantDiv = document.createElement('div');
       assistantDiv.className = 'chat-message assistant-message';
-      assistantDiv.innerHTML = marked.parse(data.answer || "No response");
-      chatHistory.appendChild(assistantDiv);
-      
+      const render = renderer(assistantDiv);
+
+      const payload = { url: currentURL, question, session_id: await sessionIdPromise };
+      const result = await streamSSE("http://127.0.0.1:4000/chat/stream", payload, (markdown) => {
+        if (loadingDiv.parentNode) {
+          chatHistory.replaceChild(assistantDiv, loadingDiv);
+        }
+        render(markdown);
+        chatHistory.scrollTop = chatHistory.scrollHeight;
+      });
+      console.log("[Popup] Chat stream finished");
+
+      if (loadingDiv.parentNode) {
+        chatHistory.replaceChild(assistantDiv, loadingDiv);
+      }
+      assistantDiv.innerHTML = marked.parse(result.text || "No response");
       chatHistory.scrollTop = chatHistory.scrollHeight;
     } catch (err) {
-      console.error("[Popup] Fetch to /chat failed:", err);
+      console.error("[Popup] Streaming /chat/stream failed:", err);
       
       // Remove loading indicator
-      chatHistory.removeChild(loadingDiv);
+      if (loadingDiv.parentNode) {
+        chatHistory.removeChild(loadingDiv);
+      }
       
       // Add error message
       const errorDiv = document.createElement('div');
@@ -0,0 +1,108 @@
+# --- context_store.py ---
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from url_utils import product_key
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+CONTEXT_STORE_MAX_ENTRIES = int(os.getenv("CONTEXT_STORE_MAX_ENTRIES", "200"))
+CONTEXT_STORE_MAX_BYTES = int(os.getenv("CONTEXT_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+CONTEXT_STORE_TTL = float(os.getenv("CONTEXT_STORE_TTL", "21600"))
+
+
+class ProductContextStore:
+    """
+    In-memory `total_info` per analyzed product, so chat turns only need a
+    lookup plus one LLM call.
+
+    Entries are keyed by (session id, canonical product id). An analysis
+    stores a shared entry under the product id and, when the extension sends
+    a session id, a pinned entry for that session so its chat keeps answering
+    from the data it was shown even if someone else refreshes the product.
+    Bounded by entry count and approximate serialized size, evicting least
+    recently used entries first. A pinned entry and the shared entry usually
+    hold the same object, so each distinct payload is counted once.
+    """
+
+    def __init__(self, max_entries: int = CONTEXT_STORE_MAX_ENTRIES,
+                 max_bytes: int = CONTEXT_STORE_MAX_BYTES, ttl: float = CONTEXT_STORE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()  # key -> (expires_at, size, total_info)
+        self._bytes = 0
+        self._payloads: Dict[int, list] = {}  # id(total_info) -> [size, entries holding it]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(url: str, session_id: Optional[str] = None) -> Tuple[str, str]:
+        return (session_id or "", product_key(url))
+
+    def _remove(self, key: Tuple[str, str]):
+        _, size, total_info = self._entries.pop(key)
+        payload = self._payloads[id(total_info)]
+        payload[1] -= 1
+        if not payload[1]:
+            del self._payloads[id(total_info)]
+            self._bytes -= size
+
+    def _put(self, key: Tuple[str, str], total_info: Dict[str, Any], size: int, expires_at: float):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, size, total_info)
+        payload = self._payloads.setdefault(id(total_info), [size, 0])
+        payload[1] += 1
+        if payload[1] == 1:
+            self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            evicted = next(iter(self._entries))
+            self._remove(evicted)
+            self.evictions += 1
+            logger.debug(f"[Context] Evicted {evicted}")
+
+    def put(self, url: str, total_info: Dict[str, Any], session_id: Optional[str] = None):
+        if not total_info:
+            return
+        size = len(json.dumps(total_info, default=str))
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._put(self.key(url), total_info, size, expires_at)
+            if session_id:
+                self._put(self.key(url, session_id), total_info, size, expires_at)
+
+    def get(self, url: str, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        keys = [self.key(url, session_id), self.key(url)] if session_id else [self.key(url)]
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if not entry:
+                    continue
+                if entry[0] <= now:
+                    self._remove(key)
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,29 +1,118 @@
 # --- data_fetcher.py ---
 import time
 import os
-import requests
-from typing import List, Dict, Optional, Any
+import threading
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, List, Dict, Optional, Any, Tuple
 from dotenv import load_dotenv
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.common.exceptions import StaleElementReferenceException
-from logger_util import setup_logger
-
+from bs4 import BeautifulSoup
+from logger_util import setup_logger, log_payload
+from cache_store import TTLCache
+from http_client import get_http_client
+from single_flight import SingleFlight
+import metrics
+from product_parser import (
+    parse_product_html, parse_product_soup, has_product_markers, is_blocked_page, SPECS_CONTAINER_SELECTOR,
+    RATING_BREAKDOWN_SELECTOR
+)
+
+if TYPE_CHECKING:
+    import undetected_chromedriver as uc
 
 logger = setup_logger(__name__)
 load_dotenv()
 
+# Selenium is only needed by the browser fallback, so it is imported on first use (see load_selenium)
+By = WebDriverWait = EC = None
+NoSuchElementException = TimeoutException = StaleElementReferenceException = None
+
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "snapshot")
+HTTP_FIRST_FETCH = os.getenv("HTTP_FIRST_FETCH", "true").lower() in ("1", "true", "yes")
+HTTP_FETCH_TIMEOUT = float(os.getenv("HTTP_FETCH_TIMEOUT", "10"))
+SERP_API_URL = os.getenv("SERP_API_URL", "https://serpapi.com/search")
+# SerpAPI results cache: shopping prices go stale much faster than YouTube results
+SERP_CACHE_TTLS = {
+    "google": float(os.getenv("SERP_CACHE_TTL_GOOGLE", "21600")),
+    "youtube": float(os.getenv("SERP_CACHE_TTL_YOUTUBE", "604800")),
+}
+SERP_CACHE_MAX_ENTRIES = int(os.getenv("SERP_CACHE_MAX_ENTRIES", "2000"))
+SERP_CACHE_DB = os.getenv("SERP_CACHE_DB", "cache/serpapi.sqlite")
+
+# Lazily rendered sections the element path waits for; the snapshot waits for the same ones
+SNAPSHOT_WAIT_SELECTORS = {
+    "Technical specification container": SPECS_CONTAINER_SELECTOR,
+    "Rating breakdown": RATING_BREAKDOWN_SELECTOR,
+}
+
+# Fields the static page must yield before the browser is skipped
+STATIC_REQUIRED_FIELDS = ("title", "price")
+
+HTTP_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+        'AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/114.0.0.0 Safari/537.36'
+    ),
+    'Accept-Language': 'en-US,en;q=0.5'
+}
+
+
+def load_selenium():
+    global By, WebDriverWait, EC, NoSuchElementException, TimeoutException, StaleElementReferenceException
+    if By is not None:
+        return
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException
+
 
 class DataFetcher:
-    def __init__(self):
-        self.url = None
-        self.driver = None
+    def __init__(self, extraction_mode: str = EXTRACTION_MODE, http_first: bool = HTTP_FIRST_FETCH, driver_manager=None):
+        # url/driver are per-thread so concurrent requests can each hold their own browser
+        self._local = threading.local()
+        # "snapshot" parses one page_source locally; "elements" queries the driver per field
+        self.extraction_mode = extraction_mode
+        self.http_first = http_first
+        self.driver_manager = driver_manager
+        self.fetch_path_counts = Counter()
+        self._stats_lock = threading.Lock()
+        self.serp_cache = TTLCache("serpapi", ttl=SERP_CACHE_TTLS["google"],
+                                   max_entries=SERP_CACHE_MAX_ENTRIES, db_path=SERP_CACHE_DB or None)
+        self.serp_flight = SingleFlight("serpapi")
+        self.http = get_http_client()
+
+    @property
+    def url(self) -> Optional[str]:
+        return getattr(self._local, "url", None)
+
+    @url.setter
+    def url(self, value: Optional[str]):
+        self._local.url = value
+
+    @property
+    def driver(self) -> Optional["uc.Chrome"]:
+        return getattr(self._local, "driver", None)
+
+    @driver.setter
+    def driver(self, value: Optional["uc.Chrome"]):
+        self._local.driver = value
+
+    def _record_fetch_path(self, path: str):
+        metrics.inc("product_fetch_total", path=path)
+        with self._stats_lock:
+            self.fetch_path_counts[path] += 1
+            stats = self.fetch_path_stats()
+        logger.info(f"Product info served via '{path}' path (HTTP hit rate: {stats['http_hit_rate']:.0%})")
+
+    def fetch_path_stats(self) -> Dict[str, Any]:
+        total = sum(self.fetch_path_counts.values())
+        return {
+            **{path: self.fetch_path_counts.get(path, 0) for path in ("http", "browser", "failed")},
+            "http_hit_rate": self.fetch_path_counts.get("http", 0) / total if total else 0.0,
+        }
 
-    def fetch_product_info(self, url: str = None, driver: Optional[uc.Chrome] = None) -> Dict[str, Any]:
+    def fetch_product_info(self, url: str = None, driver: Optional["uc.Chrome"] = None) -> Dict[str, Any]:
         # Use provided URL or fallback to instance URL
         if url:
             self.url = url
@@ -33,11 +122,69 @@ class DataFetcher:
         if not self.url:
             logger.error("No URL provided for product info fetch")
             return {"error": "No URL provided"}
-            
+
+        if self.http_first:
+            with metrics.span("product_fetch", path="http"):
+                product_info = self._fetch_product_info_http()
+            if product_info:
+                self._record_fetch_path("http")
+                return product_info
+            metrics.inc("product_fetch_fallbacks_total")
+
+        if not self.driver and self.driver_manager:
+            # Only borrow a browser once the lightweight fetch has failed
+            with self.driver_manager.checkout() as borrowed:
+                self.driver = borrowed
+                try:
+                    return self._fetch_product_info_browser()
+                finally:
+                    self.driver = None
+
         if not self.driver:
             logger.error("No driver provided for product info fetch")
+            self._record_fetch_path("failed")
             return {"error": "No driver provided"}
 
+        return self._fetch_product_info_browser()
+
+    def _fetch_product_info_http(self) -> Dict[str, Any]:
+        logger.info(f"Fetching product info over HTTP from: {self.url}")
+        try:
+            response = self.http.get(self.url, headers=HTTP_HEADERS, timeout=HTTP_FETCH_TIMEOUT)
+            if response.status_code != 200:
+                logger.warning(f"HTTP product fetch returned status {response.status_code}, falling back to browser")
+                return {}
+            if is_blocked_page(response.text):
+                logger.warning("HTTP product fetch hit a robot check page, falling back to browser")
+                return {}
+
+            soup = BeautifulSoup(response.text, "html.parser")
+            if not has_product_markers(soup):
+                logger.warning("HTTP product page is missing product markers, falling back to browser")
+                return {}
+
+            product_info = parse_product_soup(soup)
+            missing = [field for field in STATIC_REQUIRED_FIELDS if not product_info.get(field)]
+            if missing:
+                logger.warning(f"HTTP product page is missing {missing}, falling back to browser")
+                return {}
+            return product_info
+        except Exception as e:
+            logger.warning(f"HTTP product fetch failed, falling back to browser: {e}")
+            return {}
+
+    def _fetch_product_info_browser(self) -> Dict[str, Any]:
+        load_selenium()
+        try:
+            with metrics.span("product_fetch", path="browser"):
+                product_info = self._fetch_with_driver()
+        except Exception:
+            self._record_fetch_path("failed")
+            raise
+        self._record_fetch_path("browser" if product_info and not product_info.get("error") else "failed")
+        return product_info
+
+    def _fetch_with_driver(self) -> Dict[str, Any]:
         logger.info(f"Fetching product info from: {self.url}")
         product_info = {}
 
@@ -47,36 +194,14 @@ class DataFetcher:
                 EC.presence_of_element_located((By.CLASS_NAME, "VU-ZEz"))
             )
 
-            product_info['title'] = self._safe_get_text(By.CLASS_NAME, "VU-ZEz", default=None)
-            product_info['price'] = self._safe_get_text(By.CSS_SELECTOR, "div.Nx9bqj.CxhGGd", default=None)
-            product_info['rating'] = self._safe_get_text(By.CLASS_NAME, "XQDdHH", default=None)
-
-            about_items = []
-            try:
-                elements = self.driver.find_elements(By.CSS_SELECTOR, "div.xFVion ul li")
-                for el in elements:
-                    try:
-                        text = el.text.strip()
-                        if text:
-                            about_items.append(text)
-                    except Exception as e:
-                        logger.warning(f"Stale or inaccessible element in 'about_this_item': {e}")
-                        continue
-            except Exception as e:
-                logger.warning(f"Failed to locate 'about_this_item' elements: {e}")
+            if self.extraction_mode == "snapshot":
+                product_info = self._extract_from_snapshot()
+                if product_info:
+                    logger.info("Product info fetched successfully from page snapshot")
+                    return product_info
+                logger.warning("Snapshot extraction failed, falling back to element extraction")
 
-            product_info['about_this_item'] = about_items
-
-            services = self.driver.find_elements(By.CSS_SELECTOR, "ul.C3EUFP li div.YhUgfO")
-            product_info['services'] = [item.text.strip() for item in services if item.text.strip()] or []
-
-            para = self.driver.find_elements(By.CSS_SELECTOR, "div.yN\\+eNk.w9jEaj p")
-            paragraphs = [p.text.strip() for p in para if p.text.strip()] or []
-            product_info['paragraph'] = paragraphs
-
-            product_info['technical_specifications'] = self._extract_tech_specs()
-            product_info['rating_breakdown'] = self.extract_rating_breakdown()
-            product_info['feature_ratings'] = self._extract_feature_ratings()
+            product_info = self._extract_from_elements()
             logger.info(f"Product info fetched successfully")
             return product_info
 
@@ -90,7 +215,61 @@ class DataFetcher:
 
         return product_info
 
-    def _safe_get_text(self, by: By, identifier: str, default: Optional[str] = None) -> Optional[str]:
+    def _extract_from_snapshot(self) -> Dict[str, Any]:
+        # One page_source round trip instead of one per element; parsed locally.
+        try:
+            for name, selector in SNAPSHOT_WAIT_SELECTORS.items():
+                try:
+                    WebDriverWait(self.driver, 10).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+                    )
+                except TimeoutException:
+                    logger.warning(f"{name} not found before snapshot.")
+
+            product_info = parse_product_html(self.driver.page_source)
+            if not product_info.get("title"):
+                logger.warning("Snapshot is missing the product title.")
+                return {}
+            return product_info
+        except Exception as e:
+            logger.warning(f"Failed to extract product info from snapshot: {e}")
+            return {}
+
+    def _extract_from_elements(self) -> Dict[str, Any]:
+        product_info = {}
+        product_info['title'] = self._safe_get_text(By.CLASS_NAME, "VU-ZEz", default=None)
+        product_info['price'] = self._safe_get_text(By.CSS_SELECTOR, "div.Nx9bqj.CxhGGd", default=None)
+        product_info['rating'] = self._safe_get_text(By.CLASS_NAME, "XQDdHH", default=None)
+
+        about_items = []
+        try:
+            elements = self.driver.find_elements(By.CSS_SELECTOR, "div.xFVion ul li")
+            for el in elements:
+                try:
+                    text = el.text.strip()
+                    if text:
+                        about_items.append(text)
+                except Exception as e:
+                    logger.warning(f"Stale or inaccessible element in 'about_this_item': {e}")
+                    continue
+        except Exception as e:
+            logger.warning(f"Failed to locate 'about_this_item' elements: {e}")
+
+        product_info['about_this_item'] = about_items
+
+        services = self.driver.find_elements(By.CSS_SELECTOR, "ul.C3EUFP li div.YhUgfO")
+        product_info['services'] = [item.text.strip() for item in services if item.text.strip()] or []
+
+        para = self.driver.find_elements(By.CSS_SELECTOR, "div.yN\\+eNk.w9jEaj p")
+        paragraphs = [p.text.strip() for p in para if p.text.strip()] or []
+        product_info['paragraph'] = paragraphs
+
+        product_info['technical_specifications'] = self._extract_tech_specs()
+        product_info['rating_breakdown'] = self.extract_rating_breakdown()
+        product_info['feature_ratings'] = self._extract_feature_ratings()
+        return product_info
+
+    def _safe_get_text(self, by: str, identifier: str, default: Optional[str] = None) -> Optional[str]:
         retries = 3
         for attempt in range(retries):
             try:
@@ -131,7 +310,7 @@ class DataFetcher:
 
                 except Exception as inner_e:
                     logger.warning(f"Error parsing feature rating block: {inner_e}")
-                    logger.debug(f"Block HTML:\n{block.get_attribute('innerHTML')}")
+                    log_payload(logger, "Block HTML", block.get_attribute('innerHTML'))
 
         except Exception as outer_e:
             logger.warning(f"Failed to extract feature ratings: {outer_e}")
@@ -143,7 +322,7 @@ class DataFetcher:
         try:
             logger.info("Waiting for rating breakdown section...")
 
-            selector = 'ul.\\+psZUR li.fQ-FC1 div.BArk-j'
+            selector = RATING_BREAKDOWN_SELECTOR
 
             WebDriverWait(self.driver, 10).until(
                 EC.presence_of_all_elements_located((By.CSS_SELECTOR, selector))
@@ -178,7 +357,7 @@ class DataFetcher:
 
             logger.info("Waiting for technical specification container...")
             main_container = wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div._1OjC5I"))
+                EC.presence_of_element_located((By.CSS_SELECTOR, SPECS_CONTAINER_SELECTOR))
             )
             logger.info("Found technical specification container.")
 
@@ -218,6 +397,34 @@ class DataFetcher:
 
         return tech_specs
 
+    def _serp_cache_key(self, params: Dict[str, Any]) -> str:
+        query = params.get("q") or params.get("search_query") or ""
+        normalized = " ".join(query.lower().split())
+        return f"{params['engine']}|{params.get('gl', '')}|{params.get('hl', '')}|{normalized}"
+
+    def _cached_serp_search(self, params: Dict[str, Any], parse: Callable[[Dict[str, Any]], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Serves a SerpAPI search from the local cache, and makes sure identical
+        queries that are in flight at the same time hit serpapi.com only once.
+        Failures raise and are never cached.
+        """
+        key = self._serp_cache_key(params)
+        cached = self.serp_cache.get(key)
+        if cached is not None:
+            logger.info(f"[Cache] SerpAPI cache hit for {key}")
+            return cached
+
+        def search():
+            with metrics.span("serpapi_request", engine=params["engine"]):
+                response = self.http.get(SERP_API_URL, params=params)
+                response.raise_for_status()
+                results = parse(response.json())
+            self.serp_cache.set(key, results, ttl=SERP_CACHE_TTLS.get(params["engine"]))
+            return results
+
+        logger.info(f"[Cache] SerpAPI cache miss for {key}")
+        return self.serp_flight.do(key, search)
+
     def fetch_similar_items(self, product_title: str) -> List[Dict[str, Any]]:
         SERP_API_KEY = os.getenv("SERP_API_KEY")
         if not SERP_API_KEY or not product_title:
@@ -233,10 +440,8 @@ class DataFetcher:
             "hl": "en"
         }
 
-        try:
-            response = requests.get("https://serpapi.com/search", params=params)
-            response.raise_for_status()
-            results = response.json().get("shopping_results", [])
+        def parse(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+            results = data.get("shopping_results", [])
             logger.info(f"Fetched {len(results)} similar items for '{product_title}'")
 
             return [
@@ -251,6 +456,8 @@ class DataFetcher:
                 for r in results[:5]
             ]
 
+        try:
+            return self._cached_serp_search(params, parse)
         except Exception as e:
             logger.exception("Error fetching similar items")
             return []
@@ -269,10 +476,8 @@ class DataFetcher:
             "hl": "en"
         }
 
-        try:
-            response = requests.get("https://serpapi.com/search", params=params)
-            response.raise_for_status()
-            videos = response.json().get("video_results", [])
+        def parse(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+            videos = data.get("video_results", [])
             logger.info(f"Fetched {len(videos)} YouTube videos for '{product_title}'")
             return [
                 {
@@ -284,6 +489,47 @@ class DataFetcher:
                 }
                 for v in videos[:5]
             ]
+
+        try:
+            return self._cached_serp_search(params, parse)
         except Exception as e:
             logger.exception("Error fetching YouTube videos")
             return []
+
+
+def compare_extraction_modes(page_url: str, driver) -> Dict[str, Tuple[Any, Any]]:
+    """
+    Loads `page_url` with both extraction modes and returns the fields whose
+    values differ, as {field: (snapshot, elements)}.
+    """
+    snapshot = DataFetcher(extraction_mode="snapshot", http_first=False).fetch_product_info(page_url, driver)
+    elements = DataFetcher(extraction_mode="elements", http_first=False).fetch_product_info(page_url, driver)
+    return {
+        field: (snapshot.get(field), elements.get(field))
+        for field in sorted(set(snapshot) | set(elements))
+        if snapshot.get(field) != elements.get(field)
+    }
+
+
+if __name__ == "__main__":
+    # Side-by-side check of both extraction modes on saved product pages:
+    #   python data_fetcher.py fixtures/*/product.html
+    import sys
+    import json
+    from pathlib import Path
+    from driver_manager import DriverManager
+
+    driver_manager = DriverManager()
+    failed = False
+    try:
+        driver = driver_manager.get_driver()
+        for path in sys.argv[1:]:
+            mismatches = compare_extraction_modes(Path(path).resolve().as_uri(), driver)
+            print(f"{'MISMATCH' if mismatches else 'OK':8} {path}")
+            for field, (snapshot, elements) in mismatches.items():
+                print(f"  {field}\n    snapshot: {json.dumps(snapshot, ensure_ascii=False)}"
+                      f"\n    elements: {json.dumps(elements, ensure_ascii=False)}")
+            failed = failed or bool(mismatches)
+    finally:
+        driver_manager.shutdown_driver()
+    sys.exit(1 if failed else 0)
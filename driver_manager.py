@@ -1,42 +1,393 @@
 # --- driver_manager.py ---
-import undetected_chromedriver as uc
-from fake_useragent import UserAgent
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
 from logger_util import setup_logger
 
+try:  # optional: Chrome's memory on platforms without /proc
+    import psutil
+except ImportError:
+    psutil = None
+
 logger = setup_logger(__name__)
 
+DRIVER_POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", "0"))
+DRIVER_MAX_CHECKOUTS = int(os.getenv("DRIVER_MAX_CHECKOUTS", "50"))
+# Resident memory of the Chrome process tree (browser, renderers, GPU and utility processes)
+DRIVER_MAX_RSS_MB = float(os.getenv("DRIVER_MAX_RSS_MB", "1024"))
+DRIVER_CHECKOUT_TIMEOUT = float(os.getenv("DRIVER_CHECKOUT_TIMEOUT", "60"))
+# Failed pool launches are retried after this delay, doubling up to DRIVER_LAUNCH_MAX_DELAY
+DRIVER_LAUNCH_RETRY_DELAY = float(os.getenv("DRIVER_LAUNCH_RETRY_DELAY", "2"))
+DRIVER_LAUNCH_MAX_DELAY = float(os.getenv("DRIVER_LAUNCH_MAX_DELAY", "60"))
+# "lazy": Chrome starts on the first request that needs it (or DriverManager.warm_up); "eager": at construction
+DRIVER_LAUNCH = os.getenv("DRIVER_LAUNCH", "lazy")
+# How long a blocking pool warm-up waits for the first pooled driver
+DRIVER_WARMUP_TIMEOUT = float(os.getenv("DRIVER_WARMUP_TIMEOUT", "120"))
+
+
+def create_driver():
+    # Imported here: undetected_chromedriver and selenium take a noticeable share of app startup
+    import undetected_chromedriver as uc
+    from fake_useragent import UserAgent
+
+    options = uc.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument(f"user-agent={UserAgent().random}")
+    options.page_load_strategy = "eager"
+    return uc.Chrome(options=options, version_main=137)
+
+
+def quit_driver(driver):
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.warning(f"Driver shutdown error: {e}")
+
+
+def _proc_rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _proc_children() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name can contain spaces, so fields are counted from its closing parenthesis
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def process_tree_rss_mb(pid: int) -> Optional[float]:
+    """
+    Summed resident memory of `pid` and every process below it, or None when
+    it cannot be measured on this platform.
+    """
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            total = 0
+            for process in [root] + root.children(recursive=True):
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total / (1024 * 1024)
+        except psutil.Error:
+            return None
+    if not os.path.isdir("/proc"):
+        return None
+
+    children = _proc_children()
+    pending, total_kb = [pid], 0
+    while pending:
+        current = pending.pop()
+        total_kb += _proc_rss_kb(current)
+        pending.extend(children.get(current, []))
+    return total_kb / 1024
+
+
+class PooledDriver:
+    """
+    A pool slot: the Chrome instance plus how many checkouts it has served.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.checkouts = 0
+
+
+class DriverPool:
+    """
+    Keeps N pre-launched headless Chrome drivers. Requests check a driver out,
+    and on checkin it is health-checked and recycled after `max_checkouts`
+    uses or once Chrome's resident memory grows past `max_rss_mb`.
+    Replacements launch in the background so a request never waits on Chrome
+    startup, and failed launches are retried with backoff until they succeed.
+    """
+
+    def __init__(self, size: int, max_checkouts: int = DRIVER_MAX_CHECKOUTS,
+                 max_rss_mb: float = DRIVER_MAX_RSS_MB, checkout_timeout: float = DRIVER_CHECKOUT_TIMEOUT,
+                 wait: bool = True, ready_timeout: float = DRIVER_WARMUP_TIMEOUT):
+        self.size = size
+        self.max_checkouts = max_checkouts
+        self.max_rss_mb = max_rss_mb
+        self.checkout_timeout = checkout_timeout
+        self._idle: "queue.Queue[PooledDriver]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._all = set()
+        self._closed = threading.Event()
+        self._first_ready = threading.Event()
+        self._launching = 0
+        self._failing = 0
+        self.launch_failures = 0
+
+        threads = [self._launch_replacement() for _ in range(size)]
+        if not wait:
+            # Checkouts block on the idle queue until the first driver is up
+            return
+        # Launches retry until they succeed, so the wait is bounded; stragglers keep launching in the background
+        deadline = time.monotonic() + ready_timeout
+        while any(t.is_alive() for t in threads) and time.monotonic() < deadline:
+            if self._unavailable():
+                self.shutdown()
+                raise RuntimeError(f"No Chrome driver could be started ({self.launch_failures} failed launches)")
+            next(t for t in threads if t.is_alive()).join(timeout=min(1.0, max(deadline - time.monotonic(), 0)))
+        logger.info(f"Driver pool ready with {self._idle.qsize()}/{size} drivers.")
+
+    def _start_driver(self) -> Optional[PooledDriver]:
+        delay = DRIVER_LAUNCH_RETRY_DELAY
+        attempt = 0
+        failing = False
+        try:
+            while not self._closed.is_set():
+                attempt += 1
+                try:
+                    return PooledDriver(create_driver())
+                except Exception as e:
+                    with self._lock:
+                        self.launch_failures += 1
+                        if not failing:
+                            failing = True
+                            self._failing += 1
+                    logger.error(f"Failed to start pooled Chrome driver (attempt {attempt}), "
+                                 f"retrying in {delay:.0f}s: {e}")
+                    if self._closed.wait(delay):
+                        break
+                    delay = min(delay * 2, DRIVER_LAUNCH_MAX_DELAY)
+            return None
+        finally:
+            if failing:
+                with self._lock:
+                    self._failing -= 1
+
+    def _launch(self):
+        with self._lock:
+            self._launching += 1
+        try:
+            slot = self._start_driver()
+        finally:
+            with self._lock:
+                self._launching -= 1
+        if slot is None:
+            return
+
+        with self._lock:
+            if self._closed.is_set():
+                quit_driver(slot.driver)
+                return
+            self._all.add(slot)
+        self._idle.put(slot)
+        self._first_ready.set()
+        logger.info("Pooled Chrome driver started successfully.")
+
+    def _launch_replacement(self) -> threading.Thread:
+        thread = threading.Thread(target=self._launch, name="driver-launch", daemon=True)
+        thread.start()
+        return thread
+
+    def _retire(self, slot: PooledDriver, reason: str):
+        logger.info(f"Recycling pooled driver ({reason}).")
+        with self._lock:
+            self._all.discard(slot)
+        threading.Thread(target=quit_driver, args=(slot.driver,), daemon=True).start()
+        if not self._closed.is_set():
+            self._launch_replacement()
+
+    def _rss_mb(self, driver) -> Optional[float]:
+        # undetected_chromedriver knows the browser's pid; otherwise Chrome runs under chromedriver
+        pid = getattr(driver, "browser_pid", None) or driver.service.process.pid
+        return process_tree_rss_mb(pid)
+
+    def _is_healthy(self, slot: PooledDriver) -> bool:
+        try:
+            slot.driver.window_handles  # raises once the browser has died
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled driver failed health check: {e}")
+            return False
+
+    def _unavailable(self) -> bool:
+        # Nothing running and every pending launch is stuck retrying after failures
+        with self._lock:
+            return not self._all and self._launching > 0 and self._failing >= self._launching
+
+    def wait_ready(self, timeout: float = DRIVER_WARMUP_TIMEOUT) -> bool:
+        """
+        Blocks until at least one driver is running. Returns False on timeout
+        or once every pending launch is failing.
+        """
+        deadline = time.monotonic() + timeout
+        while not self._first_ready.wait(min(1.0, max(deadline - time.monotonic(), 0))):
+            if self._unavailable() or time.monotonic() >= deadline:
+                return False
+        return True
+
+    @contextmanager
+    def checkout(self, timeout: float = None):
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                slot = self._idle.get(timeout=min(1.0, max(deadline - time.monotonic(), 0)))
+                break
+            except queue.Empty:
+                if self._unavailable():
+                    raise RuntimeError(f"No Chrome driver could be started ({self.launch_failures} failed launches)")
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"No Chrome driver available after {timeout}s")
+
+        try:
+            yield slot.driver
+        finally:
+            slot.checkouts += 1
+            self.checkin(slot)
+
+    def checkin(self, slot: PooledDriver):
+        if self._closed.is_set():
+            self._retire(slot, "pool closed")
+            return
+        if not self._is_healthy(slot):
+            self._retire(slot, "unhealthy")
+            return
+        if slot.checkouts >= self.max_checkouts:
+            self._retire(slot, f"served {slot.checkouts} checkouts")
+            return
+        try:
+            rss_mb = self._rss_mb(slot.driver)
+        except Exception as e:
+            logger.warning(f"Could not read pooled driver memory: {e}")
+            rss_mb = None
+        if rss_mb is not None and rss_mb > self.max_rss_mb:
+            self._retire(slot, f"Chrome resident memory at {rss_mb:.0f} MB")
+            return
+        self._idle.put(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            running = len(self._all)
+            return {"size": self.size, "running": running, "idle": self._idle.qsize(),
+                    "launching": self._launching, "launch_failures": self.launch_failures,
+                    "degraded": running < self.size and self._failing > 0}
+
+    def shutdown(self):
+        with self._lock:
+            self._closed.set()
+            slots = list(self._all)
+            self._all.clear()
+        for slot in slots:
+            quit_driver(slot.driver)
+
+
 class DriverManager:
-    def __init__(self):
+    def __init__(self, pool_size: int = DRIVER_POOL_SIZE, launch: str = DRIVER_LAUNCH):
+        self.pool_size = pool_size
         self.driver = None
         self.started = False
-        self._init_driver()
+        self.pool = None
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+
+        if launch == "eager":
+            self.warm_up(background=False)
 
     def _init_driver(self):
-        if self.started:
-            return
+        with self._init_lock:
+            if self.started:
+                return
 
-        options = uc.ChromeOptions()
-        options.add_argument("--headless=new")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")
-        options.add_argument(f"user-agent={UserAgent().random}")
-        options.page_load_strategy = "eager"
+            try:
+                self.driver = create_driver()
+                self.started = True
+                logger.info("Chrome driver started successfully.")
+            except Exception as e:
+                logger.error(f"Failed to start Chrome driver: {e}")
+                self.driver = None
+                self.started = False
 
-        try:
-            self.driver = uc.Chrome(options=options, version_main=137)
-            self.started = True
-            logger.info("Chrome driver started successfully.")
-        except Exception as e:
-            logger.error(f"Failed to start Chrome driver: {e}")
-            self.driver = None
-            self.started = False
+    def _get_pool(self) -> DriverPool:
+        with self._init_lock:
+            if self.pool is None:
+                self.pool = DriverPool(self.pool_size, wait=False)
+            return self.pool
 
     def get_driver(self):
         if not self.driver:
             self._init_driver()
         return self.driver
 
+    def warm_up(self, background: bool = True):
+        """
+        Launches Chrome ahead of the first request that needs it; with
+        `background` the caller does not wait for the launch. In pool mode a
+        blocking warm-up returns once the first pooled driver is up.
+        """
+        def launch():
+            if self.pool_size > 0:
+                if not self._get_pool().wait_ready():
+                    logger.warning("No pooled Chrome driver came up during warm-up.")
+            else:
+                self.get_driver()
+
+        if background:
+            threading.Thread(target=launch, name="driver-warmup", daemon=True).start()
+        else:
+            launch()
+
+    def status(self) -> Dict[str, Any]:
+        if self.pool_size > 0:
+            stats = self.pool.stats() if self.pool else {"size": self.pool_size, "running": 0}
+            # Started means a driver is actually up, not just that launches were kicked off
+            return {"mode": "pool", "started": stats["running"] > 0, **stats}
+        return {"mode": "single", "started": self.started}
+
+    @contextmanager
+    def checkout(self, timeout: float = None):
+        """
+        Borrows a driver for one request. In pool mode this takes a driver from
+        the pool; otherwise the single shared driver is handed out one request
+        at a time.
+        """
+        if self.pool_size > 0:
+            with self._get_pool().checkout(timeout) as driver:
+                yield driver
+            return
+
+        timeout = DRIVER_CHECKOUT_TIMEOUT if timeout is None else timeout
+        if not self._lock.acquire(timeout=timeout):
+            raise TimeoutError(f"No Chrome driver available after {timeout}s")
+        try:
+            yield self.get_driver()
+        finally:
+            self._lock.release()
+
     def shutdown_driver(self):
+        if self.pool_size > 0:
+            if not self.pool:
+                return
+            logger.info("Shutting down Chrome driver pool...")
+            self.pool.shutdown()
+            self.started = False
+            return
+
         if self.driver:
             try:
                 logger.info("Shutting down Chrome driver...")
@@ -48,4 +399,4 @@ class DriverManager:
                 self.started = False
 
     def __del__(self):
-        pass 
+        pass
@@ -0,0 +1,194 @@
+# --- http_client.py ---
+import os
+import time
+import threading
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from logger_util import setup_logger
+import metrics
+
+logger = setup_logger(__name__)
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+HTTP_MAX_RESPONSE_BYTES = int(os.getenv("HTTP_MAX_RESPONSE_BYTES", str(8 * 1024 * 1024)))
+HTTP_MAX_CONCURRENCY_PER_HOST = int(os.getenv("HTTP_MAX_CONCURRENCY_PER_HOST", "4"))
+
+# host -> (max concurrent requests, requests per second, burst); rate 0 means unlimited
+HOST_LIMITS = {
+    "www.flipkart.com": (
+        int(os.getenv("FLIPKART_MAX_CONCURRENCY", "4")),
+        float(os.getenv("FLIPKART_RATE_LIMIT", "2")),
+        int(os.getenv("FLIPKART_RATE_BURST", "4")),
+    ),
+    "serpapi.com": (
+        int(os.getenv("SERPAPI_MAX_CONCURRENCY", "8")),
+        float(os.getenv("SERPAPI_RATE_LIMIT", "0")),
+        int(os.getenv("SERPAPI_RATE_BURST", "8")),
+    ),
+}
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+class TokenBucket:
+    """
+    Blocking token bucket: `rate` tokens per second, holding at most `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class _HostState:
+    def __init__(self, max_concurrency: int, rate: float, burst: int):
+        self.semaphore = threading.BoundedSemaphore(max(max_concurrency, 1))
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.requests = 0
+        self.in_flight = 0
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+        self.errors = 0
+
+
+class HttpClient:
+    """
+    Shared HTTP client: one pooled keep-alive Session, default connect/read
+    timeouts, per-host concurrency caps and token-bucket rate limits, and a cap
+    on response body size.
+    """
+
+    def __init__(self, pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                 timeout: Tuple[float, float] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+                 max_response_bytes: int = HTTP_MAX_RESPONSE_BYTES, host_limits: Optional[Dict] = None):
+        self.timeout = timeout
+        self.max_response_bytes = max_response_bytes
+        self.host_limits = HOST_LIMITS if host_limits is None else host_limits
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._adapter = adapter
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    def _host_state(self, host: str) -> _HostState:
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                limits = self.host_limits.get(host, (HTTP_MAX_CONCURRENCY_PER_HOST, 0, 1))
+                state = self._hosts[host] = _HostState(*limits)
+            return state
+
+    def _read_limited(self, response: requests.Response, max_bytes: int):
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > max_bytes:
+            response.close()
+            raise ResponseTooLarge(f"Response from {response.url} is {length} bytes (limit {max_bytes})")
+
+        chunks, size = [], 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > max_bytes:
+                response.close()
+                raise ResponseTooLarge(f"Response from {response.url} exceeded {max_bytes} bytes")
+            chunks.append(chunk)
+        response._content = b"".join(chunks)
+
+    def request(self, method: str, url: str, timeout: Union[None, float, Tuple[float, float]] = None,
+                max_bytes: Optional[int] = None, **kwargs) -> requests.Response:
+        host = urlsplit(url).netloc.lower()
+        state = self._host_state(host)
+
+        with state.semaphore:
+            if state.bucket:
+                waited = state.bucket.acquire()
+                if waited:
+                    with self._lock:
+                        state.throttled += 1
+                        state.throttle_seconds += waited
+                    metrics.observe("http_throttle_wait_seconds", waited, host=host)
+            with self._lock:
+                state.requests += 1
+                state.in_flight += 1
+            try:
+                with metrics.span("http_request", host=host) as span:
+                    response = self.session.request(method, url, timeout=timeout or self.timeout, stream=True, **kwargs)
+                    span["status"] = response.status_code
+                    self._read_limited(response, max_bytes or self.max_response_bytes)
+                return response
+            except Exception:
+                with self._lock:
+                    state.errors += 1
+                raise
+            finally:
+                with self._lock:
+                    state.in_flight -= 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def _pool_stats(self) -> Dict[str, Dict[str, int]]:
+        pools = self._adapter.poolmanager.pools
+        stats = {}
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            entry = stats.setdefault(pool.host, {"connections_opened": 0, "pool_requests": 0})
+            entry["connections_opened"] += pool.num_connections
+            entry["pool_requests"] += pool.num_requests
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        pool_stats = self._pool_stats()
+        with self._lock:
+            hosts = {}
+            for host, state in self._hosts.items():
+                pool = pool_stats.get(host.split(":")[0], {"connections_opened": 0, "pool_requests": 0})
+                opened, served = pool["connections_opened"], pool["pool_requests"]
+                hosts[host] = {
+                    "requests": state.requests,
+                    "in_flight": state.in_flight,
+                    "errors": state.errors,
+                    "throttled": state.throttled,
+                    "throttle_seconds": round(state.throttle_seconds, 3),
+                    "connections_opened": opened,
+                    "connection_reuse_rate": (1 - opened / served) if served else 0.0,
+                }
+            return hosts
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,169 @@
+# --- job_queue.py ---
+import os
+import time
+import uuid
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from logger_context import call_id_var
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "20"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    """
+    One queued analysis. Workers report stage progress and stream partial
+    markdown into it; readers get a consistent snapshot via `to_dict`.
+    """
+
+    def __init__(self, url: str, key: str, options: Optional[Dict[str, Any]] = None):
+        self.id = str(uuid.uuid4())
+        self.url = url
+        self.key = key
+        self.options = options or {}
+        self.status = "queued"
+        self.stages: Dict[str, str] = {}
+        self.markdown = ""
+        self.meta: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.extra_sessions: List[str] = []
+        self._sessions_open = True
+        self._lock = threading.Lock()
+
+    def update_stage(self, stage: str, status: str):
+        with self._lock:
+            self.stages[stage] = status
+
+    def append_output(self, text: str):
+        with self._lock:
+            self.markdown += text
+
+    def attach_session(self, session_id: str) -> bool:
+        """
+        Records another session waiting on this job. Returns False once the
+        runner has already collected the sessions it stores results for.
+        """
+        with self._lock:
+            if not self._sessions_open:
+                return False
+            if session_id != self.options.get("session_id") and session_id not in self.extra_sessions:
+                self.extra_sessions.append(session_id)
+            return True
+
+    def take_sessions(self) -> List[str]:
+        # Called by the runner when its result is ready; later submitters get a new job
+        with self._lock:
+            self._sessions_open = False
+            return list(self.extra_sessions)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "url": self.url,
+                "status": self.status,
+                "stages": dict(self.stages),
+                "markdown": self.markdown,
+                "error": self.error,
+                **self.meta,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    Runs analyses on a bounded worker pool behind a bounded queue. Submitting
+    a key that is already queued or running returns the existing job, with the
+    submitter's session attached to it.
+    """
+
+    def __init__(self, runner: Callable[[Job], None], workers: int = JOB_WORKERS,
+                 max_queue: int = JOB_MAX_QUEUE, retention: float = JOB_RETENTION_SECONDS):
+        self.runner = runner
+        self.retention = retention
+        self._queue: "queue.Queue[Job]" = queue.Queue(maxsize=max_queue)
+        self._jobs: Dict[str, Job] = {}
+        self._active_by_key: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True).start()
+        logger.info(f"[Jobs] Started {workers} workers (queue limit {max_queue})")
+
+    def _purge_finished(self):
+        cutoff = time.time() - self.retention
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def submit(self, url: str, key: str, **options) -> Tuple[Job, bool]:
+        """
+        Returns (job, created). Raises JobQueueFull when the queue is at capacity.
+        """
+        with self._lock:
+            self._purge_finished()
+            active = self._active_by_key.get(key)
+            session_id = options.get("session_id")
+            if active and (not session_id or active.attach_session(session_id)):
+                logger.info(f"[Jobs] Reusing job {active.id} for {key}")
+                return active, False
+
+            job = Job(url, key, options)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise JobQueueFull(f"Job queue is full ({self._queue.maxsize} waiting)")
+            self._jobs[job.id] = job
+            self._active_by_key[key] = job
+            logger.info(f"[Jobs] Queued job {job.id} for {key}")
+            return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            call_id_var.set(job.id)
+            job.status = "running"
+            job.started_at = time.time()
+            logger.info(f"[Jobs] Running job {job.id} for {job.url}")
+            try:
+                self.runner(job)
+                job.status = "done"
+            except Exception as e:
+                logger.exception(f"[Jobs] Job {job.id} failed")
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    if self._active_by_key.get(job.key) is job:
+                        del self._active_by_key[job.key]
+                self._queue.task_done()
+                logger.info(f"[Jobs] Job {job.id} {job.status} in {job.finished_at - job.started_at:.2f}s")
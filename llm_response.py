@@ -1,62 +1,189 @@
 # --- llm_response.py ---
 import os
 import json
+import time
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import Future, TimeoutError as FutureTimeout
 from dotenv import load_dotenv
-from typing import Dict, Any, Optional, List
-from prompt import classifier_prompt, generate_llm_report, chat_prompt
+from typing import Callable, Dict, Any, Iterator, Optional, List, Tuple
+from prompt import classifier_prompt, generate_llm_report, generate_narrative_report, chat_prompt
+from report_renderer import REPORT_RENDERER, ReportAssembler, assemble_report, render_local_sections
 from chat_manager import ChatHistoryManager
-from logger_util import setup_logger
-from groq import Groq
+from logger_util import setup_logger, log_payload
+from stage_scheduler import Stage, StageScheduler, StageAborted
+from cache_store import TTLCache
+from url_utils import product_key
+from context_store import ProductContextStore
+from product_classifier import LocalClassifier, CategoryIndex, RELEVANT_ITEMS_MIN
+from single_flight import SingleFlight
+import metrics
 
 load_dotenv()
 logger = setup_logger(__name__)
 
+# Per-stage timeouts (seconds) for the analysis pipeline
+SCRAPE_STAGE_TIMEOUT = float(os.getenv("SCRAPE_STAGE_TIMEOUT", "90"))
+SERP_STAGE_TIMEOUT = float(os.getenv("SERP_STAGE_TIMEOUT", "30"))
+LLM_STAGE_TIMEOUT = float(os.getenv("LLM_STAGE_TIMEOUT", "60"))
+REVIEWS_STAGE_TIMEOUT = float(os.getenv("REVIEWS_STAGE_TIMEOUT", "60"))
+
+REPORT_SYSTEM_PROMPT = "You are a helpful assistant that generates well-formatted product summaries and recommendations."
+# The hybrid renderer's narrative needs far fewer output tokens than a full report with tables
+REPORT_MAX_TOKENS = int(os.getenv("REPORT_MAX_TOKENS", "1536" if REPORT_RENDERER == "hybrid" else "4096"))
+
+# Full-report cache, keyed by canonical product + customer profile + model
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "21600"))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "256"))
+REPORT_CACHE_DB = os.getenv("REPORT_CACHE_DB")  # e.g. cache/reports.sqlite; unset keeps it in memory only
+
+# Concurrent analyses of the same product (same report cache key) share one pipeline run;
+# followers give up on the leader after this many seconds
+ANALYSIS_FLIGHT_TIMEOUT = float(os.getenv("ANALYSIS_FLIGHT_TIMEOUT", "300"))
+
+# Completion cache, keyed by hash(model, messages, params); only near-deterministic calls are cached
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_MAX_DISK_ENTRIES = int(os.getenv("LLM_CACHE_MAX_DISK_ENTRIES", "5000"))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "cache/llm.sqlite")
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.0"))
+
+# "standard": classify, then write the report for that category.
+# "single_call": the report prompt carries every category's rules and the model classifies inline, starting
+# speculatively from the local best guess. A cheaper model picks relevant items in the background; the report
+# waits at most SINGLE_CALL_RELEVANT_TIMEOUT for their searches once it reaches the alternatives section.
+PIPELINE_MODES = ("standard", "single_call")
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "standard")
+GROQ_CLASSIFIER_MODEL = os.getenv("GROQ_CLASSIFIER_MODEL", "llama-3.1-8b-instant")
+SINGLE_CALL_RELEVANT_TIMEOUT = float(os.getenv("SINGLE_CALL_RELEVANT_TIMEOUT", "10"))
+
+# Confident local classifications skip the classifier LLM call
+LOCAL_CLASSIFIER_ENABLED = os.getenv("LOCAL_CLASSIFIER_ENABLED", "true").lower() == "true"
+
+HUMAN_DATA_PATH = os.getenv("HUMAN_DATA_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "human_data.json"))
+
+def _is_json_object(text: str) -> bool:
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return False
+    return isinstance(value, dict) and "error" not in value
+
+
 class LLMResponse:
-    def __init__(self):
-        self.url = None
-        self.data_fetcher = None
-        self.review_fetcher = None
-        self.driver = None
-        self.question = None
+    """
+    Shared, per-request-stateless pipeline. Everything a request needs is
+    passed in or returned; the instance only holds the Groq client, caches,
+    chat history and the product context store, so one handler can serve
+    concurrent requests for different products.
+    """
+
+    def __init__(self, context_store: Optional[ProductContextStore] = None):
         self.chat_history = ChatHistoryManager()
-        file_path = r"D:\product_enhancer\human_data.json"
-        with open(file_path, "r") as file:
+        self.context_store = context_store or ProductContextStore()
+        with open(HUMAN_DATA_PATH, "r", encoding="utf8") as file:
             self.customer_profile = json.load(file)
 
-        # Data placeholders
-        self.info: Optional[Dict[str, Any]] = None
-        self.tech_spec: Optional[Dict[str, Any]] = None
-        self.generate_info: Optional[Dict[str, Any]] = None
-        self.total_info: Optional[Dict[str, Any]] = None
-        self.report_result: Optional[Dict[str, Any]] = None
-        self.search_similar_items: List[Dict[str, Any]] = []
-        self.search_youtube: List[Dict[str, Any]] = []
-        self.relevant_search_items: List[List[Dict[str, Any]]] = []
-        self.reviews: List[Dict[str, Any]] = []
+        self.report_cache = TTLCache("reports", ttl=REPORT_CACHE_TTL,
+                                     max_entries=REPORT_CACHE_MAX_ENTRIES, db_path=REPORT_CACHE_DB)
+        self.profile_hash = hashlib.sha256(
+            json.dumps(self.customer_profile, sort_keys=True).encode("utf8")
+        ).hexdigest()[:16]
+        self.llm_cache = TTLCache("llm", ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES,
+                                  db_path=LLM_CACHE_DB, max_disk_entries=LLM_CACHE_MAX_DISK_ENTRIES)
+        self.local_classifier = LocalClassifier() if LOCAL_CLASSIFIER_ENABLED else None
+        self.category_index = CategoryIndex()
+        self.analysis_flight = SingleFlight("analysis")
 
         # Load Groq API client
         groq_api_key = os.getenv("GROQ_API_KEY")
         if not groq_api_key:
             raise EnvironmentError("GROQ_API_KEY not found in environment variables")
 
-        self.client = Groq(api_key=groq_api_key)
+        self._groq_api_key = groq_api_key
+        self._client = None
+        self._client_lock = threading.Lock()
         self.model_name = os.getenv("GROQ_MODEL", "llama3-8b-8192")
         logger.info(f"Groq model loaded: {self.model_name}")
+
+    @property
+    def client(self):
+        """
+        The Groq client, built on first use; importing the SDK is a large part
+        of app startup.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from groq import Groq
+                    # GROQ_BASE_URL lets tests point the client at a local Groq-compatible server
+                    self._client = Groq(api_key=self._groq_api_key, base_url=os.getenv("GROQ_BASE_URL") or None)
+        return self._client
     
-    def _query_llm(self, prompt: str, system_prompt: str = "You are a helpful product classification assistant.") -> Dict[str, Any]:
-        logger.info(f"[LLM] Querying Groq for URL: {self.url}")
-        try:
+    def llm_cache_key(self, messages: List[Dict[str, str]], model: Optional[str] = None, **params) -> str:
+        payload = json.dumps({"model": model or self.model_name, "messages": messages, "params": params},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf8")).hexdigest()
+
+    def _cacheable(self, temperature: float, use_cache: Optional[bool]) -> bool:
+        # Sampled (chat) calls bypass the cache unless explicitly asked for
+        return temperature <= LLM_CACHE_MAX_TEMPERATURE if use_cache is None else use_cache
+
+    @staticmethod
+    def _record_usage(usage, kind: str, model: str):
+        if usage is None:
+            return
+        for token_type in ("prompt_tokens", "completion_tokens"):
+            count = getattr(usage, token_type, None)
+            if count:
+                metrics.inc("llm_tokens_total", count, kind=kind, model=model, type=token_type.split("_")[0])
+
+    def _complete(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                  validate=None, use_cache: Optional[bool] = None, model: Optional[str] = None,
+                  kind: str = "completion") -> str:
+        """
+        Non-streaming completion through the LLM cache. Responses are stored
+        only when `validate(text)` accepts them, so error payloads are retried.
+        """
+        model = model or self.model_name
+        cacheable = self._cacheable(temperature, use_cache)
+        cache_key = self.llm_cache_key(messages, model=model, temperature=temperature, max_tokens=max_tokens)
+        if cacheable:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"[LLM] Cache hit {cache_key[:12]}")
+                return cached
+
+        with metrics.span("llm_request", kind=kind, model=model):
             chat_completion = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        self._record_usage(chat_completion.usage, kind, model)
+        response_text = chat_completion.choices[0].message.content.strip()
+        if cacheable and response_text and (validate is None or validate(response_text)):
+            self.llm_cache.set(cache_key, response_text)
+        return response_text
+
+    def _query_llm(self, prompt: str, system_prompt: str = "You are a helpful product classification assistant.",
+                   url: Optional[str] = None, model: Optional[str] = None) -> Dict[str, Any]:
+        logger.info(f"[LLM] Querying Groq ({model or self.model_name}) for URL: {url}")
+        try:
+            response_text = self._complete(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.0,
-                max_tokens=1024
+                max_tokens=1024,
+                validate=_is_json_object,
+                model=model,
+                kind="classify"
             )
-            response_text = chat_completion.choices[0].message.content.strip()
-            logger.debug(f"[LLM] Raw Response:\n{response_text}")
+            log_payload(logger, "[LLM] Raw Response", response_text)
 
             # Try parsing JSON response
             return json.loads(response_text)
@@ -67,80 +194,353 @@ class LLMResponse:
             logger.exception("Unexpected error querying LLM")
             return {"error": str(e)}
 
-    def _query_llm_report(self, prompt: str, system_prompt: str = "You are a helpful product classification assistant.") -> str:
-        logger.info(f"[LLM] Querying Groq for URL: {self.url}")
+    def _query_llm_report(self, prompt: str, system_prompt: str = "You are a helpful product classification assistant.",
+                          url: Optional[str] = None) -> str:
+        logger.info(f"[LLM] Querying Groq for URL: {url}")
         try:
-            chat_completion = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
+            response_text = self._complete(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.0,
-                max_tokens=4096
+                max_tokens=REPORT_MAX_TOKENS,
+                kind="report"
             )
-            response_text = chat_completion.choices[0].message.content.strip()
-            logger.debug(f"[LLM] Markdown Response:\n{response_text}")
+            log_payload(logger, "[LLM] Markdown Response", response_text)
             return response_text
         except Exception as e:
             logger.exception("Error querying LLM for markdown response")
             return f"**Error:** {str(e)}"
     
-    def chat_conversation(self, prompt: str) -> str:
-        logger.info(f"[LLM] Chat conversation for URL: {self.url}")
-        try:
-            chat_completion = self.client.chat.completions.create(
+    def _stream_llm(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                    url: Optional[str] = None, use_cache: Optional[bool] = None, kind: str = "completion") -> Iterator[str]:
+        cacheable = self._cacheable(temperature, use_cache)
+        cache_key = self.llm_cache_key(messages, temperature=temperature, max_tokens=max_tokens)
+        if cacheable:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"[LLM] Cache hit {cache_key[:12]} for URL: {url}")
+                yield cached
+                return
+
+        logger.info(f"[LLM] Streaming from Groq for URL: {url}")
+        parts = []
+        with metrics.span("llm_request", kind=kind, model=self.model_name, stream="true"):
+            started = time.perf_counter()
+            stream = self.client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=4096  
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
             )
+            for chunk in stream:
+                # Groq reports usage on the final chunk under x_groq
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None)
+                self._record_usage(usage, kind, self.model_name)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        metrics.observe("llm_time_to_first_token_seconds", time.perf_counter() - started, kind=kind)
+                    parts.append(delta)
+                    yield delta
+
+        # Only a stream that ran to completion reaches this point
+        response_text = "".join(parts).strip()
+        if cacheable and response_text:
+            self.llm_cache.set(cache_key, response_text)
+
+    def chat_conversation(self, prompt: str, url: Optional[str] = None) -> str:
+        logger.info(f"[LLM] Chat conversation for URL: {url}")
+        try:
+            with metrics.span("llm_request", kind="chat", model=self.model_name):
+                chat_completion = self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=4096
+                )
+            self._record_usage(chat_completion.usage, "chat", self.model_name)
             response_text = chat_completion.choices[0].message.content.strip()
-            logger.debug(f"[LLM] Chat Response:\n{response_text}")          
-            # Append to chat history
-            self.chat_history.append(url=self.url, question=self.question, conversation_response=response_text)
+            log_payload(logger, "[LLM] Chat Response", response_text)
             return response_text  
         except Exception as e:
             logger.exception("Error during chat conversation")
             return f"**Error:** {str(e)}"
 
-    def run(self, url: str, data_fetcher, review_fetcher, driver=None) -> Dict[str, Any]:
-        self.url = url
-        self.data_fetcher = data_fetcher
-        self.review_fetcher = review_fetcher
-        self.driver = driver
-        logger.info(f"Running LLM pipeline for: {self.url}")
-
-        # Step 1: Fetch product information
-        self.info = self.data_fetcher.fetch_product_info(url, driver)
-        self.tech_spec = self.info.get('technical_specifications', {})
-        if not self.info or self.info.get("title") == "Title not found" or self.info.get("error"):
-            logger.warning("Product information is incomplete or missing.")
-            return {"error": "Product data not available"}
-
-        # Step 2: Fetch similar items and YouTube videos
-        self.search_similar_items = self.data_fetcher.fetch_similar_items(self.info.get("title", ""))
-        self.search_youtube = self.data_fetcher.fetch_youtube_videos(self.info.get("title", ""))
-
-        # Step 3: Classify product using LLM
-        classifier_input = classifier_prompt(self.info)
-        self.generate_info = self._query_llm(classifier_input)
-
-        # Step 4: Fetch reviews if available
-        self.reviews = self.review_fetcher.get_reviews_from_url(url) if self.review_fetcher else []
-
-        # Step 5: Fetch relevant search items based on LLM suggestions
-        relevant_items = self.generate_info.get("relevant_items", [])
-        if not isinstance(relevant_items, list):
-            logger.warning("'relevant_items' is not a valid list.")
-            relevant_items = []
+    def report_cache_key(self, url: str, pipeline_mode: str = PIPELINE_MODE) -> str:
+        return f"{product_key(url)}|{self.profile_hash}|{self.model_name}|{pipeline_mode}|{REPORT_RENDERER}"
 
-        self.relevant_search_items = [
-            self.data_fetcher.fetch_similar_items(item) for item in relevant_items
-        ]
-        # step 6: Getting customer profile
+    @staticmethod
+    def _pipeline_mode(pipeline_mode: Optional[str]) -> str:
+        if pipeline_mode and pipeline_mode not in PIPELINE_MODES:
+            logger.warning(f"Unknown pipeline mode '{pipeline_mode}', using '{PIPELINE_MODE}'")
+            pipeline_mode = None
+        return pipeline_mode or PIPELINE_MODE
+
+    @staticmethod
+    def history_key(url: str, session_id: Optional[str] = None) -> str:
+        key = product_key(url)
+        return f"{session_id}|{key}" if session_id else key
+
+    def _cached_report(self, url: str, cache_key: str, use_cache: bool,
+                       session_id: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        cached = self.report_cache.get(cache_key) if use_cache else None
+        if cached:
+            logger.info(f"[Cache] Report cache hit for {cache_key}")
+            self.context_store.put(url, cached["total_info"], session_id)
+            return cached, "hit"
+        cache_status = "miss" if use_cache else "bypass"
+        logger.info(f"[Cache] Report cache {cache_status} for {cache_key}")
+        return None, cache_status
+
+    def _store_report(self, url: str, cache_key: str, report: str, total_info: Dict[str, Any],
+                      session_id: Optional[str] = None):
+        self.context_store.put(url, total_info, session_id)
+        if report and not report.startswith("**Error:**"):
+            self.report_cache.set(cache_key, {"report": report, "total_info": total_info})
+
+    @staticmethod
+    def _record_analysis(started: float, pipeline_mode: str, cache_status: str, status: str):
+        metrics.observe("analysis_seconds", time.perf_counter() - started, mode=pipeline_mode, cache=cache_status)
+        metrics.inc("analyses_total", mode=pipeline_mode, status=status)
+
+    def analyze(self, url: str, data_fetcher, review_fetcher, driver=None, use_cache: bool = True,
+                session_id: Optional[str] = None, progress_callback=None,
+                pipeline_mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Runs the full pipeline and returns {"markdown", "total_info", "cache",
+        "pipeline_mode", "timings"}, or {"error", ...} when the product data is
+        not available.
+        """
+        started = time.perf_counter()
+        result = self._analyze(url, data_fetcher, review_fetcher, driver, use_cache, session_id,
+                               progress_callback, pipeline_mode)
+        self._record_analysis(started, result["pipeline_mode"], result["cache"], "failed" if "error" in result else "ok")
+        return result
+
+    def _analyze(self, url: str, data_fetcher, review_fetcher, driver, use_cache: bool,
+                 session_id: Optional[str], progress_callback, pipeline_mode: Optional[str]) -> Dict[str, Any]:
+        pipeline_mode = self._pipeline_mode(pipeline_mode)
+        logger.info(f"Running LLM pipeline ({pipeline_mode}) for: {url}")
+
+        cache_key = self.report_cache_key(url, pipeline_mode)
+        cached, cache_status = self._cached_report(url, cache_key, use_cache, session_id)
+        meta = {"cache": cache_status, "pipeline_mode": pipeline_mode}
+        if cached:
+            return {"markdown": cached["report"], "total_info": cached["total_info"], **meta, "timings": {}}
+
+        led = []
+
+        def generate():
+            led.append(True)
+            return self._generate(url, cache_key, data_fetcher, review_fetcher, driver, session_id,
+                                  progress_callback, pipeline_mode, meta)
+
+        result = self.analysis_flight.do(cache_key, generate, timeout=ANALYSIS_FLIGHT_TIMEOUT)
+        return result if led else self._shared_result(url, result, session_id)
+
+    def _shared_result(self, url: str, result: Dict[str, Any], session_id: Optional[str]) -> Dict[str, Any]:
+        # The leader stored the product context under its own session only
+        if "total_info" in result:
+            self.context_store.put(url, result["total_info"], session_id)
+        return {**result, "cache": "coalesced"}
+
+    def _generate(self, url: str, cache_key: str, data_fetcher, review_fetcher, driver, session_id: Optional[str],
+                  progress_callback, pipeline_mode: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+        prepared = self._prepare_report_prompt(url, data_fetcher, review_fetcher, driver, progress_callback, pipeline_mode)
+        if prepared is None:
+            return {"error": "Product data not available", **meta, "timings": {}}
+        total_info, report_prompt, timings, wait_for_alternatives = prepared
+
+        if progress_callback:
+            progress_callback("report", "running")
+        started = time.perf_counter()
+        report = self._query_llm_report(report_prompt, system_prompt=REPORT_SYSTEM_PROMPT, url=url)
+        if REPORT_RENDERER == "hybrid" and report and not report.startswith("**Error:**"):
+            report = assemble_report(report, total_info, wait_for_alternatives)
+        timings["report"] = time.perf_counter() - started
+        if progress_callback:
+            progress_callback("report", "done")
+        wait_for_alternatives()
+        self._store_report(url, cache_key, report, total_info, session_id)
+
+        if not report:
+            return {"error": "Failed to generate final report.", **meta, "timings": timings}
+        return {"markdown": report, "total_info": total_info, **meta, "timings": timings}
+
+    def run(self, url: str, data_fetcher, review_fetcher, driver=None, use_cache: bool = True,
+            session_id: Optional[str] = None, pipeline_mode: Optional[str] = None) -> Any:
+        result = self.analyze(url, data_fetcher, review_fetcher, driver, use_cache, session_id,
+                              pipeline_mode=pipeline_mode)
+        return result.get("markdown") or {"error": result["error"]}
+
+    def run_stream(self, url: str, data_fetcher, review_fetcher, driver=None, use_cache: bool = True,
+                   session_id: Optional[str] = None, progress_callback=None,
+                   pipeline_mode: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Same pipeline as `analyze`, but yields ("token", text) events while the
+        report is generated, then ("done", info) or ("error", message).
+        """
+        analysis_started = time.perf_counter()
+        pipeline_mode = self._pipeline_mode(pipeline_mode)
+        logger.info(f"Running streaming LLM pipeline ({pipeline_mode}) for: {url}")
+
+        cache_key = self.report_cache_key(url, pipeline_mode)
+        cached, cache_status = self._cached_report(url, cache_key, use_cache, session_id)
+        if cached:
+            yield "token", cached["report"]
+            self._record_analysis(analysis_started, pipeline_mode, cache_status, "ok")
+            yield "done", {"cache": cache_status, "pipeline_mode": pipeline_mode}
+            return
+
+        call, leader = self.analysis_flight.claim(cache_key)
+        if not leader:
+            yield from self._follow_stream(url, cache_key, call, session_id, progress_callback,
+                                           analysis_started, pipeline_mode)
+            return
+
+        # The leader streams to its own client and hands the finished result to any followers
+        meta = {"cache": cache_status, "pipeline_mode": pipeline_mode}
+        outcome: Dict[str, Any] = {}
+        error = None
+        try:
+            yield from self._stream_report(url, cache_key, data_fetcher, review_fetcher, driver, session_id,
+                                           progress_callback, meta, analysis_started, outcome)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if outcome:
+                self.analysis_flight.release(cache_key, call, outcome)
+            else:
+                self.analysis_flight.release(cache_key, call, error=error or RuntimeError(
+                    f"Streaming analysis of {url} was cancelled before it finished"))
+
+    def _follow_stream(self, url: str, cache_key: str, call, session_id: Optional[str], progress_callback,
+                       analysis_started: float, pipeline_mode: str) -> Iterator[Tuple[str, Any]]:
+        if progress_callback:
+            progress_callback("coalesced", "waiting")
+        try:
+            result = self.analysis_flight.wait(cache_key, call, timeout=ANALYSIS_FLIGHT_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"[SingleFlight] Shared analysis of {url} failed: {e}")
+            result = {"error": str(e), "cache": "coalesced", "timings": {}}
+        else:
+            result = self._shared_result(url, result, session_id)
+        if progress_callback:
+            progress_callback("coalesced", "failed" if "error" in result else "done")
+
+        if "error" in result:
+            self._record_analysis(analysis_started, pipeline_mode, "coalesced", "failed")
+            yield "error", result["error"]
+            return
+        yield "token", result["markdown"]
+        self._record_analysis(analysis_started, pipeline_mode, "coalesced", "ok")
+        yield "done", {"cache": "coalesced", "pipeline_mode": pipeline_mode, "timings": result["timings"]}
+
+    def _stream_report(self, url: str, cache_key: str, data_fetcher, review_fetcher, driver,
+                       session_id: Optional[str], progress_callback, meta: Dict[str, Any],
+                       analysis_started: float, outcome: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        """
+        Streaming body of `run_stream`. Fills `outcome` with the same result
+        `analyze` returns, for requests that joined this run.
+        """
+        pipeline_mode, cache_status = meta["pipeline_mode"], meta["cache"]
+        prepared = self._prepare_report_prompt(url, data_fetcher, review_fetcher, driver, progress_callback, pipeline_mode)
+        if prepared is None:
+            outcome.update({"error": "Product data not available", **meta, "timings": {}})
+            self._record_analysis(analysis_started, pipeline_mode, cache_status, "failed")
+            yield "error", "Product data not available"
+            return
+        total_info, report_prompt, timings, wait_for_alternatives = prepared
+
+        started = time.perf_counter()
+
+        parts = []
+        # Tables are sent as soon as the narrative reaches the heading that follows them
+        assembler = (ReportAssembler(render_local_sections(total_info, wait_for_alternatives=wait_for_alternatives))
+                     if REPORT_RENDERER == "hybrid" else None)
+        if progress_callback:
+            progress_callback("report", "running")
+        try:
+            for delta in self._stream_llm(
+                [{"role": "system", "content": REPORT_SYSTEM_PROMPT}, {"role": "user", "content": report_prompt}],
+                temperature=0.0, max_tokens=REPORT_MAX_TOKENS, url=url, kind="report"
+            ):
+                text = assembler.feed(delta) if assembler else delta
+                if text:
+                    parts.append(text)
+                    yield "token", text
+            if assembler:
+                text = assembler.finish()
+                parts.append(text)
+                yield "token", text
+        except Exception as e:
+            logger.exception("Error streaming LLM markdown response")
+            if progress_callback:
+                progress_callback("report", "failed")
+            outcome.update({"error": str(e), **meta, "timings": timings})
+            self._record_analysis(analysis_started, pipeline_mode, cache_status, "failed")
+            yield "error", str(e)
+            return
+        if progress_callback:
+            progress_callback("report", "done")
+
+        timings["report"] = time.perf_counter() - started
+        wait_for_alternatives()
+        report = "".join(parts).strip()
+        log_payload(logger, "[LLM] Markdown Response", report)
+        self._store_report(url, cache_key, report, total_info, session_id)
+        outcome.update({"markdown": report, "total_info": total_info, **meta, "timings": timings})
+        self._record_analysis(analysis_started, pipeline_mode, cache_status, "ok")
+        yield "done", {**meta, "timings": timings}
+
+    def _classify(self, url: str, product_info: Dict[str, Any], model: Optional[str] = None,
+                  inline_category: bool = False) -> Dict[str, Any]:
+        """
+        Local classification when confident and the category index can supply
+        relevant items, otherwise an LLM call. With `inline_category` the
+        report model decides the category itself, so the local best guess only
+        has to find relevant items and its confidence is not checked.
+        """
+        if self.local_classifier:
+            local = self.local_classifier.classify(product_info, url)
+            usable = bool(local["product_classifier"]) if inline_category else self.local_classifier.is_confident(local)
+            if usable:
+                relevant = self.category_index.relevant_items(local["product_classifier"], product_info.get("title", ""))
+                if len(relevant) >= RELEVANT_ITEMS_MIN:
+                    logger.info(f"[Classifier] Local {local['product_classifier']} "
+                                f"({local['confidence']:.2f}) for {url}, skipping LLM")
+                    return {**local, "relevant_items": relevant, "source": "local"}
+                logger.info(f"[Classifier] Local {local['product_classifier']} is usable but only "
+                            f"{len(relevant)} indexed products, asking LLM")
+            else:
+                logger.info(f"[Classifier] Local confidence {local['confidence']:.2f} below threshold, asking LLM")
+
+        classification = self._query_llm(classifier_prompt(product_info), url=url, model=model)
+        if classification.get("product_classifier") and "error" not in classification:
+            self.category_index.add_label(product_key(url), product_info, classification["product_classifier"])
+        return classification
+
+    def _index_results(self, classification: Dict[str, Any], results: Dict[str, Any]):
+        # Shopping results for this product and its LLM-suggested alternatives seed the local index
+        category = classification.get("product_classifier")
+        if not category or "error" in classification:
+            return
+        try:
+            self.category_index.add_items(category, results["similar_items"])
+            for group in results["relevant_search_items"]:
+                self.category_index.add_items(category, group)
+        except Exception as e:
+            logger.warning(f"[Classifier] Could not update category index: {e}")
+
+    def _customer_data(self, classification: Dict[str, Any], all_categories: bool = False) -> Dict[str, Any]:
         customer_data = {
             "user_id": self.customer_profile.get("user_id", "unknown_user"),
             "name": self.customer_profile.get("name", "Unknown"),
@@ -148,43 +548,252 @@ class LLMResponse:
             "review_tone": self.customer_profile.get("review_tone", 0),
             "decision_style": self.customer_profile.get("decision_style", 0),
         }
-        if self.generate_info.get("product_classifier") == "Electronics":
+        if all_categories:
+            # Single-call mode: the report model picks the category, so it gets every slice
+            customer_data["preferences_by_category"] = self.customer_profile.get("categories", {})
+        elif classification.get("product_classifier") == "Electronics":
             customer_data["preferences"] = self.customer_profile.get("categories", {}).get("Electronics", {})
-        elif self.generate_info.get("product_classifier") == "Clothes":
+        elif classification.get("product_classifier") == "Clothes":
             customer_data["preferences"] = self.customer_profile.get("categories", {}).get("Clothes", {})
-        elif self.generate_info.get("product_classifier") == "Food":
+        elif classification.get("product_classifier") == "Food":
             customer_data["preferences"] = self.customer_profile.get("categories", {}).get("Food", {})
         else:
             customer_data["preferences"] = {}
-        # Step 7: Build combined dataset and generate final report
-        self.total_info = {
-            "classification_result": self.generate_info,
-            "product_info": self.info,
-            "specifications": self.tech_spec,
-            "reviews": self.reviews,
-            "similar_items": self.search_similar_items,
-            "youtube_videos": self.search_youtube,
-            "relevant_search_items": self.relevant_search_items,
-            "customer_data": customer_data
+        return customer_data
+
+    @staticmethod
+    def _fetch_relevant(scheduler: StageScheduler, data_fetcher, classification: Dict[str, Any]) -> List[Any]:
+        # Step 5: Fetch relevant search items based on the classifier's suggestions
+        relevant_items = classification.get("relevant_items", [])
+        if not isinstance(relevant_items, list):
+            logger.warning("'relevant_items' is not a valid list.")
+            relevant_items = []
+        return scheduler.map(data_fetcher.fetch_similar_items, relevant_items,
+                             timeout=SERP_STAGE_TIMEOUT, default=[])
+
+    def _start_alternatives(self, url: str, product_info: Dict[str, Any], data_fetcher, progress_callback) -> Future:
+        """
+        Single-call mode: runs the cheaper classifier and the relevant-item
+        searches in the background while the report is being written.
+        """
+        scheduler = StageScheduler(on_progress=progress_callback)
+        stages = [
+            Stage("classification",
+                  lambda: self._classify(url, product_info, model=GROQ_CLASSIFIER_MODEL, inline_category=True),
+                  timeout=LLM_STAGE_TIMEOUT, default={"error": "Classification unavailable"}),
+            Stage("relevant_search_items",
+                  lambda classification: self._fetch_relevant(scheduler, data_fetcher, classification),
+                  deps=["classification"], default=[]),
+        ]
+        future: Future = Future()
+
+        def run():
+            try:
+                future.set_result((scheduler.run(stages), dict(scheduler.timings)))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=contextvars.copy_context().run, args=(run,), name="alternatives", daemon=True).start()
+        return future
+
+    def _alternatives_waiter(self, url: str, pending: Future, total_info: Dict[str, Any],
+                             timings: Dict[str, float]) -> Callable[[], None]:
+        """
+        Returns a call that waits at most SINGLE_CALL_RELEVANT_TIMEOUT for the
+        background alternatives and merges them into total_info. Only the
+        first call waits.
+        """
+        lock = threading.Lock()
+        state = {"done": False}
+
+        def wait_for_alternatives():
+            with lock:
+                if state["done"]:
+                    return
+                state["done"] = True
+                try:
+                    results, stage_timings = pending.result(timeout=SINGLE_CALL_RELEVANT_TIMEOUT)
+                except FutureTimeout:
+                    logger.warning(f"[Pipeline] Alternatives for {url} not ready after "
+                                   f"{SINGLE_CALL_RELEVANT_TIMEOUT}s, reporting without them")
+                    return
+                except Exception as e:
+                    logger.warning(f"[Pipeline] Alternatives for {url} failed: {e}")
+                    return
+                timings.update(stage_timings)
+                total_info["classification_result"] = results["classification"]
+                total_info["relevant_search_items"] = results["relevant_search_items"]
+                self._index_results(results["classification"], total_info)
+
+        return wait_for_alternatives
+
+    def _prepare_report_prompt(self, url: str, data_fetcher, review_fetcher, driver=None, progress_callback=None,
+                               pipeline_mode: str = PIPELINE_MODE
+                               ) -> Optional[Tuple[Dict[str, Any], str, Dict[str, float], Callable[[], None]]]:
+        """
+        Runs every data-gathering stage and returns (total_info, report prompt,
+        stage timings, wait_for_alternatives), or None when the product data is
+        not available. In single-call mode the relevant alternatives may still
+        be loading; `wait_for_alternatives` adds them to total_info and timings.
+        """
+        scheduler = StageScheduler(on_progress=progress_callback)
+        single_call = pipeline_mode == "single_call"
+        alternatives: List[Future] = []
+
+        def fetch_info():
+            # Step 1: Fetch product information
+            info = data_fetcher.fetch_product_info(url, driver)
+            if not info or info.get("title") == "Title not found" or info.get("error"):
+                raise StageAborted("Product information is incomplete or missing.")
+            if single_call:
+                # Classification and relevant items don't gate the report in single-call mode
+                alternatives.append(self._start_alternatives(url, info, data_fetcher, progress_callback))
+            return info
+
+        def classify(product_info):
+            # Step 3: Classify product locally when confident, otherwise using LLM
+            return self._classify(url, product_info)
+
+        # Reviews are collected as the crawl yields them, so a timeout keeps what has arrived
+        reviews: List[Dict[str, Any]] = []
+        reviews_stopped = threading.Event()
+
+        def fetch_reviews():
+            if not review_fetcher:
+                return []
+            for review in review_fetcher.iter_reviews(url):
+                if reviews_stopped.is_set():
+                    break  # closing the generator cancels the pages still in flight
+                reviews.append(review)
+            logger.info(f"Fetched {len(reviews)} reviews for {url}")
+            return list(reviews)
+
+        def partial_reviews():
+            reviews_stopped.set()
+            return list(reviews)
+
+        # Step 2 and Step 4 (similar items, YouTube videos, reviews) run alongside the classifier
+        stages = [
+            Stage("product_info", fetch_info, timeout=SCRAPE_STAGE_TIMEOUT, required=True),
+            Stage("similar_items", lambda product_info: data_fetcher.fetch_similar_items(product_info.get("title", "")),
+                  deps=["product_info"], timeout=SERP_STAGE_TIMEOUT, default=[]),
+            Stage("youtube_videos", lambda product_info: data_fetcher.fetch_youtube_videos(product_info.get("title", "")),
+                  deps=["product_info"], timeout=SERP_STAGE_TIMEOUT, default=[]),
+            Stage("reviews", fetch_reviews, timeout=REVIEWS_STAGE_TIMEOUT, default=[], partial=partial_reviews),
+        ]
+        if not single_call:
+            stages += [
+                Stage("classification", classify,
+                      deps=["product_info"], timeout=LLM_STAGE_TIMEOUT, default={"error": "Classification unavailable"}),
+                # _fetch_relevant bounds its own fan-out with SERP_STAGE_TIMEOUT
+                Stage("relevant_search_items",
+                      lambda classification: self._fetch_relevant(scheduler, data_fetcher, classification),
+                      deps=["classification"], default=[]),
+            ]
+
+        try:
+            results = scheduler.run(stages)
+        except StageAborted as e:
+            logger.warning(f"Pipeline aborted: {e}")
+            return None
+
+        info = results["product_info"]
+        if single_call:
+            # The report starts speculatively from the local best guess, which the prompt marks as a hint
+            classification = ({**self.local_classifier.classify(info, url), "source": "speculative"}
+                              if self.local_classifier else {})
+        else:
+            classification = results["classification"]
+            self._index_results(classification, results)
+        # Step 6 and 7: Attach the customer profile, build combined dataset and generate final report
+        total_info = {
+            "classification_result": classification,
+            "product_info": info,
+            "specifications": info.get("technical_specifications", {}),
+            "reviews": results["reviews"],
+            "similar_items": results["similar_items"],
+            "youtube_videos": results["youtube_videos"],
+            "relevant_search_items": results.get("relevant_search_items", []),
+            "customer_data": self._customer_data(classification, all_categories=single_call)
         }
+        timings = dict(scheduler.timings)
+        wait_for_alternatives = (self._alternatives_waiter(url, alternatives[0], total_info, timings)
+                                 if alternatives else lambda: None)
+        if REPORT_RENDERER != "hybrid":
+            # The llm renderer writes the alternatives section itself, so its prompt needs them
+            wait_for_alternatives()
         logger.info(f"[LLM] Total info prepared for report")
-        report_prompt = generate_llm_report(self.total_info)
-        logger.info(f"[LLM] Report prompt: {report_prompt}")
-        logger.info(f"[LLM] Generating final product report.")
-
-        self.report_result = self._query_llm_report(
-            report_prompt,
-            system_prompt="You are a helpful assistant that generates well-formatted product summaries and recommendations."
-        )
-
-        return self.report_result or {"error": "Failed to generate final report."}
-
-    def run_chat_conversation(self) -> str:
-        logger.info(f"Running chat conversation for URL: {self.url}")
-        chat_history_conversation = self.chat_history.get_last_n(self.url, 3)
-        logger.info(f"Chat history before conversation: {self.chat_history}")
-        prompt = chat_prompt(self.total_info, chat_history_conversation, self.question)
-        logger.info(f"Chat prompt: {prompt}")
-        response = self.chat_conversation(prompt)
-        logger.debug(f"Chat response: {response}")
+        build_prompt = generate_narrative_report if REPORT_RENDERER == "hybrid" else generate_llm_report
+        report_prompt = build_prompt(total_info, inline_classification=single_call)
+        log_payload(logger, "[LLM] Report prompt", report_prompt)
+        logger.info(f"[LLM] Generating final product report ({len(report_prompt)} chars of prompt).")
+        return total_info, report_prompt, timings, wait_for_alternatives
+
+    def get_context(self, url: str, session_id: Optional[str] = None, data_fetcher=None,
+                    review_fetcher=None) -> Optional[Dict[str, Any]]:
+        """
+        Returns the product's total_info from the context store, then the
+        report cache; runs the pipeline only when neither has it and fetchers
+        are given.
+        """
+        total_info = self.context_store.get(url, session_id)
+        if total_info:
+            return total_info
+
+        for pipeline_mode in PIPELINE_MODES:
+            cached = self.report_cache.get(self.report_cache_key(url, pipeline_mode))
+            if cached:
+                self.context_store.put(url, cached["total_info"], session_id)
+                return cached["total_info"]
+
+        if data_fetcher is None:
+            return None
+        logger.info(f"[Context] No context for {url}, running analysis first")
+        return self.analyze(url, data_fetcher, review_fetcher, session_id=session_id).get("total_info")
+
+    def _chat_prompt(self, url: str, question: str, session_id: Optional[str],
+                     total_info: Optional[Dict[str, Any]]) -> str:
+        key = self.history_key(url, session_id)
+        if session_id and not self.chat_history.get_turns(key, 1):
+            # Turns saved before chats had sessions (including migrated CSV rows) sit under the product key
+            key = self.history_key(url)
+        chat_history_conversation = self.chat_history.get_last_n(key, 3)
+        return chat_prompt(total_info or {}, chat_history_conversation, question)
+
+    def run_chat_conversation(self, url: str, question: str, session_id: Optional[str] = None,
+                              total_info: Optional[Dict[str, Any]] = None) -> str:
+        logger.info(f"Running chat conversation for URL: {url}")
+        prompt = self._chat_prompt(url, question, session_id, total_info)
+        log_payload(logger, "Chat prompt", prompt)
+        response = self.chat_conversation(prompt, url=url)
+        log_payload(logger, "Chat response", response)
+        if not response.startswith("**Error:**"):
+            self.chat_history.append(url=self.history_key(url, session_id), question=question,
+                                     conversation_response=response)
         return response
+
+    def run_chat_conversation_stream(self, url: str, question: str, session_id: Optional[str] = None,
+                                     total_info: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Streams the chat answer as ("token", text) events and saves it to chat
+        history once the stream completes.
+        """
+        logger.info(f"Running streaming chat conversation for URL: {url}")
+        prompt = self._chat_prompt(url, question, session_id, total_info)
+        log_payload(logger, "Chat prompt", prompt)
+
+        parts = []
+        try:
+            for delta in self._stream_llm([{"role": "user", "content": prompt}], temperature=0.7, max_tokens=4096, url=url, kind="chat"):
+                parts.append(delta)
+                yield "token", delta
+        except Exception as e:
+            logger.exception("Error during streaming chat conversation")
+            yield "error", str(e)
+            return
+
+        response_text = "".join(parts).strip()
+        log_payload(logger, "[LLM] Chat Response", response_text)
+        self.chat_history.append(url=self.history_key(url, session_id), question=question,
+                                 conversation_response=response_text)
+        yield "done", {}
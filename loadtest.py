@@ -0,0 +1,366 @@
+# --- loadtest.py ---
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import itertools
+import argparse
+import threading
+import subprocess
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import requests
+from logger_util import setup_logger
+from standins import fixture_server
+from benchmark import start_standins, git_revision
+
+logger = setup_logger(__name__)
+
+try:  # optional: used for RSS when /proc is not available
+    import psutil
+except ImportError:
+    psutil = None
+
+LOADTEST_RESULTS_DIR = os.getenv("LOADTEST_RESULTS_DIR", "bench_results")
+CHAT_QUESTIONS = [
+    "Is this good value for the price?",
+    "How does it compare with the alternatives?",
+    "What do reviewers complain about most?",
+    "Would it suit my preferences?",
+    "Which of the similar items would you pick instead?",
+]
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            return None
+    return None
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class LoadRecorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Counter] = {}
+        self.sessions = 0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(seconds)
+            counter = self.errors.setdefault(endpoint, Counter())
+            if error:
+                counter[error] += 1
+
+    def session_done(self):
+        with self._lock:
+            self.sessions += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {}
+            total = failed = 0
+            for endpoint, values in sorted(self.samples.items()):
+                ordered = sorted(values)
+                errors = sum(self.errors[endpoint].values())
+                total += len(ordered)
+                failed += errors
+                endpoints[endpoint] = {
+                    "requests": len(ordered),
+                    "errors": errors,
+                    "error_rate": round(errors / len(ordered), 4),
+                    "error_breakdown": dict(self.errors[endpoint]),
+                    "p50": round(percentile(ordered, 0.5), 4),
+                    "p95": round(percentile(ordered, 0.95), 4),
+                    "p99": round(percentile(ordered, 0.99), 4),
+                    "max": round(ordered[-1], 4),
+                }
+            return {
+                "elapsed_seconds": round(elapsed, 2),
+                "sessions": self.sessions,
+                "requests": total,
+                "errors": failed,
+                "error_rate": round(failed / total, 4) if total else 0.0,
+                "throughput_rps": round(total / elapsed, 3) if elapsed else 0.0,
+                "sessions_per_minute": round(self.sessions / elapsed * 60, 2) if elapsed else 0.0,
+                "endpoints": endpoints,
+            }
+
+
+class RssSampler:
+    def __init__(self, pid: Optional[int], interval: float = 1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[List[float]] = []  # [seconds since start, MB]
+        self._stop = threading.Event()
+        self._started = time.perf_counter()
+
+    def _run(self):
+        while not self._stop.is_set():
+            value = rss_mb(self.pid)
+            if value is not None:
+                self.samples.append([round(time.perf_counter() - self._started, 2), round(value, 1)])
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self.pid:
+            threading.Thread(target=self._run, name="rss-sampler", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def window(self, since: float, until: float) -> Dict[str, Any]:
+        values = [mb for t, mb in self.samples if since <= t <= until]
+        if not values:
+            return {}
+        return {"start_mb": values[0], "end_mb": values[-1], "peak_mb": max(values),
+                "growth_mb": round(values[-1] - values[0], 1)}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+
+def _post(http: requests.Session, base_url: str, endpoint: str, payload: Dict[str, Any],
+          recorder: LoadRecorder, timeout: float) -> Optional[Dict[str, Any]]:
+    started = time.perf_counter()
+    error, body = None, None
+    try:
+        response = http.post(f"{base_url}{endpoint}", json=payload, timeout=timeout)
+        body = response.json() if response.headers.get("Content-Type", "").startswith("application/json") else None
+        if response.status_code != 200:
+            error = f"http_{response.status_code}"
+        elif body is None:
+            error = "bad_response"
+        elif isinstance(body.get("markdown"), dict) and body["markdown"].get("error"):
+            # /analyze-url reports pipeline failures inside a 200 response
+            error = "pipeline_error"
+    except requests.Timeout:
+        error = "timeout"
+    except requests.ConnectionError:
+        error = "connection"
+    except ValueError:
+        error = "bad_response"
+    recorder.record(endpoint, time.perf_counter() - started, error)
+    return body if error is None else None
+
+
+def user_session(base_url: str, url: str, chat_turns: int, think_time: float, recorder: LoadRecorder,
+                 timeout: float, http: requests.Session):
+    """One extension user: analyze a product, then ask a few chat questions about it."""
+    session_id = str(uuid.uuid4())
+    if _post(http, base_url, "/analyze-url", {"url": url, "session_id": session_id}, recorder, timeout) is None:
+        recorder.session_done()
+        return
+    for question in random.sample(CHAT_QUESTIONS, min(chat_turns, len(CHAT_QUESTIONS))):
+        time.sleep(random.uniform(0, think_time))
+        _post(http, base_url, "/chat", {"url": url, "question": question, "session_id": session_id}, recorder, timeout)
+    recorder.session_done()
+
+
+def run_level(users: int, args, base_url: str, product_pool: Dict[str, Any], sampler: RssSampler) -> Dict[str, Any]:
+    recorder = LoadRecorder()
+    deadline = time.perf_counter() + args.duration
+    counter = itertools.count()
+    counter_lock = threading.Lock()
+
+    def next_url() -> str:
+        with counter_lock:
+            n = next(counter)
+        if args.unique_products:
+            pid = product_pool["pids"][n % len(product_pool["pids"])]
+            return fixture_server.product_url(product_pool["server"], f"{pid}-{users}-{n}")
+        return product_pool["urls"][n % len(product_pool["urls"])]
+
+    def worker():
+        http = requests.Session()
+        while time.perf_counter() < deadline:
+            user_session(base_url, next_url(), args.chat_turns, args.think_time, recorder, args.request_timeout, http)
+
+    logger.info(f"[LoadTest] {users} concurrent users for {args.duration:.0f}s")
+    window_start = sampler.elapsed()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, name=f"user-{i}", daemon=True) for i in range(users)]
+    for thread in threads:
+        thread.start()
+        time.sleep(args.ramp_up / users)
+    for thread in threads:
+        thread.join()
+    result = {"users": users, **recorder.summary(time.perf_counter() - started)}
+    result["rss"] = sampler.window(window_start, sampler.elapsed())
+    return result
+
+
+def check_thresholds(levels: List[Dict[str, Any]], args, baseline: Optional[Dict[str, Any]]) -> List[str]:
+    violations = []
+    base_levels = {level["users"]: level for level in (baseline or {}).get("levels", [])}
+    for level in levels:
+        users = level["users"]
+        if level["error_rate"] > args.max_error_rate:
+            violations.append(f"{users} users: error rate {level['error_rate']:.2%} > {args.max_error_rate:.2%}")
+        growth = level.get("rss", {}).get("growth_mb")
+        if args.max_rss_growth_mb is not None and growth is not None and growth > args.max_rss_growth_mb:
+            violations.append(f"{users} users: RSS grew {growth} MB > {args.max_rss_growth_mb} MB")
+        for endpoint, row in level["endpoints"].items():
+            limit = args.max_p95.get(endpoint)
+            if limit is not None and row["p95"] > limit:
+                violations.append(f"{users} users: {endpoint} p95 {row['p95']}s > {limit}s")
+            base = base_levels.get(users, {}).get("endpoints", {}).get(endpoint)
+            if base and base["p95"] and row["p95"] > base["p95"] * (1 + args.max_regression):
+                violations.append(f"{users} users: {endpoint} p95 {row['p95']}s regressed more than "
+                                  f"{args.max_regression:.0%} from baseline {base['p95']}s")
+    return violations
+
+
+def start_app(port: int) -> subprocess.Popen:
+    # The app runs in its own process so its RSS is measured on its own
+    command = [sys.executable, "-c", f"from app import serve; serve(port={port})"]
+    return subprocess.Popen(command, env=dict(os.environ), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(base_url: str, process: Optional[subprocess.Popen], timeout: float = 120) -> Dict[str, Any]:
+    """
+    Polls /ready and returns the app's startup report, plus the seconds from
+    launching the process to its first successful response.
+    """
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"App exited with code {process.returncode} during startup")
+        try:
+            response = requests.get(f"{base_url}/ready", timeout=2)
+            if response.status_code == 200:
+                return {"cold_start_seconds": round(time.perf_counter() - started, 3) if process else None,
+                        **response.json().get("startup", {})}
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"App at {base_url} did not become ready in {timeout:.0f}s")
+
+
+def _endpoint_limits(values: List[str]) -> Dict[str, float]:
+    limits = {}
+    for value in values or []:
+        endpoint, _, seconds = value.partition("=")
+        limits[endpoint if endpoint.startswith("/") else f"/{endpoint}"] = float(seconds)
+    return limits
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test of the Flask API against local stand-ins")
+    parser.add_argument("-u", "--users", type=int, nargs="+", default=[10, 50, 200], help="concurrency levels, run in order")
+    parser.add_argument("-d", "--duration", type=float, default=60, help="seconds per concurrency level")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds to start all users of a level")
+    parser.add_argument("--chat-turns", type=int, default=3)
+    parser.add_argument("--think-time", type=float, default=2, help="max seconds between chat turns")
+    parser.add_argument("--products", type=int, default=20, help="distinct products shared by all users")
+    parser.add_argument("--unique-products", action="store_true", help="every session analyzes a product nobody else has")
+    parser.add_argument("--cold", action="store_true", help="disable the SerpAPI and LLM caches")
+    parser.add_argument("--browser", type=int, metavar="DRIVERS", help="fetch pages with a pool of this many Chrome drivers")
+    parser.add_argument("--request-timeout", type=float, default=180)
+    parser.add_argument("--target", help="base URL of an already running app (default: start one)")
+    parser.add_argument("--pid", type=int, help="process id to sample RSS from when using --target")
+    parser.add_argument("--port", type=int, default=4100)
+    parser.add_argument("--fixtures", default=fixture_server.FIXTURE_DIR)
+    parser.add_argument("--page-latency", type=float, default=0.05)
+    parser.add_argument("--review-pages", type=int, default=5)
+    parser.add_argument("--serp-latency", type=float, default=0.3)
+    parser.add_argument("--groq-latency", type=float, default=0.3)
+    parser.add_argument("--groq-tps", type=float, default=250.0)
+    parser.add_argument("--rss-interval", type=float, default=1.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--max-p95", nargs="*", metavar="ENDPOINT=SECONDS", help="e.g. analyze-url=20 chat=5")
+    parser.add_argument("--max-rss-growth-mb", type=float)
+    parser.add_argument("--baseline", help="earlier results JSON; p95s may not regress past --max-regression")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    parser.add_argument("-o", "--output", help="results JSON (default: bench_results/loadtest-<commit>.json)")
+    args = parser.parse_args()
+    args.max_p95 = _endpoint_limits(args.max_p95)
+    args.warm = not args.cold
+
+    servers = start_standins(args)
+    if args.browser:
+        os.environ.update({"HTTP_FIRST_FETCH": "false", "DRIVER_POOL_SIZE": str(args.browser)})
+
+    process = None
+    base_url = args.target
+    if not base_url:
+        base_url = f"http://127.0.0.1:{args.port}"
+        process = start_app(args.port)
+    pid = process.pid if process else args.pid
+
+    pids = servers["pages"].config.recorded_pids() or [f"BENCH{i:04d}" for i in range(args.products)]
+    product_pool = {
+        "server": servers["pages"],
+        "pids": pids,
+        "urls": [fixture_server.product_url(servers["pages"], pid) for pid in pids[:args.products]],
+    }
+
+    sampler = RssSampler(pid, args.rss_interval)
+    levels = []
+    startup = {}
+    try:
+        startup = wait_until_ready(base_url, process)
+        print(f"Startup: {startup}")
+        sampler.start()
+        for users in args.users:
+            level = run_level(users, args, base_url, product_pool, sampler)
+            levels.append(level)
+            endpoints = ", ".join(f"{name} p50={row['p50']}s p95={row['p95']}s p99={row['p99']}s"
+                                  for name, row in level["endpoints"].items())
+            print(f"{users:4} users: {level['throughput_rps']} req/s, errors {level['error_rate']:.2%}, "
+                  f"RSS {level['rss'] or 'n/a'} | {endpoints}")
+    finally:
+        sampler.stop()
+        if process:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for server in servers.values():
+            server.shutdown()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf8") as f:
+            baseline = json.load(f)
+    violations = check_thresholds(levels, args, baseline)
+
+    results = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        },
+        "startup": startup,
+        "stand_in_requests": {name: server.config.requests for name, server in servers.items()},
+        "levels": levels,
+        "rss_timeline": sampler.samples,
+        "violations": violations,
+    }
+    output = args.output or os.path.join(LOADTEST_RESULTS_DIR, f"loadtest-{results['meta']['commit'] or 'results'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if violations:
+        print("Thresholds exceeded:\n  " + "\n  ".join(violations))
+        sys.exit(1)
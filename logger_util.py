@@ -1,60 +1,147 @@
 # --- logger_util.py ---
+import os
+import queue
+import atexit
+import random
 import logging
 import logging.config
+import logging.handlers
+import threading
 import yaml
 from pathlib import Path
+from typing import Dict, List, Tuple
 from logger_context import call_id_var
 
+LOG_FORMAT = '%(asctime)s - %(call_id)s - %(name)s - %(module)s - %(funcName)s:%(lineno)d - %(levelname)s -  %(message)s'
+# Full prompts, raw LLM responses and HTML go to the payload sink only when enabled
+LOG_PAYLOADS = os.getenv("LOG_PAYLOADS", "0") == "1"
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "20000"))
+LOG_PREVIEW_CHARS = int(os.getenv("LOG_PREVIEW_CHARS", "200"))
+PAYLOAD_LOGGER = "payloads"
+
+_configured = False
+_configure_lock = threading.Lock()
+_listeners: List[logging.handlers.QueueListener] = []
+
 
 class ContextFilter(logging.Filter):
     """
     Custom logging filter that automatically adds call_id from context variable.
+    Records that already carry one (set on the request thread before being
+    queued) keep it.
     """
     def filter(self, record):
-        record.call_id = call_id_var.get()
+        if not hasattr(record, "call_id"):
+            record.call_id = call_id_var.get()
         return True
 
 
+def _queue_handlers():
+    """
+    Moves the handlers dictConfig attached to each logger behind a
+    QueueHandler, so the calling thread only enqueues the record and a
+    QueueListener thread does the formatting and I/O. Loggers sharing the
+    same handler set share one queue and listener.
+    """
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.Logger.manager.loggerDict.values() if isinstance(logger, logging.Logger)
+    ]
+    queues: Dict[Tuple[int, ...], logging.handlers.QueueHandler] = {}
+    for logger in loggers:
+        targets = [h for h in logger.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+        if not targets:
+            continue
+        group = tuple(sorted(id(h) for h in targets))
+        if group not in queues:
+            log_queue = queue.SimpleQueue()
+            queue_handler = logging.handlers.QueueHandler(log_queue)
+            # call_id lives in a context variable, so it must be read before the record changes threads
+            queue_handler.addFilter(ContextFilter())
+            listener = logging.handlers.QueueListener(log_queue, *targets, respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+            queues[group] = queue_handler
+        for handler in targets:
+            logger.removeHandler(handler)
+        logger.addHandler(queues[group])
+
+
+def stop_logging():
+    """Drains the log queues and stops the listener threads."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def configure_logging(config_path: str = "logging_config.yaml"):
+    """
+    Applies the logging configuration once per process; later calls are no-ops.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        _configured = True
+
+        # Ensure logs directory exists
+        Path("logs").mkdir(exist_ok=True)
+
+        # Load logging configuration from YAML
+        try:
+            with open(config_path, 'r') as f:
+                config = yaml.safe_load(f)
+            logging.config.dictConfig(config)
+        except Exception as e:
+            if isinstance(e, FileNotFoundError):
+                print(f"Warning: Config file {config_path} not found. Using basic logging configuration.")
+            else:
+                print(f"Error loading logging config: {e}. Using basic configuration.")
+            handlers = [
+                logging.StreamHandler(),
+                logging.handlers.RotatingFileHandler('logs/product_enhancer.log', maxBytes=10 * 1024 * 1024,
+                                                     backupCount=5, encoding='utf8')
+            ]
+            for handler in handlers:
+                handler.setFormatter(logging.Formatter(LOG_FORMAT))
+                handler.addFilter(ContextFilter())
+            logging.basicConfig(level=logging.INFO, handlers=handlers)
+
+        _queue_handlers()
+        atexit.register(stop_logging)
+
+
 def setup_logger(module_name: str, config_path: str = "logging_config.yaml") -> logging.Logger:
     """
     Set up and configure a logger with automatic call ID tracking via context variables.
-    
+
     Args:
         module_name (str): Logger name to use (typically __name__)
         config_path (str): Path to the YAML configuration file
-    
+
     Returns:
         logging.Logger: Configured logger instance
     """
-    # Ensure logs directory exists
-    Path("logs").mkdir(exist_ok=True)
-    
-    # Load logging configuration from YAML
-    try:
-        with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
-        logging.config.dictConfig(config)
-    except FileNotFoundError:
-        print(f"Warning: Config file {config_path} not found. Using basic logging configuration.")
-        logging.basicConfig(
-            level=logging.DEBUG,
-            format='%(asctime)s - %(call_id)s - %(name)s - %(module)s - %(funcName)s:%(lineno)d - %(levelname)s -  %(message)s',
-            handlers=[
-                logging.StreamHandler(),
-                logging.FileHandler('logs/product_enhancer.log', mode='a', encoding='utf8')
-            ]
-        )
-        # Add context filter to basic handlers
-        for handler in logging.getLogger().handlers:
-            handler.addFilter(ContextFilter())
-    except Exception as e:
-        print(f"Error loading logging config: {e}. Using basic configuration.")
-        logging.basicConfig(
-            level=logging.DEBUG,
-            format='%(asctime)s - %(call_id)s - %(name)s - %(module)s - %(funcName)s:%(lineno)d - %(levelname)s - %(message)s'
-        )
-        # Add context filter to basic handlers
-        for handler in logging.getLogger().handlers:
-            handler.addFilter(ContextFilter())
-
-    return logging.getLogger(module_name)
\ No newline at end of file
+    configure_logging(config_path)
+    return logging.getLogger(module_name)
+
+
+def truncate(text: str, limit: int = LOG_PREVIEW_CHARS) -> str:
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+def log_payload(logger: logging.Logger, label: str, payload):
+    """
+    Logs a short preview of a large payload (prompt, raw response, HTML) at
+    DEBUG on `logger`. With LOG_PAYLOADS=1 the payload, capped at
+    LOG_PAYLOAD_MAX_CHARS and sampled at LOG_PAYLOAD_SAMPLE_RATE, is also
+    written to the separate payload log.
+    """
+    text = str(payload)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"{label} ({len(text)} chars): {truncate(text)}", stacklevel=2)
+    if LOG_PAYLOADS and random.random() < LOG_PAYLOAD_SAMPLE_RATE:
+        logging.getLogger(PAYLOAD_LOGGER).debug(f"{label} [{logger.name}]\n{truncate(text, LOG_PAYLOAD_MAX_CHARS)}",
+                                                 stacklevel=2)
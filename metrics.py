@@ -0,0 +1,159 @@
+# --- metrics.py ---
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Tuple
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "shopintel")
+# Recent samples kept per timer series for the p50/p95/p99 estimates
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1024"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Timer:
+    def __init__(self):
+        self.samples: Deque[float] = deque(maxlen=METRICS_WINDOW)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self) -> List[Tuple[float, float]]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [(q, float("nan")) for q in QUANTILES]
+        return [(q, ordered[min(len(ordered) - 1, int(q * len(ordered)))]) for q in QUANTILES]
+
+
+class MetricsRegistry:
+    """
+    In-process counters, timers (rendered as Prometheus summaries with
+    p50/p95/p99 over a sliding window of samples) and callback gauges.
+    """
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._timers: Dict[str, Dict[LabelKey, _Timer]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[LabelKey, float]]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, help: str = "", **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+            if help:
+                self._help.setdefault(name, help)
+
+    def observe(self, name: str, value: float, help: str = "", **labels):
+        with self._lock:
+            series = self._timers.setdefault(name, {})
+            timer = series.get(_label_key(labels))
+            if timer is None:
+                timer = series[_label_key(labels)] = _Timer()
+            timer.observe(value)
+            if help:
+                self._help.setdefault(name, help)
+
+    def gauge(self, name: str, fn: Callable[[], Dict[str, float]], label: str = "", help: str = ""):
+        """
+        Registers a gauge read at scrape time. `fn` returns {label value: value},
+        or {"": value} for an unlabelled gauge.
+        """
+        def collect() -> Dict[LabelKey, float]:
+            return {((label, k),) if label and k else (): v for k, v in fn().items()}
+        with self._lock:
+            self._gauges[name] = collect
+            if help:
+                self._help[name] = help
+
+    def render(self) -> str:
+        lines = []
+
+        def header(name: str, kind: str):
+            full = f"{self.prefix}_{name}"
+            if name in self._help:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = header(name, "counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._timers.items()):
+                full = header(name, "summary")
+                for key, timer in sorted(series.items()):
+                    for q, value in timer.quantiles():
+                        lines.append(f"{full}{_format_labels(key, (('quantile', str(q)),))} {value:.6f}")
+                    lines.append(f"{full}_sum{_format_labels(key)} {timer.total:.6f}")
+                    lines.append(f"{full}_count{_format_labels(key)} {timer.count}")
+            gauges = list(self._gauges.items())
+
+        for name, collect in sorted(gauges):
+            try:
+                values = collect()
+            except Exception as e:
+                logger.warning(f"[Metrics] Gauge {name} failed: {e}")
+                continue
+            full = header(name, "gauge")
+            for key, value in sorted(values.items()):
+                lines.append(f"{full}{_format_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def inc(name: str, value: float = 1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    REGISTRY.observe(name, value, **labels)
+
+
+@contextmanager
+def span(name: str, **labels) -> Iterator[Dict[str, object]]:
+    """
+    Times the block into the `<name>_seconds` summary and logs it (the log
+    line carries the request's call_id). Exceptions are counted in
+    `<name>_errors_total` and re-raised. The yielded dict can be used to add
+    labels known only at the end, such as a status code.
+    """
+    extra: Dict[str, object] = {}
+    started = time.perf_counter()
+    try:
+        yield extra
+    except Exception as e:
+        REGISTRY.inc(f"{name}_errors_total", error=type(e).__name__, **labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        REGISTRY.observe(f"{name}_seconds", elapsed, **labels, **extra)
+        logger.debug(f"[Span] {name} {' '.join(f'{k}={v}' for k, v in {**labels, **extra}.items())} {elapsed:.3f}s")
@@ -0,0 +1,363 @@
+# --- product_classifier.py ---
+import os
+import re
+import sys
+import json
+import time
+import pickle
+import sqlite3
+import argparse
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.75"))
+LOCAL_CLASSIFIER_MODEL = os.getenv("LOCAL_CLASSIFIER_MODEL")  # optional pickled model with predict_proba/classes_
+# Score the winning category needs before its share counts at full confidence
+LOCAL_CLASSIFIER_MIN_EVIDENCE = float(os.getenv("LOCAL_CLASSIFIER_MIN_EVIDENCE", "6"))
+CATEGORY_INDEX_DB = os.getenv("CATEGORY_INDEX_DB", "cache/category_index.sqlite")
+CATEGORY_INDEX_MAX_CANDIDATES = int(os.getenv("CATEGORY_INDEX_MAX_CANDIDATES", "500"))
+RELEVANT_ITEMS_COUNT = 5
+RELEVANT_ITEMS_MIN = int(os.getenv("RELEVANT_ITEMS_MIN", "3"))
+# Title similarity (Jaccard over descriptive tokens) an indexed product needs to count as an alternative
+RELEVANT_ITEMS_MIN_SIMILARITY = float(os.getenv("RELEVANT_ITEMS_MIN_SIMILARITY", "0.15"))
+
+CATEGORIES = ("Electronics", "Clothes", "Food")
+
+TITLE_KEYWORDS = {
+    "Electronics": {
+        "phone", "mobile", "smartphone", "iphone", "galaxy", "pixel", "redmi", "oneplus", "laptop", "notebook",
+        "macbook", "tablet", "ipad", "headphone", "headphones", "earphone", "earphones", "earbuds", "tws",
+        "headset", "speaker", "soundbar", "bluetooth", "camera", "dslr", "mirrorless", "lens", "tv",
+        "television", "monitor", "smartwatch", "charger", "powerbank", "router", "keyboard", "mouse", "ssd",
+        "hdd", "printer", "processor", "refrigerator", "inverter", "console", "playstation", "xbox", "drone",
+        "projector", "ram", "mah", "hz", "usb", "hdmi", "wifi", "5g", "4g", "amoled", "oled", "qled",
+    },
+    # Audience and cut words ("men", "women", "fit", "slim", "sleeve") also appear in gadget titles, so they are left out
+    "Clothes": {
+        "shirt", "tshirt", "jeans", "trousers", "trouser", "pants", "kurta", "kurti", "saree", "sari", "dress",
+        "jacket", "hoodie", "sweatshirt", "sweater", "shorts", "skirt", "leggings", "blazer", "lehenga",
+        "dupatta", "joggers", "jogger", "trackpants", "innerwear", "socks", "cotton", "polyester", "denim",
+        "linen", "collar", "checkered", "striped", "shoes", "sneakers", "sandals", "kurtas", "tshirts", "shirts",
+    },
+    "Food": {
+        "chocolate", "chocolates", "biscuits", "biscuit", "cookies", "snack", "snacks", "chips", "namkeen",
+        "tea", "coffee", "rice", "atta", "flour", "dal", "ghee", "spices", "masala", "honey", "juice",
+        "nuts", "almonds", "cashew", "cashews", "oats", "cereal", "muesli", "sugar", "salt", "jam", "sauce",
+        "noodles", "pasta", "protein", "whey", "dates", "raisins", "pickle", "ketchup", "edible",
+    },
+}
+
+# Whole words/phrases in Flipkart spec table keys
+SPEC_KEYWORDS = {
+    "Electronics": ("display size", "resolution", "battery", "processor", "internal storage", "operating system",
+                    "bluetooth", "connectivity", "network type", "sim type", "refresh rate", "power consumption"),
+    # "Ideal For" is listed on watches and electronics too
+    "Clothes": ("fabric", "sleeve", "neck", "pattern", "occasion", "wash care", "closure"),
+    "Food": ("shelf life", "ingredients", "nutrient", "food preference", "container type", "maximum shelf",
+             "organic", "flavor", "flavour"),
+}
+
+SPEC_PATTERNS = {
+    category: re.compile(r"\b(" + "|".join(re.escape(h) for h in hints) + r")\b")
+    for category, hints in SPEC_KEYWORDS.items()
+}
+
+# First three letters of a Flipkart pid name the catalogue vertical (e.g. MOBGHWFHABH3G73H is a mobile)
+PID_PREFIXES = {
+    "MOB": "Electronics", "TAB": "Electronics", "COM": "Electronics", "TVS": "Electronics",
+    "CAM": "Electronics", "ACC": "Electronics", "SMW": "Electronics", "HEA": "Electronics",
+    "TSH": "Clothes", "SHT": "Clothes", "JEA": "Clothes", "KTA": "Clothes", "TRO": "Clothes",
+    "SAR": "Clothes", "DRE": "Clothes", "SWS": "Clothes", "JCK": "Clothes", "SHO": "Clothes",
+    "TEA": "Food", "COF": "Food", "CHC": "Food", "BSC": "Food", "DFT": "Food", "SNK": "Food",
+}
+
+TITLE_WEIGHT = 3.0
+SPEC_WEIGHT = 2.0
+TEXT_WEIGHT = 0.5
+PID_WEIGHT = 6.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_MEASURE_RE = re.compile(r"^\d+[a-z]*$")
+
+# Colours, sizes, units and filler words say nothing about what kind of product a title is
+SIMILARITY_STOP_TOKENS = {
+    "black", "white", "blue", "red", "green", "grey", "gray", "silver", "gold", "golden", "pink", "purple",
+    "yellow", "orange", "brown", "beige", "navy", "maroon", "multicolor", "multicolour", "midnight", "rose",
+    "xs", "s", "m", "l", "xl", "xxl", "xxxl", "free", "size", "regular", "small", "medium", "large",
+    "gb", "tb", "mb", "cm", "mm", "inch", "inches", "kg", "g", "ml", "mah", "hz", "w", "pcs",
+    "with", "for", "and", "the", "of", "in", "to", "by", "a", "pack", "combo", "set", "new", "latest",
+    "edition", "version", "model", "variant", "active",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    # "T-Shirt" and "t shirt" both become "tshirt" so they hit the keyword table
+    text = (text or "").lower().replace("t-shirt", "tshirt").replace("t shirt", "tshirt").replace("power bank", "powerbank")
+    return _TOKEN_RE.findall(text)
+
+
+def similarity_tokens(text: str) -> set:
+    return {t for t in tokenize(text) if t not in SIMILARITY_STOP_TOKENS and not _MEASURE_RE.match(t)}
+
+
+def _pid_prefix(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    pid = parse_qs(urlsplit(url).query).get("pid", [""])[0]
+    return pid[:3].upper() if len(pid) >= 3 else None
+
+
+class LocalClassifier:
+    """
+    In-process replacement for the classifier LLM call. Scores each category
+    from title keywords, spec table keys, bullet text and the Flipkart pid
+    prefix, optionally averaged with a small trained model, and returns the
+    winning category with a confidence in [0, 1].
+    """
+
+    def __init__(self, model_path: Optional[str] = LOCAL_CLASSIFIER_MODEL, threshold: float = LOCAL_CLASSIFIER_THRESHOLD):
+        self.threshold = threshold
+        self.model = None
+        if model_path:
+            try:
+                with open(model_path, "rb") as f:
+                    self.model = pickle.load(f)
+                logger.info(f"[Classifier] Loaded local model from {model_path}")
+            except Exception as e:
+                logger.warning(f"[Classifier] Could not load local model {model_path}: {e}")
+
+    @staticmethod
+    def _model_text(info: Dict[str, Any]) -> str:
+        specs = info.get("technical_specifications") or {}
+        return " ".join([info.get("title") or "", " ".join(info.get("about_this_item") or []), " ".join(specs)])
+
+    def _rule_scores(self, info: Dict[str, Any], url: Optional[str]) -> Dict[str, float]:
+        scores = {category: 0.0 for category in CATEGORIES}
+        title_tokens = set(tokenize(info.get("title") or ""))
+        text_tokens = set(tokenize(" ".join(info.get("about_this_item") or []))) - title_tokens
+        spec_keys = [k.lower() for k in (info.get("technical_specifications") or {})]
+
+        for category in CATEGORIES:
+            keywords = TITLE_KEYWORDS[category]
+            scores[category] += TITLE_WEIGHT * len(title_tokens & keywords)
+            scores[category] += TEXT_WEIGHT * len(text_tokens & keywords)
+            scores[category] += SPEC_WEIGHT * sum(1 for key in spec_keys if SPEC_PATTERNS[category].search(key))
+
+        prefix_category = PID_PREFIXES.get(_pid_prefix(url) or "")
+        if prefix_category:
+            scores[prefix_category] += PID_WEIGHT
+        return scores
+
+    def classify(self, info: Dict[str, Any], url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Returns {"product_classifier", "confidence"}; the category is None
+        when nothing matched.
+        """
+        scores = self._rule_scores(info, url)
+        total = sum(scores.values())
+        if total:
+            top = max(scores.values())
+            evidence = min(1.0, top / LOCAL_CLASSIFIER_MIN_EVIDENCE)
+            probs = {c: s / total * evidence for c, s in scores.items()}
+        else:
+            probs = {c: 0.0 for c in CATEGORIES}
+
+        if self.model is not None:
+            try:
+                model_probs = dict(zip(self.model.classes_, self.model.predict_proba([self._model_text(info)])[0]))
+                probs = {c: (probs[c] + float(model_probs.get(c, 0.0))) / 2 for c in CATEGORIES}
+            except Exception as e:
+                logger.warning(f"[Classifier] Local model prediction failed: {e}")
+
+        category = max(probs, key=probs.get)
+        confidence = round(probs[category], 3)
+        return {"product_classifier": category if confidence > 0 else None, "confidence": confidence}
+
+    def is_confident(self, result: Dict[str, Any]) -> bool:
+        return bool(result.get("product_classifier")) and result.get("confidence", 0) >= self.threshold
+
+
+class CategoryIndex:
+    """
+    Category -> known products, built from SerpAPI shopping results seen by
+    earlier analyses. Also keeps every LLM classification as a labelled
+    example for the offline benchmark.
+    """
+
+    def __init__(self, db_path: str = CATEGORY_INDEX_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "title TEXT PRIMARY KEY, category TEXT NOT NULL, price TEXT, link TEXT, added_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_items_category ON items(category, added_at)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS labels ("
+            "product TEXT PRIMARY KEY, category TEXT NOT NULL, product_info TEXT NOT NULL, labelled_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def add_items(self, category: str, items: Iterable[Dict[str, Any]]) -> int:
+        if category not in CATEGORIES:
+            return 0
+        now = time.time()
+        rows = [
+            (item["title"].strip(), category, item.get("price"), item.get("link"), now)
+            for item in items if isinstance(item, dict) and item.get("title")
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO items (title, category, price, link, added_at) VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+        return len(rows)
+
+    def relevant_items(self, category: str, title: str, limit: int = RELEVANT_ITEMS_COUNT) -> List[str]:
+        """
+        Product names in `category` ranked by title similarity to `title`,
+        skipping near-duplicates of the product itself and anything below
+        RELEVANT_ITEMS_MIN_SIMILARITY. Fewer than RELEVANT_ITEMS_MIN results
+        sends the caller back to the LLM.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT title FROM items WHERE category = ? ORDER BY added_at DESC LIMIT ?",
+                (category, CATEGORY_INDEX_MAX_CANDIDATES)
+            ).fetchall()
+
+        query = similarity_tokens(title)
+        scored = []
+        for (candidate,) in rows:
+            tokens = similarity_tokens(candidate)
+            if not tokens:
+                continue
+            overlap = len(query & tokens) / len(query | tokens) if query else 0.0
+            if overlap < RELEVANT_ITEMS_MIN_SIMILARITY or overlap >= 0.8:
+                continue
+            scored.append((overlap, candidate))
+        scored.sort(key=lambda s: s[0], reverse=True)
+
+        picked, seen = [], {" ".join(tokenize(title)[:3])}
+        for _, candidate in scored:
+            # One listing per product name prefix keeps colour/size variants (and the product itself) out
+            stem = " ".join(tokenize(candidate)[:3])
+            if stem in seen:
+                continue
+            seen.add(stem)
+            picked.append(candidate)
+            if len(picked) >= limit:
+                break
+        return picked
+
+    def add_label(self, product: str, product_info: Dict[str, Any], category: str):
+        if category not in CATEGORIES:
+            return
+        info = {k: product_info.get(k) for k in ("title", "about_this_item", "technical_specifications")}
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO labels (product, category, product_info, labelled_at) VALUES (?, ?, ?, ?)",
+                (product, category, json.dumps(info), time.time())
+            )
+            self._db.commit()
+
+    def labels(self) -> List[Tuple[str, Dict[str, Any], str]]:
+        with self._lock:
+            rows = self._db.execute("SELECT product, product_info, category FROM labels").fetchall()
+        return [(product, json.loads(info), category) for product, info, category in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._db.execute("SELECT category, COUNT(*) FROM items GROUP BY category").fetchall())
+            counts["labels"] = self._db.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+        return counts
+
+    def build_from_serp_cache(self, serp_db: str, classifier: LocalClassifier) -> int:
+        """
+        Backfills the index from cached Google Shopping results, filing each
+        result under its locally classified category when confident.
+        """
+        db = sqlite3.connect(serp_db)
+        try:
+            rows = db.execute("SELECT value FROM cache WHERE key LIKE 'google|%'").fetchall()
+        finally:
+            db.close()
+
+        added = 0
+        for (value,) in rows:
+            for item in json.loads(value) or []:
+                result = classifier.classify({"title": item.get("title") or ""})
+                if classifier.is_confident(result):
+                    added += self.add_items(result["product_classifier"], [item])
+        logger.info(f"[Classifier] Indexed {added} products from {len(rows)} cached searches")
+        return added
+
+
+def benchmark(examples: List[Tuple[str, Dict[str, Any], str]], classifier: LocalClassifier) -> Dict[str, Any]:
+    """
+    Runs the local classifier over LLM-labelled examples and reports accuracy
+    overall and above the confidence threshold, coverage and latency.
+    """
+    latencies, correct, covered, covered_correct = [], 0, 0, 0
+    for product, info, label in examples:
+        url = f"https://www.flipkart.com/p/?pid={product.split(':', 1)[1]}" if product.startswith("flipkart:") else None
+        start = time.perf_counter()
+        result = classifier.classify(info, url)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hit = result["product_classifier"] == label
+        correct += hit
+        if classifier.is_confident(result):
+            covered += 1
+            covered_correct += hit
+
+    n = len(examples)
+    latencies.sort()
+    pick = lambda q: latencies[min(n - 1, int(q * n))] if n else 0.0
+    return {
+        "examples": n,
+        "accuracy": correct / n if n else 0.0,
+        "threshold": classifier.threshold,
+        "coverage": covered / n if n else 0.0,
+        "accuracy_above_threshold": covered_correct / covered if covered else 0.0,
+        "latency_ms_p50": round(pick(0.5), 3),
+        "latency_ms_p95": round(pick(0.95), 3),
+    }
+
+
+def _load_jsonl(path: str) -> List[Tuple[str, Dict[str, Any], str]]:
+    # Lines of {"product_info": {...}, "product_classifier": "...", "product": "flipkart:PID" (optional)}
+    examples = []
+    with open(path, "r", encoding="utf8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                examples.append((row.get("product", ""), row["product_info"], row["product_classifier"]))
+    return examples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local product classifier tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("benchmark", help="accuracy/latency against LLM-labelled products")
+    bench.add_argument("--labels", help="JSONL file of labelled products (default: labels in the category index)")
+    bench.add_argument("--threshold", type=float, default=LOCAL_CLASSIFIER_THRESHOLD)
+    build = sub.add_parser("build-index", help="backfill the category index from the SerpAPI cache")
+    build.add_argument("--serp-db", default=os.getenv("SERP_CACHE_DB", "cache/serpapi.sqlite"))
+    args = parser.parse_args()
+
+    index = CategoryIndex()
+    if args.command == "benchmark":
+        examples = _load_jsonl(args.labels) if args.labels else index.labels()
+        if not examples:
+            sys.exit("No labelled products yet; run some analyses or pass --labels")
+        print(json.dumps(benchmark(examples, LocalClassifier(threshold=args.threshold)), indent=2))
+    else:
+        index.build_from_serp_cache(args.serp_db, LocalClassifier())
+        print(json.dumps(index.stats(), indent=2))
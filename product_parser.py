@@ -0,0 +1,171 @@
+# --- product_parser.py ---
+import sys
+import json
+from typing import Dict, Any, Optional
+from bs4 import BeautifulSoup
+from bs4.element import NavigableString, PreformattedString, Tag
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+TITLE_SELECTOR = ".VU-ZEz"
+PRICE_SELECTOR = "div.Nx9bqj.CxhGGd"
+RATING_SELECTOR = ".XQDdHH"
+ABOUT_SELECTOR = "div.xFVion ul li"
+SERVICES_SELECTOR = "ul.C3EUFP li div.YhUgfO"
+PARAGRAPH_SELECTOR = "div.yN\\+eNk.w9jEaj p"
+SPECS_CONTAINER_SELECTOR = "div._1OjC5I"
+SPECS_SECTION_SELECTOR = "div.GNDEQ-"
+SPECS_TABLE_SELECTOR = "table._0ZhAN9"
+RATING_BREAKDOWN_SELECTOR = "ul.\\+psZUR li.fQ-FC1 div.BArk-j"
+FEATURE_BLOCK_SELECTOR = "a.col-3-12.zbCsdp.zsSYMX"
+FEATURE_LABEL_SELECTOR = "div.NTiEl0"
+BLOCKED_PAGE_MARKERS = ("Robot Check", "Are you a human", "unusual traffic")
+
+# Elements WebElement.text puts on lines of their own
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "caption", "dd", "details", "dialog", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr",
+    "li", "main", "nav", "ol", "p", "pre", "section", "summary", "table", "tbody", "tfoot", "thead", "tr", "ul",
+}
+NEVER_RENDERED_TAGS = {"head", "script", "style", "noscript", "template", "title"}
+
+
+def _is_hidden(tag: Tag) -> bool:
+    if tag.name in NEVER_RENDERED_TAGS or tag.has_attr("hidden"):
+        return True
+    if tag.name == "input" and (tag.get("type") or "").lower() == "hidden":
+        return True
+    style = (tag.get("style") or "").replace(" ", "").lower()
+    return "display:none" in style or "visibility:hidden" in style
+
+
+def _text(element) -> str:
+    """
+    Mirrors WebElement.text on a parsed node: block elements and <br> start
+    new lines, whitespace within a line collapses, and hidden nodes are left
+    out. Only the `hidden` attribute and inline styles are checked for
+    visibility, since stylesheets are not evaluated.
+    """
+    if _is_hidden(element) or any(_is_hidden(parent) for parent in element.parents if parent.name):
+        return ""
+
+    lines = [""]
+
+    def walk(node):
+        for child in node.children:
+            if isinstance(child, NavigableString):
+                # Comments, CDATA and the like are strings to BeautifulSoup but never rendered
+                if not isinstance(child, PreformattedString):
+                    lines[-1] += str(child)
+                continue
+            if not isinstance(child, Tag) or _is_hidden(child):
+                continue
+            if child.name == "br":
+                lines.append("")
+                continue
+            block = child.name in BLOCK_TAGS
+            if block:
+                lines.append("")
+            walk(child)
+            if block:
+                lines.append("")
+            elif child.name in ("td", "th"):
+                lines[-1] += " "
+
+    walk(element)
+    cleaned = (" ".join(line.replace("\xa0", " ").split()) for line in lines)
+    return "\n".join(line for line in cleaned if line)
+
+
+def _select_text(soup, selector: str, default: Optional[str] = None) -> Optional[str]:
+    element = soup.select_one(selector)
+    return _text(element) if element else default
+
+
+def _extract_tech_specs(soup) -> Dict[str, str]:
+    tech_specs = {}
+    container = soup.select_one(SPECS_CONTAINER_SELECTOR)
+    section = container.select_one(SPECS_SECTION_SELECTOR) if container else None
+    table = section.select_one(SPECS_TABLE_SELECTOR) if section else None
+    if not table:
+        logger.warning("Technical specification table not found in snapshot.")
+        return tech_specs
+
+    for row in table.find_all("tr"):
+        tds = row.find_all("td")
+        if len(tds) < 2:
+            continue
+        key = _text(tds[0])
+        li_items = tds[1].find_all("li")
+        if li_items:
+            value = ", ".join(_text(li) for li in li_items if _text(li))
+        else:
+            value = _text(tds[1])
+        if key and value:
+            tech_specs[key] = value
+    return tech_specs
+
+
+def _extract_rating_breakdown(soup) -> Dict[int, int]:
+    rating_counts = {}
+    for idx, element in enumerate(soup.select(RATING_BREAKDOWN_SELECTOR)):
+        count_text = _text(element).replace(",", "")
+        rating_counts[5 - idx] = int(count_text) if count_text.isdigit() else 0  # Ratings are in order from 5★ to 1★
+    return rating_counts
+
+
+def _extract_feature_ratings(soup) -> Dict[str, float]:
+    feature_ratings = {}
+    for block in soup.select(FEATURE_BLOCK_SELECTOR):
+        rating_elem = block.find(lambda tag: tag.name == "text" and "_2DdnFS" in (tag.get("class") or []))
+        label_elem = block.select_one(FEATURE_LABEL_SELECTOR)
+        if not rating_elem or not label_elem:
+            logger.warning("Error parsing feature rating block: rating or label missing")
+            continue
+
+        rating_text = _text(rating_elem)
+        label_text = _text(label_elem)
+        if rating_text and label_text:
+            try:
+                feature_ratings[label_text] = float(rating_text)
+            except ValueError:
+                logger.warning(f"Non-numeric rating value: '{rating_text}' for label '{label_text}'")
+    return feature_ratings
+
+
+def is_blocked_page(html: str) -> bool:
+    return any(marker in html for marker in BLOCKED_PAGE_MARKERS)
+
+
+def has_product_markers(soup) -> bool:
+    return soup.select_one(TITLE_SELECTOR) is not None
+
+
+def parse_product_html(html: str) -> Dict[str, Any]:
+    """
+    Parses a Flipkart product page snapshot into the same schema that
+    DataFetcher.fetch_product_info builds element by element.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    return parse_product_soup(soup)
+
+
+def parse_product_soup(soup) -> Dict[str, Any]:
+    return {
+        "title": _select_text(soup, TITLE_SELECTOR),
+        "price": _select_text(soup, PRICE_SELECTOR),
+        "rating": _select_text(soup, RATING_SELECTOR),
+        "about_this_item": [t for t in (_text(li) for li in soup.select(ABOUT_SELECTOR)) if t],
+        "services": [t for t in (_text(s) for s in soup.select(SERVICES_SELECTOR)) if t],
+        "paragraph": [t for t in (_text(p) for p in soup.select(PARAGRAPH_SELECTOR)) if t],
+        "technical_specifications": _extract_tech_specs(soup),
+        "rating_breakdown": _extract_rating_breakdown(soup),
+        "feature_ratings": _extract_feature_ratings(soup),
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python product_parser.py saved_product_page.html
+    with open(sys.argv[1], "r", encoding="utf8") as f:
+        print(json.dumps(parse_product_html(f.read()), indent=2, ensure_ascii=False))
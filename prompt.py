@@ -1,6 +1,7 @@
 # --- prompt.py ---
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from prompt_compactor import compact_sections, REPORT_DATA_TOKEN_BUDGET, CHAT_DATA_TOKEN_BUDGET
 
 def classifier_prompt(info: Dict[str, Any]) -> str:
     """
@@ -43,17 +44,37 @@ def classifier_prompt(info: Dict[str, Any]) -> str:
     }
     return json.dumps(prompt, indent=2)
 
-def generate_llm_report(result: dict) -> str:
-    product_info = result.get("product_info", "")
+CATEGORY_TIPS = {
+    "electronics": "- Suggest care or usage tips (e.g., screen care, battery usage).\n- Recommend accessories or pairing items (e.g., cases, earbuds).\n",
+    "food": "- Mention key ingredients or health benefits.\n- Suggest food pairings or time of day usage.\n",
+    "other": "- Suggest primary use cases (e.g., travel, daily wear).\n- Identify ideal users (e.g., students, professionals).\n- Mention care instructions if relevant.\n",
+}
+
+def _inline_category_tips() -> str:
+    """
+    Tip rules for every category, for single-call mode where the report model
+    classifies the product itself.
+    """
+    return (
+        "First decide whether the product is Electronics, Clothes or Food (the Classification Result is only a hint), "
+        "then follow the matching rules. In section 8 use the customer preferences for that category only.\n"
+        f"If Electronics:\n{CATEGORY_TIPS['electronics']}"
+        f"If Food:\n{CATEGORY_TIPS['food']}"
+        f"If Clothes or anything else:\n{CATEGORY_TIPS['other']}"
+    )
+
+def generate_llm_report(result: dict, token_budget: Optional[int] = None, inline_classification: bool = False) -> str:
     classification = result.get("classification_result", {})
-    tech_spec = result.get("specifications", "")
-    reviews = result.get("reviews", "")
-    similar_items = result.get("similar_items", "")
-    youtube_videos = result.get("youtube_videos", "")
-    relevant_items = result.get("relevant_search_items", "")
-    customer_profile = result.get("customer_data", {})
+    sections = compact_sections(result, token_budget or REPORT_DATA_TOKEN_BUDGET, label="report")
+    product_info = sections["product_info"]
+    tech_spec = sections["specifications"]
+    reviews = sections["reviews"]
+    similar_items = sections["similar_items"]
+    youtube_videos = sections["youtube_videos"]
+    relevant_items = sections["relevant_search_items"]
+    customer_profile = sections["customer_data"]
 
-    category = classification.get("product_classifier", "").lower()
+    category = (classification.get("product_classifier") or "").lower()
 
     prompt = f"""
 You are a product analyst AI generating a **clean, professional Markdown report** for a given product.
@@ -144,12 +165,14 @@ Examples:
 Give helpful advice based on product type:
 """
 
-    if category == "electronics":
-        prompt += "- Suggest care or usage tips (e.g., screen care, battery usage).\n- Recommend accessories or pairing items (e.g., cases, earbuds).\n"
+    if inline_classification:
+        prompt += _inline_category_tips()
+    elif category == "electronics":
+        prompt += CATEGORY_TIPS["electronics"]
     elif category == "food":
-        prompt += "- Mention key ingredients or health benefits.\n- Suggest food pairings or time of day usage.\n"
+        prompt += CATEGORY_TIPS["food"]
     else:
-        prompt += "- Suggest primary use cases (e.g., travel, daily wear).\n- Identify ideal users (e.g., students, professionals).\n- Mention care instructions if relevant.\n"
+        prompt += CATEGORY_TIPS["other"]
 
     prompt += f"""
 
@@ -161,7 +184,7 @@ Give helpful advice based on product type:
 {product_info}
 
 ### Classification Result
-{classification}
+{sections["classification_result"]}
 
 ### Specifications
 {tech_spec}
@@ -189,14 +212,100 @@ Now generate a **fully structured Markdown report** using all the formatting rul
 """
     return prompt
 
-def chat_prompt(result: Dict[str, Any], chat_history: List[Dict[str, str]], question: str) -> str:
-    product_info = result.get("product_info", "")
+def _without_links(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{k: v for k, v in item.items() if k != "link"} for item in items or [] if isinstance(item, dict)]
+
+def generate_narrative_report(result: dict, token_budget: Optional[int] = None, inline_classification: bool = False) -> str:
+    """
+    Prompt for the hybrid renderer: the LLM writes only sections 1, 3, 4, 8
+    and 9, and report_renderer fills in the tables. Links and YouTube data
+    are left out since the model no longer reproduces them.
+    """
     classification = result.get("classification_result", {})
-    tech_spec = result.get("specifications", "")
-    reviews = result.get("reviews", "")
-    similar_items = result.get("similar_items", "")
-    youtube_videos = result.get("youtube_videos", "")
-    relevant_items = result.get("relevant_search_items", "")
+    narrative_data = {
+        **result,
+        "similar_items": _without_links(result.get("similar_items")),
+        "relevant_search_items": [_without_links(group) for group in result.get("relevant_search_items") or []],
+        "youtube_videos": [],
+    }
+    sections = compact_sections(narrative_data, token_budget or REPORT_DATA_TOKEN_BUDGET, label="narrative")
+    category = (classification.get("product_classifier") or "").lower()
+
+    prompt = """
+You are a product analyst AI writing the narrative parts of a **Markdown product report**.
+The specifications, similar items, YouTube and alternatives tables are generated separately and inserted between your sections, so do not write tables, links or any other sections.
+
+Write exactly these five sections, in this order, each starting with its bold heading on its own line:
+
+**1. Product Summary**
+- What the product is and its purpose, price (if available), rating, and its top 2–3 selling points.
+
+**3. Review Analysis**
+- Positive comments, common complaints or negatives, and any trends or repeated mentions.
+
+**4. Product Comparison with Similar Items**
+- 3–4 bullets on how this product differs from the similar items below (price, features, ratings), naming them as given.
+
+**8. Personalized Recommendation Check**
+- How well the product fits the customer profile: matching features, mismatches or concerns, and a final recommendation.
+- Name up to 3 cross-category complementary products.
+
+**9. Category-Specific Tips**
+"""
+
+    if inline_classification:
+        prompt += _inline_category_tips()
+    elif category == "electronics":
+        prompt += CATEGORY_TIPS["electronics"]
+    elif category == "food":
+        prompt += CATEGORY_TIPS["food"]
+    else:
+        prompt += CATEGORY_TIPS["other"]
+
+    prompt += f"""
+Use 3–5 concise **bullet points (`-`)** per section. No tables, links, HTML, JSON or code blocks. Keep the tone professional and helpful.
+
+---
+
+## 🧩 Raw Data Below (for your reference only):
+
+### Product Info
+{sections["product_info"]}
+
+### Classification Result
+{sections["classification_result"]}
+
+### Specifications
+{sections["specifications"]}
+
+### Reviews
+{sections["reviews"]}
+
+### Similar Items
+{sections["similar_items"]}
+
+### Relevant Search Items
+{sections["relevant_search_items"]}
+
+### Customer Profile
+{sections["customer_data"]}
+
+---
+
+**Respond ONLY with the five sections. No preambles. No explanations.**
+"""
+    return prompt
+
+def chat_prompt(result: Dict[str, Any], chat_history: List[Dict[str, str]], question: str,
+                token_budget: Optional[int] = None) -> str:
+    sections = compact_sections(result or {}, token_budget or CHAT_DATA_TOKEN_BUDGET, label="chat")
+    product_info = sections["product_info"]
+    classification = sections["classification_result"]
+    tech_spec = sections["specifications"]
+    reviews = sections["reviews"]
+    similar_items = sections["similar_items"]
+    youtube_videos = sections["youtube_videos"]
+    relevant_items = sections["relevant_search_items"]
 
     prompt = (
         "You're a friendly and knowledgeable product assistant designed to help users make smart shopping decisions.\n\n"
@@ -0,0 +1,167 @@
+# --- prompt_compactor.py ---
+import os
+import json
+from typing import Any, Callable, Dict, List, Optional
+from url_utils import canonicalize_url, product_key
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+REPORT_DATA_TOKEN_BUDGET = int(os.getenv("REPORT_DATA_TOKEN_BUDGET", "2500"))
+CHAT_DATA_TOKEN_BUDGET = int(os.getenv("CHAT_DATA_TOKEN_BUDGET", "2500"))
+REVIEW_TEXT_MAX_CHARS = int(os.getenv("REVIEW_TEXT_MAX_CHARS", "400"))
+DESCRIPTION_MAX_CHARS = int(os.getenv("DESCRIPTION_MAX_CHARS", "200"))
+PARAGRAPH_MAX_CHARS = int(os.getenv("PARAGRAPH_MAX_CHARS", "600"))
+# Over budget, reviews are first cut to this many and this length before other sections shrink
+REVIEW_TRIM_COUNT = int(os.getenv("REVIEW_TRIM_COUNT", "10"))
+REVIEW_TRIM_CHARS = int(os.getenv("REVIEW_TRIM_CHARS", "160"))
+
+# total_info keys in order of importance; the tail is trimmed first when over budget
+SECTIONS = [
+    "product_info",
+    "specifications",
+    "classification_result",
+    "customer_data",
+    "reviews",
+    "similar_items",
+    "relevant_search_items",
+    "youtube_videos",
+]
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; close enough for budgeting without a tokenizer
+    return (len(text) + 3) // 4
+
+
+def to_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+
+def _drop_empty(value: Any) -> Any:
+    if isinstance(value, dict):
+        cleaned = {k: _drop_empty(v) for k, v in value.items()}
+        return {k: v for k, v in cleaned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        cleaned = [_drop_empty(v) for v in value]
+        return [v for v in cleaned if v not in (None, "", [], {})]
+    return value
+
+
+def _shorten_link(item: Dict[str, Any]) -> Dict[str, Any]:
+    # Only Flipkart/Amazon product URLs are shortened; other links (e.g. Google Shopping) need their query as is
+    link = item.get("link")
+    if not isinstance(link, str) or not link.startswith("http"):
+        return item
+    if (product_key(link) or "").startswith(("flipkart:", "amazon:")):
+        item = {**item, "link": canonicalize_url(link)}
+    return item
+
+
+def _dedupe(items: List[Dict[str, Any]], key: Callable[[Dict[str, Any]], Any], seen: Optional[set] = None) -> List[Dict[str, Any]]:
+    seen = set() if seen is None else seen
+    unique = []
+    for item in items:
+        k = key(item)
+        if k in seen:
+            continue
+        seen.add(k)
+        unique.append(item)
+    return unique
+
+
+def _clean_sections(result: Dict[str, Any]) -> Dict[str, Any]:
+    sections = {name: result.get(name) for name in SECTIONS}
+
+    product_info = dict(sections["product_info"] or {})
+    if sections["specifications"]:
+        # Same table is already sent as the specifications section
+        product_info.pop("technical_specifications", None)
+    product_info["paragraph"] = [_truncate(p, PARAGRAPH_MAX_CHARS) for p in product_info.get("paragraph") or []]
+    sections["product_info"] = product_info
+
+    reviews = [
+        {**r, "review": _truncate(r.get("review") or "", REVIEW_TEXT_MAX_CHARS)}
+        for r in sections["reviews"] or []
+    ]
+    sections["reviews"] = _dedupe(reviews, key=lambda r: (r.get("summary"), r.get("review")))
+
+    seen_items = set()
+    item_key = lambda i: (i.get("title") or "").lower()
+    sections["similar_items"] = _dedupe([_shorten_link(i) for i in sections["similar_items"] or []], item_key, seen_items)
+    sections["relevant_search_items"] = [
+        _dedupe([_shorten_link(i) for i in group or []], item_key, seen_items)
+        for group in sections["relevant_search_items"] or []
+    ]
+
+    sections["youtube_videos"] = [
+        {**_shorten_link(v), "description": _truncate(v.get("description") or "", DESCRIPTION_MAX_CHARS)}
+        for v in sections["youtube_videos"] or []
+    ]
+
+    return {name: _drop_empty(value) for name, value in sections.items()}
+
+
+def _trim_one(sections: Dict[str, Any]) -> bool:
+    """
+    Shrinks the payload by one step. Long lists are capped and long reviews
+    shortened before any section loses its last item.
+    """
+    reviews = sections.get("reviews") or []
+    if len(sections.get("youtube_videos") or []) > 1:
+        sections["youtube_videos"].pop()
+        return True
+    if len(reviews) > REVIEW_TRIM_COUNT:
+        reviews.pop()
+        return True
+    shortened = [_truncate(r.get("review") or "", REVIEW_TRIM_CHARS) for r in reviews]
+    if any(text != (r.get("review") or "") for text, r in zip(shortened, reviews)):
+        for text, r in zip(shortened, reviews):
+            r["review"] = text
+        return True
+    groups = sections.get("relevant_search_items") or []
+    if groups and len(max(groups, key=len)) > 1:
+        max(groups, key=len).pop()
+        return True
+    if len(sections.get("similar_items") or []) > 2:
+        sections["similar_items"].pop()
+        return True
+    if len(reviews) > 3:
+        reviews.pop()
+        return True
+    if sections.get("youtube_videos"):
+        sections["youtube_videos"].pop()
+        return True
+    if groups:
+        groups.pop()
+        return True
+    paragraphs = (sections.get("product_info") or {}).get("paragraph") or []
+    if paragraphs:
+        paragraphs.pop()
+        return True
+    return False
+
+
+def compact_sections(result: Dict[str, Any], budget: int, label: str = "prompt") -> Dict[str, str]:
+    """
+    Serializes each total_info section to compact JSON, trimming the least
+    important sections until the whole payload fits in `budget` tokens.
+    """
+    before = estimate_tokens("".join(str(result.get(name, "")) for name in SECTIONS))
+    sections = _clean_sections(result)
+
+    def total() -> int:
+        return estimate_tokens("".join(to_json(v) for v in sections.values()))
+
+    while total() > budget and _trim_one(sections):
+        pass
+
+    after = total()
+    logger.info(f"[Prompt] {label} data ~{before} tokens -> ~{after} tokens (budget {budget})")
+    if after > budget:
+        logger.warning(f"[Prompt] {label} data still over budget after compaction")
+    return {name: to_json(value) if value not in (None, "", [], {}) else "N/A" for name, value in sections.items()}
@@ -0,0 +1,200 @@
+# --- report_renderer.py ---
+import os
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+# "hybrid": data tables are rendered here and the LLM writes only the narrative; "llm": the LLM writes every section
+REPORT_RENDERER = os.getenv("REPORT_RENDERER", "hybrid")
+SPEC_TABLE_ROWS = int(os.getenv("SPEC_TABLE_ROWS", "5"))
+ITEM_TABLE_ROWS = int(os.getenv("ITEM_TABLE_ROWS", "5"))
+VIDEO_TABLE_ROWS = int(os.getenv("VIDEO_TABLE_ROWS", "3"))
+
+SECTION_TITLES = {
+    1: "Product Summary",
+    2: "Key Specifications",
+    3: "Review Analysis",
+    4: "Product Comparison with Similar Items",
+    5: "Similar Items (with links)",
+    6: "YouTube Reviews",
+    7: "Relevant Alternatives",
+    8: "Personalized Recommendation Check",
+    9: "Category-Specific Tips",
+}
+NARRATIVE_SECTIONS = (1, 3, 4, 8, 9)
+LOCAL_SECTIONS = (2, 5, 6, 7)
+
+HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s*)?\*{0,2}\s*(\d)\s*[.)]\s*\*{0,2}\s*([A-Za-z][^*\n]*?)\s*\*{0,2}\s*:?\s*$")
+
+
+def section_number(line: str) -> Optional[int]:
+    """
+    Returns the report section a heading line starts (`**3. Review Analysis**`,
+    `### 3. Review Analysis`, ...), or None. The title has to match too, so
+    numbered list items inside a section are not taken for headings.
+    """
+    match = HEADING_RE.match(line)
+    if not match:
+        return None
+    number = int(match.group(1))
+    title = SECTION_TITLES.get(number)
+    if not title or match.group(2).split()[0].lower() != title.split()[0].lower():
+        return None
+    return number
+
+
+def heading(number: int) -> str:
+    return f"**{number}. {SECTION_TITLES[number]}**"
+
+
+def _cell(value: Any) -> str:
+    text = " ".join(str(value).split()) if value not in (None, "") else "—"
+    return text.replace("|", "\\|")
+
+
+def _link(text: str, url: Any) -> str:
+    if not isinstance(url, str) or not url.startswith("http"):
+        return "Link not available"
+    # The URL is used as fetched; only characters that would end a markdown link are escaped
+    url = url.replace(" ", "%20").replace("(", "%28").replace(")", "%29")
+    return f"[{text.replace('[', '(').replace(']', ')')}]({url})"
+
+
+def _table(columns: List[str], rows: Iterable[List[str]]) -> str:
+    lines = [f"| {' | '.join(columns)} |", f"|{'|'.join('---' for _ in columns)}|"]
+    lines += [f"| {' | '.join(row)} |" for row in rows]
+    return "\n".join(lines)
+
+
+def _unique_items(items: Iterable[Dict[str, Any]], seen: set, limit: int) -> List[Dict[str, Any]]:
+    unique = []
+    for item in items:
+        title = (item.get("title") or "").strip()
+        if not title or title.lower() in seen:
+            continue
+        seen.add(title.lower())
+        unique.append(item)
+        if len(unique) >= limit:
+            break
+    return unique
+
+
+def render_specs(total_info: Dict[str, Any], limit: int = SPEC_TABLE_ROWS) -> str:
+    specs = total_info.get("specifications") or (total_info.get("product_info") or {}).get("technical_specifications") or {}
+    if not specs:
+        return "_No specifications were listed for this product._"
+    # Flipkart lists the general, most telling specs first
+    rows = [[_cell(feature), _cell(details)] for feature, details in list(specs.items())[:limit]]
+    return _table(["Feature", "Details"], rows)
+
+
+def render_items(items: List[Dict[str, Any]], empty: str) -> str:
+    if not items:
+        return empty
+    rows = [[_cell(i.get("title")), _cell(i.get("price")), _link("View", i.get("link"))] for i in items]
+    return _table(["Product Name", "Price", "Link"], rows)
+
+
+def render_videos(videos: List[Dict[str, Any]], limit: int = VIDEO_TABLE_ROWS) -> str:
+    videos = [v for v in videos or [] if v.get("title")][:limit]
+    if not videos:
+        return "_No video reviews were found._"
+    rows = [[_cell(v.get("title")), _cell(v.get("channel")), _link("Watch", v.get("link"))] for v in videos]
+    return _table(["Title", "Channel", "Watch"], rows)
+
+
+LocalSection = Union[str, Callable[[], str]]
+
+
+def render_local_sections(total_info: Dict[str, Any], limit: int = ITEM_TABLE_ROWS,
+                          wait_for_alternatives: Optional[Callable[[], Any]] = None) -> Dict[int, LocalSection]:
+    """
+    Builds the data-table sections (2, 5, 6 and 7) straight from total_info,
+    so prices and links appear exactly as fetched. With `wait_for_alternatives`
+    section 7 is rendered only when the report reaches it, after that call has
+    filled in total_info["relevant_search_items"].
+    """
+    seen = set()
+    similar = _unique_items(total_info.get("similar_items") or [], seen, limit)
+
+    def alternatives() -> str:
+        if wait_for_alternatives:
+            wait_for_alternatives()
+        items = _unique_items(
+            (item for group in total_info.get("relevant_search_items") or [] for item in group or []), seen, limit
+        )
+        return f"{heading(7)}\n{render_items(items, '_No alternatives were found._')}"
+
+    bodies = {
+        2: render_specs(total_info),
+        5: render_items(similar, "_No similar items were found._"),
+        6: render_videos(total_info.get("youtube_videos") or []),
+    }
+    sections: Dict[int, LocalSection] = {number: f"{heading(number)}\n{body}" for number, body in bodies.items()}
+    sections[7] = alternatives if wait_for_alternatives else alternatives()
+    return sections
+
+
+class ReportAssembler:
+    """
+    Merges the LLM's narrative sections with the locally rendered ones in
+    section order. Works on a stream: `feed` takes model deltas and returns
+    the text that can be sent on (whole lines, with local sections inserted
+    ahead of the first heading that follows them), `finish` flushes the rest.
+    Sections the model writes despite being rendered locally are dropped.
+    A local section given as a callable is rendered only when it is inserted.
+    """
+
+    def __init__(self, local_sections: Dict[int, LocalSection]):
+        self.local = dict(local_sections)
+        self._buffer = ""
+        self._skipping = False
+        self._at_break = True
+
+    def _local_before(self, number: int) -> str:
+        ready = [n for n in sorted(self.local) if n < number]
+        if not ready:
+            return ""
+        # Keep a blank line on both sides so the table never joins the list before it
+        text = "" if self._at_break else "\n"
+        for n in ready:
+            section = self.local.pop(n)
+            text += f"{section() if callable(section) else section}\n\n"
+        self._at_break = True
+        return text
+
+    def _line(self, line: str) -> str:
+        number = section_number(line)
+        if number is None:
+            if self._skipping or (self._at_break and not line.strip()):
+                return ""
+            self._at_break = not line.strip()
+            return line
+        if number in LOCAL_SECTIONS:
+            self._skipping = True
+            return self._local_before(number + 1)
+        self._skipping = False
+        text = self._local_before(number)
+        self._at_break = False
+        return text + line
+
+    def feed(self, delta: str) -> str:
+        self._buffer += delta
+        out = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            out.append(self._line(line + "\n"))
+        return "".join(out)
+
+    def finish(self) -> str:
+        out = self._line(self._buffer + "\n") if self._buffer else ""
+        self._buffer = ""
+        return out + self._local_before(len(SECTION_TITLES) + 1)
+
+
+def assemble_report(narrative: str, total_info: Dict[str, Any],
+                    wait_for_alternatives: Optional[Callable[[], Any]] = None) -> str:
+    assembler = ReportAssembler(render_local_sections(total_info, wait_for_alternatives=wait_for_alternatives))
+    return (assembler.feed(narrative) + assembler.finish()).strip()
@@ -1,9 +1,17 @@
 # --- review_fetcher.py ---
-import requests
+import os
 import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from bs4 import BeautifulSoup
 from logger_context import call_id_var
 from logger_util import setup_logger
+from http_client import get_http_client
+from single_flight import SingleFlight
+import metrics
+from review_parser import extract_reviews_from_soup, get_backend, REVIEW_PARSER_BACKEND
 
 logger = setup_logger(__name__)
 
@@ -19,21 +27,29 @@ HEADERS = {
 MAX_RETRIES = 5
 RETRY_DELAY = 4  # seconds
 
+# Review crawl limits
+REVIEW_MAX_PAGES = int(os.getenv("REVIEW_MAX_PAGES", "5"))
+REVIEW_MAX_REVIEWS = int(os.getenv("REVIEW_MAX_REVIEWS", "50"))
+REVIEW_CRAWL_CONCURRENCY = int(os.getenv("REVIEW_CRAWL_CONCURRENCY", "3"))
+
 class ReviewFetcher:
     """
     Fetches customer reviews from a specific Flipkart product review page URL.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, parser_backend: str = REVIEW_PARSER_BACKEND):
+        self.http = get_http_client()
+        self.parse_reviews = get_backend(parser_backend)
+        self.page_flight = SingleFlight("review_pages")
 
-    def get_html_soup(self, url: str):
+    def get_html(self, url: str) -> Optional[str]:
         for attempt in range(MAX_RETRIES):
             try:
-                response = requests.get(url, headers=HEADERS)
+                response = self.http.get(url, headers=HEADERS)
                 if response.status_code == 200:
-                    return BeautifulSoup(response.text, 'html.parser')
+                    return response.text
                 elif response.status_code == 429:
+                    metrics.inc("http_retries_total", reason="429", caller="reviews")
                     logger.warning(f"[{call_id_var.get()}] Rate limited (429). Retrying in {RETRY_DELAY}s (attempt {attempt + 1}/{MAX_RETRIES})")
                     time.sleep(RETRY_DELAY)
                 else:
@@ -41,63 +57,111 @@ class ReviewFetcher:
                     return None
             except Exception as e:
                 logger.exception(f"[{call_id_var.get()}] Exception while fetching HTML (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
+                metrics.inc("http_retries_total", reason=type(e).__name__, caller="reviews")
                 time.sleep(RETRY_DELAY)
         logger.error(f"[{call_id_var.get()}] Max retries reached. Failed to fetch page.")
         return None
 
-    def extract_reviews_from_page(self, soup):
-        reviews = []
-        rows = soup.find_all('div', class_=['col', 'EPCmJX'])
-
-        for row in rows:
-            try:
-                sub_row = row.find_all('div', class_='row')
-                if len(sub_row) < 4:
-                    continue
-
-                rating = sub_row[0].find('div').get_text(strip=True)
-                summary = sub_row[0].find('p').get_text(strip=True)
-                review = sub_row[1].find_all('div')[2].get_text(strip=True)
-
-                location_tag = sub_row[3].find('p', class_='_2mcZGG')
-                location = "Unknown"
-                if location_tag:
-                    span_tags = location_tag.find_all('span')
-                    if len(span_tags) > 1:
-                        location = "".join(span_tags[1].get_text().split(",")[1:]).strip()
-
-                date_tags = sub_row[3].find_all('p', class_='_2sc7ZR')
-                date = date_tags[1].get_text(strip=True) if len(date_tags) > 1 else "Unknown"
-
-                sub_row_2 = row.find_all('div', class_='_1e9_Zu')
-                upvotes, downvotes = "0", "0"
-                if sub_row_2:
-                    spans = sub_row_2[0].find_all('span', class_='_3c3Px5')
-                    if len(spans) >= 2:
-                        upvotes = spans[0].get_text(strip=True)
-                        downvotes = spans[1].get_text(strip=True)
-
-                reviews.append({
-                    "rating": rating,
-                    "summary": summary,
-                    "review": review,
-                    "location": location,
-                    "date": date,
-                    "upvotes": upvotes,
-                    "downvotes": downvotes
-                })
-
-            except Exception as e:
-                logger.warning(f"[{call_id_var.get()}] Error parsing a review block: {e}")
+    def get_html_soup(self, url: str):
+        html = self.get_html(url)
+        return BeautifulSoup(html, 'html.parser') if html is not None else None
 
-        return reviews
+    def extract_reviews_from_page(self, soup):
+        return extract_reviews_from_soup(soup)
+
+    def reviews_url(self, url: str) -> Optional[str]:
+        """
+        Maps a Flipkart product URL to its `product-reviews` listing, keeping only the pid.
+        """
+        parts = urlsplit(url)
+        if "/product-reviews/" in parts.path:
+            path = parts.path
+        elif "/p/" in parts.path:
+            path = parts.path.replace("/p/", "/product-reviews/", 1)
+        else:
+            return None
+        query = [(k, v) for k, v in parse_qsl(parts.query) if k == "pid"]
+        return urlunsplit((parts.scheme, parts.netloc, path, urlencode(query), ""))
+
+    def _page_url(self, reviews_url: str, page: int) -> str:
+        parts = urlsplit(reviews_url)
+        query = [(k, v) for k, v in parse_qsl(parts.query) if k != "page"] + [("page", str(page))]
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+    def _fetch_page(self, url: str) -> List[Dict[str, str]]:
+        # Crawls of the same product running at once fetch and parse each page only once. Page
+        # URLs from _page_url carry just the pid and page number, so they work as keys as they are
+        reviews = self.page_flight.do(url, lambda: self._load_page(url))
+        return [dict(review) for review in reviews]
+
+    def _load_page(self, url: str) -> List[Dict[str, str]]:
+        with metrics.span("review_page_fetch"):
+            html = self.get_html(url)
+        if not html:
+            logger.error(f"[{call_id_var.get()}] Failed to fetch or parse HTML for {url}")
+            return []
+        with metrics.span("review_page_parse"):
+            return self.parse_reviews(html)
+
+    def iter_reviews(self, url: str, max_pages: int = REVIEW_MAX_PAGES, max_reviews: int = REVIEW_MAX_REVIEWS,
+                     concurrency: int = REVIEW_CRAWL_CONCURRENCY) -> Iterator[Dict[str, str]]:
+        """
+        Crawls review pages 1..max_pages with up to `concurrency` pages in flight
+        and yields reviews in page order as soon as each page is parsed. Stops
+        early once `max_reviews` are collected, a page comes back empty, or a
+        page repeats one already seen (Flipkart serves the last page again past the end).
+        """
+        reviews_url = self.reviews_url(url)
+        if not reviews_url:
+            logger.info(f"[{call_id_var.get()}] No review listing for {url}, reading reviews from the page itself")
+            yield from self._fetch_page(url)[:max_reviews]
+            return
+
+        pool = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="reviews")
+        in_flight = {}
+        next_page = 1
+        seen_pages = set()
+        seen_reviews = set()
+        yielded = 0
+
+        def submit_next():
+            nonlocal next_page
+            while next_page <= max_pages and len(in_flight) < concurrency:
+                ctx = contextvars.copy_context()
+                in_flight[next_page] = pool.submit(ctx.run, self._fetch_page, self._page_url(reviews_url, next_page))
+                next_page += 1
+
+        try:
+            submit_next()
+            page = 1
+            while page in in_flight:
+                page_reviews = in_flight.pop(page).result()
+                submit_next()
+
+                signature = tuple((r["summary"], r["review"]) for r in page_reviews)
+                if not page_reviews or signature in seen_pages:
+                    logger.info(f"[{call_id_var.get()}] Review crawl stopped at page {page} (empty or repeated)")
+                    return
+                seen_pages.add(signature)
+
+                for review in page_reviews:
+                    key = (review["summary"], review["review"], review["date"])
+                    if key in seen_reviews:
+                        continue
+                    seen_reviews.add(key)
+                    yield review
+                    yielded += 1
+                    if yielded >= max_reviews:
+                        logger.info(f"[{call_id_var.get()}] Review crawl collected {yielded} reviews by page {page}")
+                        return
+                page += 1
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
 
     def get_reviews_from_url(self, url: str) -> list:
-        soup = self.get_html_soup(url)
-        if not soup:
-            logger.error(f"[{call_id_var.get()}] Failed to fetch or parse HTML.")
-            return []
-        return self.extract_reviews_from_page(soup)
+        reviews = list(self.iter_reviews(url))
+        logger.info(f"[{call_id_var.get()}] Fetched {len(reviews)} reviews for {url}")
+        return reviews
 
 
 if __name__ == "__main__":
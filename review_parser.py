@@ -0,0 +1,211 @@
+# --- review_parser.py ---
+import glob
+import os
+import sys
+import time
+from typing import Callable, Dict, List
+from bs4 import BeautifulSoup, SoupStrainer
+from logger_context import call_id_var
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+try:  # optional: fastest backend when installed
+    from lxml import etree, html as lxml_html
+except ImportError:
+    etree = None
+    lxml_html = None
+
+# lxml is faster but repairs malformed markup differently from html.parser (a <div> inside the
+# summary <p> closes the paragraph early), so it is opt-in; strainer is byte-identical
+REVIEW_PARSER_BACKEND = os.getenv("REVIEW_PARSER_BACKEND", "strainer")
+SAVED_REVIEW_PAGES = os.getenv("SAVED_REVIEW_PAGES", "fixtures/*/reviews_*.html")
+REVIEW_ROW_CLASSES = {"col", "EPCmJX"}
+
+
+def _is_review_row(class_value) -> bool:
+    # Called with the raw class string while parsing, or a list once parsed
+    if not class_value:
+        return False
+    classes = class_value.split() if isinstance(class_value, str) else class_value
+    return bool(REVIEW_ROW_CLASSES.intersection(classes))
+
+
+# Only review containers (and everything inside them) are kept in the tree
+REVIEW_ROW_STRAINER = SoupStrainer("div", class_=_is_review_row)
+
+
+def extract_reviews_from_soup(soup) -> List[Dict[str, str]]:
+    reviews = []
+    rows = soup.find_all('div', class_=['col', 'EPCmJX'])
+
+    for row in rows:
+        try:
+            sub_row = row.find_all('div', class_='row')
+            if len(sub_row) < 4:
+                continue
+
+            rating = sub_row[0].find('div').get_text(strip=True)
+            summary = sub_row[0].find('p').get_text(strip=True)
+            review = sub_row[1].find_all('div')[2].get_text(strip=True)
+
+            location_tag = sub_row[3].find('p', class_='_2mcZGG')
+            location = "Unknown"
+            if location_tag:
+                span_tags = location_tag.find_all('span')
+                if len(span_tags) > 1:
+                    location = "".join(span_tags[1].get_text().split(",")[1:]).strip()
+
+            date_tags = sub_row[3].find_all('p', class_='_2sc7ZR')
+            date = date_tags[1].get_text(strip=True) if len(date_tags) > 1 else "Unknown"
+
+            sub_row_2 = row.find_all('div', class_='_1e9_Zu')
+            upvotes, downvotes = "0", "0"
+            if sub_row_2:
+                spans = sub_row_2[0].find_all('span', class_='_3c3Px5')
+                if len(spans) >= 2:
+                    upvotes = spans[0].get_text(strip=True)
+                    downvotes = spans[1].get_text(strip=True)
+
+            reviews.append({
+                "rating": rating,
+                "summary": summary,
+                "review": review,
+                "location": location,
+                "date": date,
+                "upvotes": upvotes,
+                "downvotes": downvotes
+            })
+
+        except Exception as e:
+            logger.warning(f"[{call_id_var.get()}] Error parsing a review block: {e}")
+
+    return reviews
+
+
+def parse_reviews_html_parser(html: str) -> List[Dict[str, str]]:
+    return extract_reviews_from_soup(BeautifulSoup(html, 'html.parser'))
+
+
+def parse_reviews_strainer(html: str) -> List[Dict[str, str]]:
+    return extract_reviews_from_soup(BeautifulSoup(html, 'html.parser', parse_only=REVIEW_ROW_STRAINER))
+
+
+if etree is not None:
+    def _has_class(name: str) -> str:
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    X_ROWS = etree.XPath(f"//div[{_has_class('col')} or {_has_class('EPCmJX')}]")
+    X_SUB_ROWS = etree.XPath(f".//div[{_has_class('row')}]")
+    X_DIVS = etree.XPath(".//div")
+    X_PARAGRAPHS = etree.XPath(".//p")
+    X_LOCATION = etree.XPath(f".//p[{_has_class('_2mcZGG')}]")
+    X_SPANS = etree.XPath(".//span")
+    X_DATES = etree.XPath(f".//p[{_has_class('_2sc7ZR')}]")
+    X_VOTE_BLOCKS = etree.XPath(f".//div[{_has_class('_1e9_Zu')}]")
+    X_VOTES = etree.XPath(f".//span[{_has_class('_3c3Px5')}]")
+    X_TEXT = etree.XPath(".//text()")
+
+
+def _lxml_text(element, strip: bool = False) -> str:
+    # Same result as BeautifulSoup's get_text() / get_text(strip=True)
+    if strip:
+        return "".join(t.strip() for t in X_TEXT(element) if t.strip())
+    return "".join(X_TEXT(element))
+
+
+def parse_reviews_lxml(html: str) -> List[Dict[str, str]]:
+    reviews = []
+    doc = lxml_html.fromstring(html)
+
+    for row in X_ROWS(doc):
+        try:
+            sub_row = X_SUB_ROWS(row)
+            if len(sub_row) < 4:
+                continue
+
+            rating = _lxml_text(X_DIVS(sub_row[0])[0], strip=True)
+            summary = _lxml_text(X_PARAGRAPHS(sub_row[0])[0], strip=True)
+            review = _lxml_text(X_DIVS(sub_row[1])[2], strip=True)
+
+            location_tags = X_LOCATION(sub_row[3])
+            location = "Unknown"
+            if location_tags:
+                span_tags = X_SPANS(location_tags[0])
+                if len(span_tags) > 1:
+                    location = "".join(_lxml_text(span_tags[1]).split(",")[1:]).strip()
+
+            date_tags = X_DATES(sub_row[3])
+            date = _lxml_text(date_tags[1], strip=True) if len(date_tags) > 1 else "Unknown"
+
+            sub_row_2 = X_VOTE_BLOCKS(row)
+            upvotes, downvotes = "0", "0"
+            if sub_row_2:
+                spans = X_VOTES(sub_row_2[0])
+                if len(spans) >= 2:
+                    upvotes = _lxml_text(spans[0], strip=True)
+                    downvotes = _lxml_text(spans[1], strip=True)
+
+            reviews.append({
+                "rating": rating,
+                "summary": summary,
+                "review": review,
+                "location": location,
+                "date": date,
+                "upvotes": upvotes,
+                "downvotes": downvotes
+            })
+
+        except Exception as e:
+            logger.warning(f"[{call_id_var.get()}] Error parsing a review block: {e}")
+
+    return reviews
+
+
+BACKENDS: Dict[str, Callable[[str], List[Dict[str, str]]]] = {
+    "html.parser": parse_reviews_html_parser,
+    "strainer": parse_reviews_strainer,
+}
+if etree is not None:
+    BACKENDS["lxml"] = parse_reviews_lxml
+
+
+def get_backend(name: str = REVIEW_PARSER_BACKEND) -> Callable[[str], List[Dict[str, str]]]:
+    if name not in BACKENDS:
+        logger.warning(f"Review parser backend '{name}' is unavailable, using 'html.parser'")
+        return parse_reviews_html_parser
+    return BACKENDS[name]
+
+
+def benchmark(paths: List[str], repeat: int = 20) -> Dict[str, Dict[str, float]]:
+    """
+    Times every available backend over saved review pages and checks that each
+    one returns exactly the same review dicts as the html.parser reference.
+    """
+    pages = []
+    for path in paths:
+        with open(path, "r", encoding="utf8") as f:
+            pages.append(f.read())
+
+    reference = [parse_reviews_html_parser(page) for page in pages]
+    results = {}
+    for name, parse in BACKENDS.items():
+        identical = [parse(page) for page in pages] == reference
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for page in pages:
+                parse(page)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "ms_per_page": elapsed * 1000 / (repeat * len(pages)),
+            "identical": identical,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    # Usage: python review_parser.py [saved_reviews_1.html ...]  (defaults to the saved fixture pages)
+    report = benchmark(sys.argv[1:] or sorted(glob.glob(SAVED_REVIEW_PAGES)))
+    baseline = report["html.parser"]["ms_per_page"]
+    for name, row in report.items():
+        print(f"{name:12} {row['ms_per_page']:8.2f} ms/page  x{baseline / row['ms_per_page']:.1f}  identical={row['identical']}")
@@ -0,0 +1,78 @@
+# --- single_flight.py ---
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+from logger_util import setup_logger
+import metrics
+
+logger = setup_logger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one. The first caller runs
+    the function; callers arriving while it is in flight wait for its result,
+    and an error is raised to every waiter. Nothing is kept once the call ends.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def claim(self, key: str) -> Tuple[_Call, bool]:
+        """
+        Lower-level form of `do` for work that cannot be wrapped in one
+        function call, such as a generator. Returns the call and whether the
+        caller leads it; the leader must hand the outcome to `release`, the
+        others pass the call to `wait`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                return call, True
+            call.waiters += 1
+            self.shared += 1
+        metrics.inc("singleflight_shared_total", flight=self.name)
+        logger.info(f"[SingleFlight:{self.name}] Joining in-flight call for {key}")
+        return call, False
+
+    def wait(self, key: str, call: _Call, timeout: Optional[float] = None) -> Any:
+        if not call.done.wait(timeout):
+            raise TimeoutError(f"In-flight call for {key} did not finish within {timeout}s")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def release(self, key: str, call: _Call, result: Any = None, error: Optional[BaseException] = None):
+        call.result, call.error = result, error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        call, leader = self.claim(key)
+        if not leader:
+            return self.wait(key, call, timeout)
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.release(key, call, error=e)
+            raise
+        self.release(key, call, result)
+        return result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
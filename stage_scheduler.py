@@ -0,0 +1,190 @@
+# --- stage_scheduler.py ---
+import os
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from logger_util import setup_logger
+import metrics
+
+logger = setup_logger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "8"))
+DEFAULT_FANOUT_WORKERS = int(os.getenv("PIPELINE_FANOUT_WORKERS", "5"))
+
+
+class StageAborted(Exception):
+    """
+    Raised by a stage to stop the whole pipeline (e.g. product data missing).
+    """
+
+
+class Stage:
+    """
+    A single unit of work in the pipeline.
+
+    `fn` is called with the results of `deps` as keyword arguments. If the stage
+    raises or runs past `timeout` seconds, `default` is used as its result so
+    dependents can still run. A stage marked `required` aborts the run instead.
+    A stage that produces its result incrementally can pass `partial`, which is
+    called on timeout to return (and stop) whatever it has gathered so far.
+    """
+
+    def __init__(self, name: str, fn: Callable[..., Any], deps: Iterable[str] = (),
+                 timeout: Optional[float] = None, default: Any = None, required: bool = False,
+                 partial: Optional[Callable[[], Any]] = None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.default = default
+        self.required = required
+        self.partial = partial
+
+
+class StageScheduler:
+    """
+    Runs a DAG of stages on a bounded thread pool, starting each stage as soon
+    as all of its dependencies have finished.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, fanout_workers: int = DEFAULT_FANOUT_WORKERS,
+                 on_progress: Optional[Callable[[str, str], None]] = None):
+        self.max_workers = max_workers
+        self.fanout_workers = fanout_workers
+        self.on_progress = on_progress
+        self.timings: Dict[str, float] = {}
+
+    def _report(self, stage: str, status: str):
+        if self.on_progress:
+            try:
+                self.on_progress(stage, status)
+            except Exception as e:
+                logger.warning(f"[Scheduler] Progress callback failed: {e}")
+
+    def _finish(self, stage: str, status: str):
+        metrics.observe("pipeline_stage_seconds", self.timings[stage], stage=stage, status=status)
+        self._report(stage, status)
+
+    def _submit(self, pool: ThreadPoolExecutor, fn: Callable[..., Any], *args, **kwargs):
+        # Worker threads don't inherit context variables, so carry call_id across.
+        ctx = contextvars.copy_context()
+        return pool.submit(ctx.run, fn, *args, **kwargs)
+
+    def _validate(self, stages: List[Stage]):
+        names = {s.name for s in stages}
+        if len(names) != len(stages):
+            raise ValueError("Duplicate stage names in pipeline")
+        for stage in stages:
+            missing = set(stage.deps) - names
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+    def _fallback(self, stage: Stage, reason: str, exc: Optional[BaseException] = None):
+        if stage.required:
+            if isinstance(exc, StageAborted):
+                raise exc
+            raise StageAborted(f"Required stage '{stage.name}' failed: {reason}") from exc
+        logger.warning(f"[Scheduler] Stage '{stage.name}' {reason}; using default result")
+        return stage.default
+
+    def _timed_out(self, stage: Stage):
+        reason = f"timed out after {stage.timeout}s"
+        if stage.partial is None:
+            return self._fallback(stage, reason)
+        try:
+            result = stage.partial()
+        except Exception as e:
+            return self._fallback(stage, f"{reason} and has no partial result ({e})", e)
+        logger.warning(f"[Scheduler] Stage '{stage.name}' {reason}; using its partial result")
+        return result
+
+    def run(self, stages: List[Stage]) -> Dict[str, Any]:
+        self._validate(stages)
+        self.timings = {}
+        pending = {s.name: s for s in stages}
+        results: Dict[str, Any] = {}
+        running = {}  # future -> (stage, started_at)
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage")
+        try:
+            while pending or running:
+                ready = [s for s in pending.values() if all(d in results for d in s.deps)]
+                for stage in ready:
+                    del pending[stage.name]
+                    kwargs = {d: results[d] for d in stage.deps}
+                    logger.debug(f"[Scheduler] Starting stage '{stage.name}'")
+                    future = self._submit(pool, stage.fn, **kwargs)
+                    running[future] = (stage, time.perf_counter())
+                    self._report(stage.name, "running")
+
+                if not running:
+                    raise ValueError(f"Pipeline has a dependency cycle: {list(pending)}")
+
+                now = time.perf_counter()
+                deadlines = [
+                    started + stage.timeout - now
+                    for stage, started in running.values() if stage.timeout is not None
+                ]
+                wait_for = max(min(deadlines), 0) if deadlines else None
+                done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                now = time.perf_counter()
+                for future in list(running):
+                    stage, started = running[future]
+                    if future in done:
+                        del running[future]
+                        self.timings[stage.name] = now - started
+                        try:
+                            results[stage.name] = future.result()
+                            self._finish(stage.name, "done")
+                        except StageAborted as e:
+                            self._finish(stage.name, "failed")
+                            results[stage.name] = self._fallback(stage, f"aborted ({e})", e)
+                        except Exception as e:
+                            logger.exception(f"[Scheduler] Stage '{stage.name}' raised an error")
+                            self._finish(stage.name, "failed")
+                            results[stage.name] = self._fallback(stage, f"failed ({e})", e)
+                    elif stage.timeout is not None and now - started >= stage.timeout:
+                        # The thread can't be killed; abandon it and move on.
+                        del running[future]
+                        self.timings[stage.name] = now - started
+                        self._finish(stage.name, "timeout")
+                        results[stage.name] = self._timed_out(stage)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        logger.info(
+            "[Scheduler] Stage timings: "
+            + ", ".join(f"{name}={elapsed:.2f}s" for name, elapsed in self.timings.items())
+        )
+        return results
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any], timeout: Optional[float] = None,
+            default: Any = None) -> List[Any]:
+        """
+        Runs `fn` over `items` side by side and returns results in input order.
+        Items that fail or miss the shared deadline get `default`.
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        pool = ThreadPoolExecutor(max_workers=min(self.fanout_workers, len(items)), thread_name_prefix="fanout")
+        try:
+            futures = [self._submit(pool, fn, item) for item in items]
+            wait(futures, timeout=timeout)
+            results = []
+            for item, future in zip(items, futures):
+                if not future.done():
+                    logger.warning(f"[Scheduler] Fan-out call for '{item}' timed out after {timeout}s")
+                    results.append(default)
+                    continue
+                try:
+                    results.append(future.result())
+                except Exception:
+                    logger.exception(f"[Scheduler] Fan-out call for '{item}' failed")
+                    results.append(default)
+            return results
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
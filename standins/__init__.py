@@ -0,0 +1,5 @@
+# --- __init__.py ---
+"""
+Local stand-ins for the external services ShopIntel talks to, so the app can be
+exercised without hitting live Flipkart, SerpAPI or Groq.
+"""
@@ -0,0 +1,176 @@
+# --- fake_groq_server.py ---
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+CLASSIFIER_RESPONSE = {
+    "product_classifier": "Electronics",
+    "relevant_items": [
+        "Samsung Galaxy S23",
+        "OnePlus 11",
+        "Google Pixel 7",
+        "Motorola Edge 40",
+        "Sony Xperia 10 V",
+    ],
+}
+
+NARRATIVE_RESPONSE = """**1. Product Summary**
+- A well-rounded product for everyday use.
+- Price: as listed on the product page.
+
+**3. Review Analysis**
+- Buyers praise the build quality.
+- A few mention the battery draining quickly under heavy use.
+
+**4. Product Comparison with Similar Items**
+- Priced in the middle of the similar items, with a better rating than most.
+
+**8. Personalized Recommendation Check**
+- Fits a value-focused buyer.
+
+**9. Category-Specific Tips**
+- Use a case and a screen protector.
+"""
+
+# What the LLM writes when it renders every section itself, tables included
+REPORT_RESPONSE = NARRATIVE_RESPONSE.replace("**3. Review Analysis**", """**2. Key Specifications**
+| Feature | Details |
+|---|---|
+""" + "".join(f"| Feature {i} | Detail {i} |\n" for i in range(1, 6)) + """
+**3. Review Analysis**""").replace("**8. Personalized Recommendation Check**", "".join(
+    f"**{n}. {title}**\n| Product Name | Price | Link |\n|---|---|---|\n"
+    + "".join(f"| Example product {i} | ₹{i},999 | [View](https://www.example.com/shop/item/{i}) |\n" for i in range(1, 6))
+    + "\n"
+    for n, title in ((5, "Similar Items (with links)"), (6, "YouTube Reviews"), (7, "Relevant Alternatives"))
+) + "**8. Personalized Recommendation Check**")
+
+
+class FakeGroqConfig:
+    def __init__(self, first_token_latency: float = 0.2, tokens_per_second: float = 200.0):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+
+def _pick_response(messages) -> str:
+    text = " ".join(m.get("content", "") for m in messages)
+    # Report prompts carry the classification result in their raw data, so match the task only
+    if "Product Category Classification" in text:
+        return json.dumps(CLASSIFIER_RESPONSE)
+    if "narrative parts" in text:
+        return NARRATIVE_RESPONSE
+    return REPORT_RESPONSE
+
+
+def _tokens(text: str):
+    # Roughly one token per word, keeping the whitespace so the joined stream matches
+    token = ""
+    for ch in text:
+        token += ch
+        if ch in " \n":
+            yield token
+            token = ""
+    if token:
+        yield token
+
+
+def make_handler(config: FakeGroqConfig):
+    class FakeGroqHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(f"[FakeGroq] {format % args}")
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            config.count()
+            model = body.get("model", "fake-model")
+            text = _pick_response(body.get("messages", []))
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            created = int(time.time())
+            tokens = list(_tokens(text))
+            usage = {"prompt_tokens": sum(len(m.get("content", "").split()) for m in body.get("messages", [])),
+                     "completion_tokens": len(tokens)}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+            time.sleep(config.first_token_latency)
+            delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+
+            if not body.get("stream"):
+                time.sleep(delay * len(tokens))
+                payload = json.dumps({
+                    "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": usage,
+                }).encode("utf8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            def send(chunk):
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf8"))
+                self.wfile.flush()
+
+            for token in tokens:
+                send({"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                      "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+                time.sleep(delay)
+            send({"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                  "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return FakeGroqHandler
+
+
+def start_server(port: int = 0, config: FakeGroqConfig = None) -> ThreadingHTTPServer:
+    """
+    Starts the fake Groq endpoint on a background thread. Point the app at it
+    with GROQ_BASE_URL=http://127.0.0.1:<port>.
+    """
+    config = config or FakeGroqConfig()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    server.config = config
+    threading.Thread(target=server.serve_forever, name="fake-groq", daemon=True).start()
+    logger.info(f"[FakeGroq] Listening on http://127.0.0.1:{server.server_address[1]}")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Groq-compatible chat completions server")
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_GROQ_PORT", "8100")))
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    args = parser.parse_args()
+
+    server = start_server(args.port, FakeGroqConfig(args.first_token_latency, args.tokens_per_second))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,114 @@
+# --- fake_serpapi_server.py ---
+import os
+import json
+import time
+import zlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, quote_plus
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+RESULTS_PER_QUERY = 8
+
+
+class FakeSerpApiConfig:
+    def __init__(self, latency: float = 0.3):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+
+def shopping_results(query: str):
+    # Deterministic per query so repeated runs build identical prompts
+    seed = zlib.crc32(query.encode("utf8"))
+    return [
+        {
+            "title": f"{query} Variant {i + 1}",
+            "price": f"₹{(seed % 40000) + 5000 + i * 750:,}",
+            "rating": round(3.5 + ((seed >> i) % 15) / 10, 1),
+            "reviews": (seed >> (i + 3)) % 5000,
+            "source": ["Flipkart", "Amazon.in", "Croma", "Reliance Digital"][i % 4],
+            "link": f"https://www.example.com/shop/{quote_plus(query)}/{i + 1}",
+        }
+        for i in range(RESULTS_PER_QUERY)
+    ]
+
+
+def video_results(query: str):
+    return [
+        {
+            "title": f"{query} review #{i + 1}",
+            "link": f"https://www.youtube.com/watch?v=bench{zlib.crc32(f'{query}{i}'.encode('utf8')):08x}",
+            "channel": {"name": ["Tech Burner", "Trakin Tech", "Beebom", "Geekyranjit"][i % 4]},
+            "published_date": f"{i + 1} months ago",
+            "description": f"Detailed review of the {query} covering design, performance and value.",
+        }
+        for i in range(RESULTS_PER_QUERY)
+    ]
+
+
+def make_handler(config: FakeSerpApiConfig):
+    class FakeSerpApiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(f"[FakeSerpApi] {format % args}")
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path.rstrip("/") != "/search":
+                self.send_error(404)
+                return
+
+            params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+            config.count()
+            time.sleep(config.latency)
+            engine = params.get("engine")
+            if engine == "google":
+                payload = {"shopping_results": shopping_results(params.get("q", ""))}
+            elif engine == "youtube":
+                payload = {"video_results": video_results(params.get("search_query", ""))}
+            else:
+                payload = {"error": f"Unsupported engine: {engine}"}
+
+            body = json.dumps({"search_metadata": {"status": "Success"}, **payload}).encode("utf8")
+            self.send_response(200 if "error" not in payload else 400)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return FakeSerpApiHandler
+
+
+def start_server(port: int = 0, config: FakeSerpApiConfig = None) -> ThreadingHTTPServer:
+    """
+    Starts the fake SerpAPI endpoint on a background thread. Point the app at
+    it with SERP_API_URL=http://127.0.0.1:<port>/search (any SERP_API_KEY works).
+    """
+    config = config or FakeSerpApiConfig()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    server.config = config
+    threading.Thread(target=server.serve_forever, name="fake-serpapi", daemon=True).start()
+    logger.info(f"[FakeSerpApi] Listening on http://127.0.0.1:{server.server_address[1]}/search")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SerpAPI-compatible search server")
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_SERPAPI_PORT", "8101")))
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    server = start_server(args.port, FakeSerpApiConfig(args.latency))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
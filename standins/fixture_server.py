@@ -0,0 +1,227 @@
+# --- fixture_server.py ---
+import os
+import re
+import time
+import zlib
+import argparse
+import threading
+from html import escape
+from pathlib import Path
+from typing import List, Optional
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from logger_util import setup_logger
+
+logger = setup_logger(__name__)
+
+FIXTURE_DIR = os.getenv("FIXTURE_DIR", "fixtures")
+PID_RE = re.compile(r"[^A-Za-z0-9]")
+
+SYNTHETIC_PRODUCTS = [
+    ("Apple iPhone 15 (Black, 128 GB)", "₹69,900", "Electronics"),
+    ("boAt Rockerz 450 Bluetooth Headphones (Luscious Black)", "₹1,499", "Electronics"),
+    ("HP 15s Intel Core i5 12th Gen Laptop (16 GB/512 GB SSD/Windows 11)", "₹54,990", "Electronics"),
+    ("Tata Sampann Unpolished Toor Dal 1 kg", "₹189", "Food"),
+    ("Roadster Men Solid Round Neck Cotton T-Shirt", "₹399", "Clothes"),
+]
+
+
+class FixtureConfig:
+    def __init__(self, fixture_dir: str = FIXTURE_DIR, latency: float = 0.05, review_pages: int = 5,
+                 reviews_per_page: int = 10, padding_kb: int = 256):
+        self.fixture_dir = Path(fixture_dir)
+        self.latency = latency
+        self.review_pages = review_pages
+        self.reviews_per_page = reviews_per_page
+        # Real Flipkart pages are several hundred KB of scripts and markup around the data
+        self.padding_kb = padding_kb
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def recorded_pids(self) -> List[str]:
+        if not self.fixture_dir.is_dir():
+            return []
+        return sorted(p.name for p in self.fixture_dir.iterdir() if (p / "product.html").exists())
+
+
+def _padding(kb: int) -> str:
+    if kb <= 0:
+        return ""
+    line = "<script>window.__INITIAL_STATE__ = window.__INITIAL_STATE__ || {};</script>\n"
+    return line * (kb * 1024 // len(line))
+
+
+def synthetic_product_html(pid: str, padding_kb: int = 0) -> str:
+    """
+    A product page carrying every element product_parser and the Selenium
+    extractor read, with the data picked deterministically from the pid.
+    """
+    title, price, category = SYNTHETIC_PRODUCTS[zlib.crc32(pid.encode("utf8")) % len(SYNTHETIC_PRODUCTS)]
+    about = [f"{title} highlight {i + 1}: built for everyday use" for i in range(5)]
+    specs = {"Brand": title.split()[0], "Model Name": title, "Category": category, "Warranty": "1 Year",
+             "Net Quantity": "1", "Country of Origin": "India"}
+    breakdown = [812, 240, 96, 41, 77]
+    features = {"Quality": 4.3, "Value for Money": 4.1, "Design": 4.4, "Durability": 4.0}
+    return f"""<!DOCTYPE html>
+<html><head><title>{escape(title)}</title></head>
+<body>
+{_padding(padding_kb // 2)}
+<h1><span class="VU-ZEz">{escape(title)}</span></h1>
+<div class="Nx9bqj CxhGGd">{price}</div>
+<div class="XQDdHH">4.3</div>
+<div class="xFVion"><ul>{''.join(f'<li>{escape(a)}</li>' for a in about)}</ul></div>
+<ul class="C3EUFP"><li><div class="YhUgfO">7 Days Replacement Policy</div></li><li><div class="YhUgfO">Cash on Delivery available</div></li></ul>
+<div class="yN+eNk w9jEaj"><p>The {escape(title)} combines dependable performance with a design made to last.</p></div>
+<div class="_1OjC5I"><div class="GNDEQ-"><table class="_0ZhAN9">
+{''.join(f'<tr><td>{escape(k)}</td><td><ul><li>{escape(v)}</li></ul></td></tr>' for k, v in specs.items())}
+</table></div></div>
+<ul class="+psZUR">{''.join(f'<li class="fQ-FC1"><div class="BArk-j">{n:,}</div></li>' for n in breakdown)}</ul>
+{''.join(f'<a class="col-3-12 zbCsdp zsSYMX"><svg><text class="_2DdnFS">{v}</text></svg><div class="NTiEl0">{escape(k)}</div></a>' for k, v in features.items())}
+{_padding(padding_kb - padding_kb // 2)}
+</body></html>"""
+
+
+def synthetic_reviews_html(pid: str, page: int, per_page: int = 10, padding_kb: int = 0) -> str:
+    title = SYNTHETIC_PRODUCTS[zlib.crc32(pid.encode("utf8")) % len(SYNTHETIC_PRODUCTS)][0]
+    rows = []
+    for i in range(per_page):
+        n = (page - 1) * per_page + i + 1
+        rating = 5 - (n * 7 % 5)
+        rows.append(f"""<div class="col EPCmJX">
+<div class="row"><div>{rating}</div><p>Review {n} headline</p></div>
+<div class="row"><div><div></div><div>Review {n} for {escape(title)}: {'works well and feels solid' if rating > 2 else 'stopped working after a few weeks'}.</div></div></div>
+<div class="row"></div>
+<div class="row"><p class="_2mcZGG"><span>Certified Buyer</span><span>, City {n % 17}</span></p><p class="_2sc7ZR">Buyer {n}</p><p class="_2sc7ZR">{n % 11 + 1} months ago</p></div>
+<div class="_1e9_Zu"><span class="_3c3Px5">{n * 3 % 90}</span><span class="_3c3Px5">{n % 7}</span></div>
+</div>""")
+    return f"""<!DOCTYPE html>
+<html><head><title>Reviews</title></head>
+<body>
+{_padding(padding_kb)}
+{''.join(rows)}
+</body></html>"""
+
+
+def make_handler(config: FixtureConfig):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(f"[Fixtures] {format % args}")
+
+        def _send_html(self, html: Optional[str]):
+            if html is None:
+                self.send_error(404)
+                return
+            body = html.encode("utf8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _recorded(self, pid: str, name: str) -> Optional[str]:
+            path = config.fixture_dir / pid / name
+            return path.read_text(encoding="utf8") if path.exists() else None
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+            # Benchmarks append "-<n>" to a pid to get distinct URLs for the same fixture
+            pid = PID_RE.sub("", params.get("pid", "").split("-")[0]) or "BENCH"
+            config.count()
+            time.sleep(config.latency)
+
+            if "/product-reviews/" in parts.path:
+                # Past the last page Flipkart serves the last page again
+                page = min(max(int(params.get("page", "1") or 1), 1), config.review_pages)
+                recorded = self._recorded(pid, f"reviews_{page}.html")
+                if recorded is None and pid in config.recorded_pids():
+                    recorded = self._recorded(pid, "reviews_1.html")
+                self._send_html(recorded or synthetic_reviews_html(pid, page, config.reviews_per_page,
+                                                                   config.padding_kb // 4))
+            elif "/p/" in parts.path:
+                self._send_html(self._recorded(pid, "product.html") or synthetic_product_html(pid, config.padding_kb))
+            else:
+                self.send_error(404)
+
+    return FixtureHandler
+
+
+def start_server(port: int = 0, config: FixtureConfig = None) -> ThreadingHTTPServer:
+    """
+    Serves Flipkart-shaped product and review pages on a background thread:
+    `/<slug>/p/<itm>?pid=<PID>` and `/<slug>/product-reviews/<itm>?pid=<PID>&page=<n>`.
+    Pages recorded under `<fixture_dir>/<PID>/` are replayed as saved;
+    any other pid gets a synthetic page.
+    """
+    config = config or FixtureConfig()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    server.config = config
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    logger.info(f"[Fixtures] Serving pages on http://127.0.0.1:{server.server_address[1]}")
+    return server
+
+
+def product_url(server: ThreadingHTTPServer, pid: str) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/bench-product/p/itm{pid.lower()}?pid={pid}"
+
+
+def record(url: str, fixture_dir: str = FIXTURE_DIR, pages: int = 5) -> Path:
+    """
+    Saves a live product page and its first review pages so they can be
+    replayed offline.
+    """
+    from url_utils import product_key
+    from review_fetcher import ReviewFetcher, HEADERS
+    from http_client import get_http_client
+
+    key = product_key(url) or ""
+    pid = PID_RE.sub("", key.split(":", 1)[-1].upper())
+    if not key.startswith("flipkart:") or not pid:
+        raise ValueError(f"Not a Flipkart product URL: {url}")
+
+    target = Path(fixture_dir) / pid
+    target.mkdir(parents=True, exist_ok=True)
+    response = get_http_client().get(url, headers=HEADERS)
+    response.raise_for_status()
+    (target / "product.html").write_text(response.text, encoding="utf8")
+
+    fetcher = ReviewFetcher()
+    reviews_url = fetcher.reviews_url(url)
+    for page in range(1, pages + 1) if reviews_url else []:
+        html = fetcher.get_html(fetcher._page_url(reviews_url, page))
+        if not html:
+            break
+        (target / f"reviews_{page}.html").write_text(html, encoding="utf8")
+    logger.info(f"[Fixtures] Recorded {url} into {target}")
+    return target
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve or record Flipkart page fixtures")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="serve recorded and synthetic pages")
+    serve.add_argument("--port", type=int, default=int(os.getenv("FIXTURE_PORT", "8102")))
+    serve.add_argument("--fixtures", default=FIXTURE_DIR)
+    serve.add_argument("--latency", type=float, default=0.05)
+    rec = sub.add_parser("record", help="save live product and review pages")
+    rec.add_argument("urls", nargs="+")
+    rec.add_argument("--fixtures", default=FIXTURE_DIR)
+    rec.add_argument("--pages", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        for url in args.urls:
+            record(url, args.fixtures, args.pages)
+    else:
+        server = start_server(args.port, FixtureConfig(args.fixtures, args.latency))
+        print(f"Example product: {product_url(server, 'BENCH0001')}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
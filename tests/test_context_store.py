@@ -0,0 +1,42 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from context_store import ProductContextStore  # noqa: E402
+
+URL = "https://www.flipkart.com/boat-storm-call-w/p/itm123?pid=SMWGNFSFHYHP4UAU"
+OTHER_URL = "https://www.flipkart.com/noise-pulse/p/itm456?pid=SMWGRZ4FHYHP9XYZ"
+
+
+def _size(total_info) -> int:
+    return len(json.dumps(total_info, default=str))
+
+
+def test_pinned_and_shared_entry_count_once():
+    store = ProductContextStore()
+    info = {"product_info": {"title": "boAt Storm Call"}}
+    store.put(URL, info, session_id="s1")
+    store.put(URL, info, session_id="s2")
+    assert store.stats()["entries"] == 3
+    assert store.stats()["bytes"] == _size(info)
+
+
+def test_bytes_follow_eviction_and_refresh():
+    info = {"product_info": {"title": "boAt Storm Call"}}
+    refreshed = {"product_info": {"title": "boAt Storm Call (refreshed)"}}
+    store = ProductContextStore(max_bytes=_size(info) + _size(refreshed))
+    store.put(URL, info, session_id="s1")
+    # The shared entry moves to the new payload; s1 keeps the one it was shown
+    store.put(URL, refreshed)
+    assert store.get(URL, session_id="s1") is info
+    assert store.stats()["bytes"] == _size(info) + _size(refreshed)
+
+    other = {"product_info": {"title": "Noise Pulse"}}
+    store.put(OTHER_URL, other)
+    # The least recently used shared entry goes; the payload s1 still holds stays counted
+    assert store.get(URL) is None
+    assert store.get(URL, session_id="s1") is info
+    assert store.stats()["bytes"] == _size(info) + _size(other)
@@ -0,0 +1,103 @@
+# --- test_product_classifier.py ---
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from product_classifier import CategoryIndex, LocalClassifier  # noqa: E402
+
+TITLE = ("boAt Storm Call W with 4.29 cm (1.69\") HD Display, BT Calling, "
+         "550 Nits Brightness Smartwatch (Active Black Strap, Free Size)")
+
+
+@pytest.fixture
+def index(tmp_path) -> CategoryIndex:
+    return CategoryIndex(db_path=str(tmp_path / "category_index.sqlite"))
+
+
+def test_colour_and_size_overlap_is_not_an_alternative(index):
+    index.add_items("Electronics", [
+        {"title": "Apple iPhone 15 (Black, 128 GB)"},
+        {"title": "SanDisk 128 GB MicroSD Card (Black)"},
+        {"title": "Samsung 80 cm (32 inch) HD Ready Smart LED TV (Black)"},
+    ])
+    assert index.relevant_items("Electronics", TITLE) == []
+
+
+def test_similar_products_rank_first(index):
+    index.add_items("Electronics", [
+        {"title": "Noise ColorFit Pro 4 Calling Smartwatch with HD Display (Black Strap, Regular)"},
+        {"title": "Fire-Boltt Ninja Call Pro BT Calling Smartwatch (Black Strap, Free Size)"},
+        {"title": "Apple iPhone 15 (Black, 128 GB)"},
+        {"title": "boAt Storm Call W with HD Display, BT Calling Smartwatch (Blue Strap, Free Size)"},
+    ])
+    picked = index.relevant_items("Electronics", TITLE)
+    assert set(picked) == {
+        "Noise ColorFit Pro 4 Calling Smartwatch with HD Display (Black Strap, Regular)",
+        "Fire-Boltt Ninja Call Pro BT Calling Smartwatch (Black Strap, Free Size)",
+    }
+
+
+SMARTWATCH_URL = "https://www.flipkart.com/boat-storm-call-w/p/itm123?pid=SMWGNFSFHYHP4UAU"
+
+
+@pytest.fixture(scope="module")
+def smartwatch() -> dict:
+    from product_parser import parse_product_html
+
+    return parse_product_html((ROOT / "fixtures" / "SMWGNFSFHYHP4UAU" / "product.html").read_text(encoding="utf8"))
+
+
+def test_saved_smartwatch_is_confident_electronics(smartwatch):
+    classifier = LocalClassifier(model_path=None)
+    result = classifier.classify(smartwatch, SMARTWATCH_URL)
+    assert result["product_classifier"] == "Electronics"
+    assert classifier.is_confident(result)
+
+
+def test_saved_smartwatch_without_pid_is_below_threshold(smartwatch):
+    # Title and bullets alone point at Electronics, but not with enough evidence to skip the LLM
+    classifier = LocalClassifier(model_path=None)
+    result = classifier.classify(smartwatch)
+    assert result["product_classifier"] == "Electronics"
+    assert 0 < result["confidence"] < classifier.threshold
+    assert not classifier.is_confident(result)
+
+
+def test_audience_words_do_not_make_gadgets_clothes(smartwatch):
+    classifier = LocalClassifier(model_path=None)
+    info = {**smartwatch, "title": "Noise ColorFit Pulse Smartwatch for Men & Women, Slim Fit Strap"}
+    assert classifier._rule_scores(info, None)["Clothes"] == 0
+    assert classifier.classify(info)["product_classifier"] == "Electronics"
+
+
+@pytest.mark.parametrize("title, category", [
+    ("Roadster Men Checkered Casual Cotton Shirt", "Clothes"),
+    ("Cadbury Dairy Milk Silk Chocolate Bar, 150 g", "Food"),
+    ("SAMSUNG Galaxy M14 5G (Smoky Teal, 128 GB) (6 GB RAM)", "Electronics"),
+])
+def test_title_keywords(title, category):
+    assert LocalClassifier(model_path=None).classify({"title": title})["product_classifier"] == category
+
+
+def test_nothing_matched_has_no_category():
+    assert LocalClassifier(model_path=None).classify({"title": "Gift hamper"}) == \
+        {"product_classifier": None, "confidence": 0.0}
+
+
+def test_below_threshold_falls_back_to_llm(smartwatch, index):
+    from llm_response import LLMResponse
+
+    handler = LLMResponse.__new__(LLMResponse)
+    handler.local_classifier = LocalClassifier(model_path=None)
+    handler.category_index = index
+    asked = []
+    handler._query_llm = lambda prompt, url=None, model=None: asked.append(url) or {
+        "product_classifier": "Electronics", "relevant_items": ["Noise ColorFit Pro 4"]}
+
+    result = handler._classify("https://www.example.com/smartwatch", smartwatch)
+    assert asked == ["https://www.example.com/smartwatch"]
+    assert result["relevant_items"] == ["Noise ColorFit Pro 4"]
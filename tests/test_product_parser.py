@@ -0,0 +1,56 @@
+# --- test_product_parser.py ---
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from product_parser import parse_product_html  # noqa: E402
+
+SAVED_PAGES = sorted((ROOT / "fixtures").glob("*/product.html"))
+
+
+@pytest.fixture(scope="module")
+def saved_page() -> dict:
+    return parse_product_html((ROOT / "fixtures" / "SMWGNFSFHYHP4UAU" / "product.html").read_text(encoding="utf8"))
+
+
+def test_snapshot_text_matches_webelement_rules(saved_page):
+    # Line breaks survive, runs of whitespace and &nbsp; collapse, hidden nodes and comments are skipped
+    assert saved_page["title"] == ("boAt Storm Call W with 4.29 cm (1.69\") HD Display, BT Calling, "
+                                   "550 Nits Brightness Smartwatch (Active Black Strap, Free Size)")
+    assert saved_page["rating"] == "4.1"
+    assert saved_page["about_this_item"][0] == "Bluetooth Calling\nMake and receive calls from your wrist"
+    assert saved_page["about_this_item"][2] == "Up to 7 Days Battery"
+    assert len(saved_page["about_this_item"]) == 4
+    assert saved_page["services"] == ["7 Days Service Center Replacement/Repair", "Cash on Delivery available?"]
+    assert saved_page["paragraph"][0].count("\n") == 2
+    assert saved_page["technical_specifications"] == {
+        "Sales Package": "1 Smartwatch, 1 Charging Cable,\n1 User Manual",
+        "Model Number": "Storm Call W",
+        "Strap Color": "Black",
+        "Ideal For": "Men & Women",
+    }
+    assert saved_page["rating_breakdown"] == {5: 7412, 4: 2301, 3: 1045, 2: 463, 1: 1124}
+    assert saved_page["feature_ratings"]["Value for\nMoney"] == 3.8
+
+
+@pytest.fixture(scope="module")
+def chrome():
+    from driver_manager import create_driver, quit_driver
+
+    try:
+        driver = create_driver()
+    except Exception as e:
+        pytest.skip(f"Chrome is not available: {e}")
+    yield driver
+    quit_driver(driver)
+
+
+@pytest.mark.parametrize("page", SAVED_PAGES, ids=lambda p: p.parent.name)
+def test_snapshot_matches_element_extraction(chrome, page):
+    from data_fetcher import compare_extraction_modes
+
+    assert compare_extraction_modes(page.as_uri(), chrome) == {}
@@ -0,0 +1,54 @@
+# --- test_prompt_compactor.py ---
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from prompt_compactor import REVIEW_TRIM_COUNT, compact_sections  # noqa: E402
+
+
+def _total_info(review_count: int) -> dict:
+    return {
+        "product_info": {"title": "boAt Storm Call W", "price": "₹1,099"},
+        "reviews": [
+            {"rating": "4", "summary": f"Nice {i}", "review": f"Battery lasts {i} days, display is bright. " * 10}
+            for i in range(review_count)
+        ],
+        "similar_items": [{"title": f"Watch {i}", "price": "₹1,299"} for i in range(8)],
+        "relevant_search_items": [[{"title": f"Alt {g}-{i}", "price": "₹999"} for i in range(5)] for g in range(3)],
+        "youtube_videos": [{"title": f"Review {i}", "description": "Unboxing " * 40} for i in range(4)],
+    }
+
+
+def test_reviews_are_capped_before_sections_are_dropped():
+    sections = compact_sections(_total_info(50), budget=900)
+
+    reviews = json.loads(sections["reviews"])
+    assert len(reviews) <= REVIEW_TRIM_COUNT
+    assert all(len(r["review"]) <= 161 for r in reviews)
+    assert len(json.loads(sections["similar_items"])) >= 2
+    assert len(json.loads(sections["relevant_search_items"])) == 3
+    assert sections["youtube_videos"] != "N/A"
+
+
+def test_small_payload_is_untouched():
+    sections = compact_sections(_total_info(2), budget=10000)
+    assert len(json.loads(sections["reviews"])) == 2
+    assert len(json.loads(sections["similar_items"])) == 8
+
+
+def test_third_party_links_keep_their_query():
+    shopping = "https://www.google.com/shopping/product/123?q=boat&prds=eto:1"
+    search = "https://www.google.com/search?ibp=oshop&q=boat+storm+call+w&prds=catalogid:1,pvt:hg"
+    flipkart = "https://www.flipkart.com/boat-storm/p/itm123?pid=SMWGNFSFHYHP4UAU&lid=LST1&utm_source=x"
+    sections = compact_sections({
+        "similar_items": [{"title": "A", "link": shopping}, {"title": "B", "link": flipkart}],
+        "relevant_search_items": [[{"title": "C", "link": search}]],
+    }, budget=10000)
+
+    similar = json.loads(sections["similar_items"])
+    assert similar[0]["link"] == shopping
+    assert similar[1]["link"] == "https://www.flipkart.com/boat-storm/p/itm123?pid=SMWGNFSFHYHP4UAU"
+    assert json.loads(sections["relevant_search_items"])[0][0]["link"] == search
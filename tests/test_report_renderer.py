@@ -0,0 +1,28 @@
+# --- test_report_renderer.py ---
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from report_renderer import ReportAssembler, render_local_sections  # noqa: E402
+
+NARRATIVE = "**1. Product Summary**\n- Smartwatch\n**8. Personalized Recommendation Check**\n- Good fit\n"
+
+
+def test_alternatives_are_rendered_when_the_report_reaches_them():
+    total_info = {"similar_items": [{"title": "Noise Pro 4", "price": "₹1,999"}], "relevant_search_items": []}
+    waited = []
+
+    def wait_for_alternatives():
+        waited.append(True)
+        total_info["relevant_search_items"] = [[{"title": "Fire-Boltt Ninja", "price": "₹1,299"}]]
+
+    assembler = ReportAssembler(render_local_sections(total_info, wait_for_alternatives=wait_for_alternatives))
+    head = assembler.feed(NARRATIVE[:NARRATIVE.index("**8.")])
+    assert not waited and "Noise Pro 4" not in head
+
+    report = head + assembler.feed(NARRATIVE[NARRATIVE.index("**8."):]) + assembler.finish()
+    assert waited == [True]
+    assert report.index("Fire-Boltt Ninja") < report.index("**8. Personalized Recommendation Check**")
+    assert report.count("Noise Pro 4") == 1
@@ -0,0 +1,27 @@
+# --- test_review_parser.py ---
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from review_parser import BACKENDS, REVIEW_PARSER_BACKEND, parse_reviews_html_parser  # noqa: E402
+
+SAVED_PAGES = sorted((ROOT / "fixtures").glob("*/reviews_*.html"))
+
+
+@pytest.mark.parametrize("page", SAVED_PAGES, ids=lambda p: f"{p.parent.name}/{p.name}")
+def test_default_backend_matches_html_parser(page):
+    html = page.read_text(encoding="utf8")
+    assert BACKENDS[REVIEW_PARSER_BACKEND](html) == parse_reviews_html_parser(html)
+
+
+def test_malformed_summary_keeps_nested_text():
+    html = (ROOT / "fixtures" / "SMWGNFSFHYHP4UAU" / "reviews_2.html").read_text(encoding="utf8")
+    reviews = BACKENDS[REVIEW_PARSER_BACKEND](html)
+    assert len(reviews) == 10
+    assert reviews[3]["summary"] == "Review11headline"
+    assert reviews[3]["location"] == "Chennai"
+    assert (reviews[3]["upvotes"], reviews[3]["downvotes"]) == ("56", "4")
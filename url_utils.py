@@ -0,0 +1,68 @@
+# --- url_utils.py ---
+import re
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query params that only track how the user reached the page
+TRACKING_PARAMS = {
+    "otracker", "otracker1", "iid", "ssid", "qh", "lid", "marketplace", "q", "store", "srno",
+    "spotlighttagid", "fm", "ppt", "ppn", "ref", "ref_", "crid", "dib", "dib_tag", "keywords",
+    "qid", "sprefix", "sr", "sp_csd", "psc", "th", "tag", "gclid", "fbclid",
+}
+
+FLIPKART_ITEM_RE = re.compile(r"/(?:p|product-reviews)/(itm[0-9a-z]+)", re.IGNORECASE)
+AMAZON_ASIN_RE = re.compile(r"/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})(?:[/?]|$)", re.IGNORECASE)
+
+
+def _is_flipkart(host: str) -> bool:
+    return host == "flipkart.com" or host.endswith(".flipkart.com")
+
+
+def _is_amazon(host: str) -> bool:
+    return host.startswith("amazon.") or ".amazon." in host
+
+
+def product_key(url: str) -> Optional[str]:
+    """
+    Returns a stable id for the product behind `url`, e.g. `flipkart:MOBGHWFHABH3G73H`
+    or `amazon:B0BGLDXHGY`, falling back to the canonical URL for other sites.
+    """
+    if not url:
+        return None
+
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    params = {k.lower(): v for k, v in parse_qsl(parts.query)}
+
+    if _is_flipkart(host):
+        if params.get("pid"):
+            return f"flipkart:{params['pid'].upper()}"
+        match = FLIPKART_ITEM_RE.search(parts.path)
+        if match:
+            return f"flipkart:{match.group(1).lower()}"
+    elif _is_amazon(host):
+        match = AMAZON_ASIN_RE.search(parts.path)
+        if match:
+            return f"amazon:{match.group(1).upper()}"
+
+    return canonicalize_url(url)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Drops tracking params and fragments so the same product always maps to the same URL.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+
+    if _is_amazon(host):
+        match = AMAZON_ASIN_RE.search(parts.path)
+        if match:
+            return urlunsplit((parts.scheme, host, f"/dp/{match.group(1).upper()}", "", ""))
+
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k.lower() not in TRACKING_PARAMS
+             and not k.lower().startswith("utm_")]
+    if _is_flipkart(host):
+        query = [(k, v) for k, v in query if k.lower() == "pid"]
+
+    return urlunsplit((parts.scheme, host, parts.path, urlencode(sorted(query)), ""))